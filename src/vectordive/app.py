@@ -1,15 +1,106 @@
 from ast import main
-from vectordive.ui.entrance_window import EntranceWindow
-from vectordive.ui.main_window import MainWindow
+from vectordive.config import base
+from vectordive.services.log_pipeline import setup_logging, shutdown_logging
+import logging
 import sys
-from PyQt5.QtWidgets import QApplication
+
+logger = logging.getLogger(__name__)
+
+
+def run_event_loop(app):
+    """Qtのイベントループを実行する（asyncトランスポート時はqasyncでasyncioと統合する）"""
+    if base.LINK_TRANSPORT == 'async':
+        try:
+            import asyncio
+            import qasync
+        except ImportError:
+            # qasyncがない場合はQSocketNotifierでトランスポートを駆動する
+            return app.exec_()
+        loop = qasync.QEventLoop(app)
+        asyncio.set_event_loop(loop)
+        with loop:
+            return loop.run_forever()
+    return app.exec_()
+
+
+def parse_replay_args(argv):
+    """--replay <tlog> [--speed N] を再生用の接続情報にする（N=0で最大速度）"""
+    if "--replay" not in argv:
+        return None
+    path = argv[argv.index("--replay") + 1]
+    speed = base.REPLAY_SPEED
+    if "--speed" in argv:
+        speed = float(argv[argv.index("--speed") + 1])
+    return {'ip': path, 'port': str(speed), 'mode': 'Replay'}
+
+
+def parse_subscribe_args(argv):
+    """--subscribe [ソケットのパス] を配信デーモン購読用の接続情報にする"""
+    if "--subscribe" not in argv:
+        return None
+    index = argv.index("--subscribe") + 1
+    path = argv[index] if index < len(argv) and not argv[index].startswith("--") else base.DAEMON_SOCKET_PATH
+    return {'ip': path, 'port': '', 'mode': 'Daemon'}
+
+
+def run_daemon(argv):
+    """GUIなしで機体との接続を持ち、Unixソケットの購読者へ配信する（QApplicationは作らない）"""
+    import argparse
+    from vectordive.services.telemetry_daemon import TelemetryDaemon
+
+    parser = argparse.ArgumentParser(description="VectorDive テレメトリ配信デーモン")
+    parser.add_argument("--daemon", action="store_true")
+    parser.add_argument("--mode", choices=base.MODE_COMBO, default="UDP")
+    parser.add_argument("--ip", default=base.IP_EDIT_INFO[1], help="IPアドレス（シリアルの場合はデバイスパス）")
+    parser.add_argument("--port", default=base.PORT_EDIT_INFO[1], help="ポート番号（シリアルの場合はボーレート）")
+    parser.add_argument("--socket", default=base.DAEMON_SOCKET_PATH, help="購読者が接続するUnixソケット")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    daemon = TelemetryDaemon({'ip': args.ip, 'port': args.port, 'mode': args.mode}, args.socket)
+    try:
+        daemon.start()
+    except RuntimeError as e:
+        logger.error("配信デーモンを開始できません: %s", e)
+        daemon.stop()
+        shutdown_logging()
+        return 1
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        print("配信デーモンを停止します")
+    finally:
+        daemon.stop()
+        shutdown_logging()
+    return 0
 
 
 if __name__ == "__main__":
+    # 配信デーモンはQtを使わずに起動する
+    if "--daemon" in sys.argv:
+        sys.exit(run_daemon(sys.argv[1:]))
+    
+    from PyQt5.QtWidgets import QApplication
+    from vectordive.ui.entrance_window import EntranceWindow
+    from vectordive.ui.main_window import MainWindow
+    
     try:
         app = QApplication(sys.argv)
+        setup_logging()
+        app.aboutToQuit.connect(shutdown_logging)
         
         print("Vector Dive アプリケーションを起動中...")
+        
+        # 記録したダイブの再生・配信デーモンの購読はEntranceWindowを経由せずにMainWindowを開く
+        direct_info = parse_replay_args(sys.argv) or parse_subscribe_args(sys.argv)
+        if direct_info:
+            if direct_info['mode'] == 'Replay':
+                print(f"テレメトリを再生中: {direct_info['ip']} (x{direct_info['port']})")
+            else:
+                print(f"配信デーモンを購読中: {direct_info['ip']}")
+            main_window_instance = MainWindow(direct_info)
+            main_window_instance.show()
+            sys.exit(run_event_loop(app))
         print("EntranceWindowからMAVLink接続を設定してください")
         
         # EntranceWindowを起動
@@ -33,7 +124,7 @@ if __name__ == "__main__":
         print("IPアドレスとポートを設定してConnectボタンを押してください")
         print("または、Debug Modeボタンでテストモードを開始できます")
         
-        sys.exit(app.exec_())
+        sys.exit(run_event_loop(app))
         
     except Exception as e:
         print(f"エラーが発生しました: {e}")
@@ -4,7 +4,123 @@ MODE_COMBO = ["UDP", "Serial"]
 MODE_COMBO_LABEL ="Connection Mode"
 IP_EDIT_INFO = ["IP Address", "0.0.0.0"]  # IPアドレスの編集情報
 PORT_EDIT_INFO = ["Port", "14550"]  # ポート番号の編集情報
+PROBE_UDP_PORTS = [14550, 14551]  # 入力ポートと並行して試すUDPポート
+PROBE_POLL_INTERVAL = 0.05  # 接続確認中にHeartbeatを確認する間隔（秒）
+SERIAL_BAUDRATE = 115200  # シリアル接続の既定ボーレート
 
+## MAVLink接続用の定数
+LINK_NOTIFY_INTERVAL_MS = 20  # 購読者への通知間隔の下限（ミリ秒、最大50Hz）
+READER_SELECT_TIMEOUT = 0.05  # 受信スレッドのソケット待機時間（秒）
+IMU_STREAM_MAXLEN = 4096  # 位置推定用に溜めるRAW_IMUサンプルの上限
+IMU_MAX_GAP = 1.0  # これ以上time_usecが空いたら積分をつなげない（秒）
+POSITION_HISTORY_CAPACITY = 360000  # 速度・位置の履歴として保持するサンプル数（100Hzで約1時間）
+LINK_TRANSPORT = "thread"  # "thread": 受信スレッド, "async": Qtイベントループ上のイベント駆動受信
+LINK_STATUS_INTERVAL_MS = 1000  # 接続状態表示の更新間隔（ミリ秒）
+
+## 画面更新用の定数
+UI_MAX_FPS = 30  # 画面更新の最大フレームレート（Hz、30または60）
+POSITION_UPDATE_INTERVAL = 0.1  # RAW_IMUが届かない時（モックデータ）の位置推定の更新間隔（秒）
+TELEMETRY_LABEL_INTERVAL = 0.5  # スラスター出力の状態ラベルを書き換える最小間隔（秒）
+
+## マップ表示用の定数
+MAP_SCALE = 10  # 1メートルあたりのピクセル数
+MAP_TRACK_CAPACITY = 360000  # マップに残す航跡の点数（10Hzで約10時間、超えると古いものから消す）
+MAP_TRACK_CHUNK_POINTS = 500  # 航跡を1つのアイテムにまとめる点数
+MAP_TRACK_MIN_STEP = 0.5  # 前の点からこれ以上（ピクセル）動いた時だけ航跡に追加する
+MAP_LOD_BIN_SIZES = [8, 32, 128, 512, 2048, 8192]  # 航跡の詳細度ごとに最小・最大の点を残す点数
+MAP_LOD_TOLERANCE = 1.0  # 間引いた航跡のビンの大きさの許容値（画面上のピクセル）
+MAP_LOD_MAX_POINTS = 20000  # 1回に描く航跡の点数の上限（超える場合はさらに粗い詳細度を使う）
+MAP_MIN_ZOOM = 0.05  # マップの表示倍率の範囲
+MAP_MAX_ZOOM = 20.0
+
+## ログ表示用の定数
+LOG_CONSOLE_MAX_LINES = 1000  # ログコンソールに表示しておく行数
+LOG_HISTORY_SIZE = 10000  # 絞り込み・検索用に保持するログの件数
+LOG_FLUSH_INTERVAL_MS = 100  # 溜まったログをまとめて表示する間隔（ミリ秒）
+LOG_LEVEL = "INFO"  # ログを出力する最低レベル
+LOG_FILE = "logs/vectordive.log"  # ログファイル（空にすると書き出さない）
+LOG_FILE_MAX_BYTES = 1 << 20  # ログファイルをローテーションする大きさ（バイト）
+LOG_FILE_BACKUP_COUNT = 3  # 残す古いログファイルの数
+LOG_DUPLICATE_INTERVAL = 5.0  # 同じメッセージを出力する最短間隔（秒、間のものは件数だけ残す）
+
+## テレメトリの記録・再生用の定数
+RECORD_TELEMETRY = False  # Trueにすると接続時に受信した全フレームをtlogに記録する
+TELEMETRY_LOG_DIR = "logs"  # 記録ファイルの保存先
+RECORDER_BUFFER_SIZE = 1 << 20  # 記録ファイルの書き込みバッファ（バイト）
+REPLAY_SPEED = 1.0  # 再生速度の既定値（0で最大速度）
+
+## 配信デーモン用の定数
+DAEMON_SOCKET_PATH = "/tmp/vectordive.sock"  # 購読者が接続するUnixソケット
+FANOUT_QUEUE_BYTES = 1 << 20  # 購読者ごとの送信待ちの上限（バイト、超えると古いものから捨てる）
+DAEMON_STATUS_INTERVAL = 5.0  # 状態表示の間隔（秒）
+
+## 共有メモリの状態公開用の定数
+PUBLISH_SNAPSHOT = False  # Trueにすると最新状態を共有メモリに公開する
+SNAPSHOT_NAME = "vectordive_state"  # 共有メモリの名前
+
+## 深度計算用の定数
+DEPTH_MESSAGE_TYPES = ["SCALED_PRESSURE2", "SCALED_PRESSURE", "VFR_HUD", "GLOBAL_POSITION_INT"]  # 優先順
+DEPTH_STREAM_MAXLEN = 1024  # 深度グラフ用に溜める各メッセージの上限
+FLUID_DENSITY = 1000.0  # 水の密度（kg/m³、淡水1000 / 海水1025）
+SURFACE_PRESSURE = 1013.25  # 水面での気圧（hPa）
+GRAVITY = 9.80665  # 重力加速度（m/s²）
+
+## ゲームパッド操縦用の定数
+GAMEPAD_ENABLED = False  # Trueにすると接続時にゲームパッドの読み込みを始める
+GAMEPAD_DEVICE = ""  # /dev/input/event* のパス（空なら最初に見つかったもの、通常ファイルなら記録したイベントを再生）
+GAMEPAD_POLL_RATE = 200  # ゲームパッドを読む周期（Hz）
+GAMEPAD_RETRY_INTERVAL = 1.0  # 開けない・抜けた時につなぎ直す間隔（秒）
+GAMEPAD_AXES = ["ABS_Y", "ABS_X", "ABS_RY", "ABS_RX"]  # 前後・左右・上下・旋回に使う軸
+GAMEPAD_AXIS_INVERT = [True, False, True, False]  # 符号を反転する軸（スティックは上に倒すと負になる）
+GAMEPAD_DEADZONE = 0.08  # 中央で無視する範囲（軸の最大値に対する比）
+GAMEPAD_EXPO = 0.3  # エクスポ（0で線形、1で3乗）
+GAMEPAD_EMERGENCY_BUTTON = "BTN_SELECT"  # 緊急停止に使うボタン（空なら使わない）
+# 軸（列: 前後・左右・上下・旋回）からスラスター（行: T1-T6）への混合行列（ベクタードフレーム、符号は機体の取り付けに合わせる）
+GAMEPAD_MIX_MATRIX = [
+    [1.0, -1.0, 0.0, -1.0],
+    [1.0, 1.0, 0.0, 1.0],
+    [-1.0, -1.0, 0.0, 1.0],
+    [-1.0, 1.0, 0.0, -1.0],
+    [0.0, 0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0, 0.0],
+]
+
+## 推力配分用の定数（機体座標系: x前・y右・z下、ベクタードフレームの6スラスター）
+THRUSTER_MAX_THRUST = 40.0  # スラスター1基の最大推力（N、出力100%に当たる）
+THRUSTER_POSITIONS = [  # 重心からのスラスターの位置（m、T1-T6）
+    [0.16, 0.11, 0.0],
+    [0.16, -0.11, 0.0],
+    [-0.16, 0.11, 0.0],
+    [-0.16, -0.11, 0.0],
+    [0.0, 0.11, 0.0],
+    [0.0, -0.11, 0.0],
+]
+THRUSTER_DIRECTIONS = [  # 出力が正の時に推力が向く方向（T1-T6）
+    [0.7071, -0.7071, 0.0],
+    [0.7071, 0.7071, 0.0],
+    [-0.7071, -0.7071, 0.0],
+    [-0.7071, 0.7071, 0.0],
+    [0.0, 0.0, -1.0],
+    [0.0, 0.0, -1.0],
+]
+THRUSTER_GEOMETRY = None  # 6×Nの配置行列を直接与える場合（Noneなら位置と向きから作る）
+
+## ホバリング制御用の定数
+HOVER_RATE = 100  # 制御周期（Hz）
+HOVER_SPIN_MARGIN = 0.0005  # 周期の最後はスリープせずに待つ時間（秒、OSのスリープのずれを吸収する）
+HOVER_DATA_TIMEOUT = 0.5  # 深度・IMUがこれ以上届かなければ中立にする（秒）
+HOVER_DEPTH_KP = 40.0  # 深度の比例ゲイン（N/m）
+HOVER_DEPTH_KI = 5.0  # 深度の積分ゲイン（N/(m·s)）
+HOVER_DEPTH_KD = 30.0  # 深度の微分ゲイン（N/(m/s)）
+HOVER_DEPTH_INTEGRAL_LIMIT = 30.0  # 深度の積分項の上限（N）
+HOVER_DEPTH_RATE_FILTER = 0.3  # 深度の変化率のローパスフィルタ係数（1でフィルタなし）
+HOVER_BUOYANCY_FF = 0.0  # 浮力を打ち消すフィードフォワード（N、下向き正、正の浮力なら正の値）
+HOVER_ATTITUDE_KP = 5.0  # ロール・ピッチの比例ゲイン（N·m/rad）
+HOVER_ATTITUDE_KD = 1.0  # ロール・ピッチの微分ゲイン（N·m/(rad/s)）
+HOVER_YAW_RATE_KP = 2.0  # ヨーの回転を止めるゲイン（N·m/(rad/s)）
+HOVER_ATTITUDE_FILTER = 0.98  # 姿勢の相補フィルタで角速度の積分に掛ける重み
+HOVER_HISTOGRAM_BIN_US = 100  # 周期の遅れのヒストグラムのビン幅（us）
+HOVER_HISTOGRAM_BINS = 50  # ヒストグラムのビン数（これを超えたものは範囲外としてまとめる）
 
 
 
@@ -12,6 +128,17 @@ PORT_EDIT_INFO = ["Port", "14550"]  # ポート番号の編集情報
 THRUSTER_MINIMUM = 1100
 THRUSTER_MAXIMUM = 1900
 THRUSTER_DEFAULT = 1500
+THRUSTER_COUNT = 6
+# ArduSubではRC_CHANNELS_OVERRIDEのチャンネル1-6は操縦軸（ピッチ・ロール・上下・ヨー・前後・左右）で、モーターではない
+# T1-T6を個別に動かすには、機体側で各スラスターの出力をRCパススルーにしておく必要がある
+# （例: SERVO1_FUNCTION..SERVO6_FUNCTION = 51..56（RCIN1..RCIN6）で、チャンネルnがサーボ出力nにそのまま出る）
+# この設定がないと指令は操縦軸として混ぜられ、緊急停止のサーボ出力による中立確認も当てにならない
+THRUSTER_RC_CHANNELS = [1, 2, 3, 4, 5, 6]  # T1-T6の指令を送るRC_CHANNELS_OVERRIDEのチャンネル番号（1-8、RCパススルーの入力番号）
+THRUSTER_COMMAND_RATE = 50  # スラスター指令の送信レート（Hz、指令の遅れの上限は 1/レート 秒）
+EMERGENCY_STOP_DISARM = False  # Trueにすると緊急停止で強制ディスアームも送る
+EMERGENCY_STOP_RETRY_INTERVAL = 0.1  # 緊急停止を再送する間隔（秒）
+EMERGENCY_STOP_RETRY_COUNT = 20  # 緊急停止を再送する最大回数
+EMERGENCY_STOP_NEUTRAL_TOLERANCE = 10  # サーボ出力を中立とみなす THRUSTER_DEFAULT からの差
 BAR_TITLE = "Thruster Output: %v"  
 
 GRAPH_TITLE = "Depth Graph"
@@ -21,5 +148,7 @@ GRAPH_OFFSET_X = [0, 60]  # 初期X軸範囲
 GRAPH_OFFSET_Y = [0, 100]  # 初期Y軸範
 GRAPH_MIN_HEIGHT = 200
 GRAPH_MIN_WIDTH = 400
+DEPTH_HISTORY_CAPACITY = 360000  # 深度グラフに保持するサンプル数（50Hzで約2時間）
+GRAPH_WINDOW_SECONDS = 60.0  # 深度グラフが追従して表示する直近の時間（秒）
 
 
@@ -1,5 +1,5 @@
-from pymavlink import mavutil
 from vectordive.config import base
+from vectordive.services.mavlink_client import get_client, release_client
 
 class HbWait():
     def __init__(self, ip, port):
@@ -8,13 +8,23 @@ class HbWait():
         self.timeout = base.HB_TIMEOUT
         self.succes = False
 
-    def get_success(self):
-        self.connection = mavutil.mavlink_connection(f"udpin:{self.ip}:{self.port}")
-        hb = self.connection.wait_heartbeat(timeout=self.timeout)
+    def get_success(self, callback=None):
+        # 共有接続でHeartbeatを待つ（成功時はソケットをMainWindowへ引き継ぐ）
+        # callback を渡すと待たずに戻り、結果は callback(bool) で受け取る（asyncトランスポートではこちらを使う）
+        connection_info = {'ip': self.ip, 'port': self.port, 'mode': 'UDP'}
+        client = get_client(connection_info)
+        self.connection = client.connection
 
-        if hb is None:
-            self.succes = False
-        else:
-            self.succes = True
+        def finished(success):
+            self.succes = success
+            # 失敗時は参照を返してソケットを閉じる
+            if not success:
+                release_client(connection_info)
+            if callback is not None:
+                callback(success)
 
-        return self.succes
+        if callback is not None:
+            client.wait_heartbeat(timeout=self.timeout, callback=finished)
+            return False
+        finished(client.wait_heartbeat(timeout=self.timeout))
+        return self.succes
\ No newline at end of file
@@ -1,38 +1,33 @@
-from pymavlink import mavutil
+from vectordive.config import base
+from vectordive.services.mavlink_client import get_client, release_client
 
 class GetTelemetry:
-    def __init__(self, connection_info):
+    def __init__(self, connection_info, client=None):
         self.connection_info = connection_info
-        self.connection = None
-        self.servo_output_raw_msg = None
-        self.imu_output_raw_msg = None
-        self.connection_established = False
         
-        # 接続文字列を正しく構築
-        if connection_info.get('mode') == 'UDP':
-            connection_string = f"udpin:{connection_info['ip']}:{connection_info['port']}"
-        else:
-            connection_string = f"udpin:{connection_info['ip']}:{connection_info['port']}"
+        # 機体ごとの共有接続を使う（新しいソケットは開かない）
+        self.owns_client = client is None
+        self.client = client if client is not None else get_client(connection_info)
+        self.connection = self.client.connection
+        self.connection_established = self.connection is not None
         
-        try:
-            print(f"MAVLink接続を試行中: {connection_string}")
-            self.connection = mavutil.mavlink_connection(connection_string)
-            self.connection.wait_heartbeat(timeout=5.0)
-            print("MAVLink接続が確立されました")
-            
-            # 初期データを取得
-            self.servo_output_raw_msg = self.connection.recv_match(type='SERVO_OUTPUT_RAW', blocking=False, timeout=1.0)
-            self.imu_output_raw_msg = self.connection.recv_match(type='RAW_IMU', blocking=False, timeout=1.0)
-            
-            self.connection_established = True
-            print("MAVLinkデータ取得を開始しました")
-            
-        except Exception as e:
-            print(f"MAVLink接続エラー: {e}")
-            self.connection = None
-            self.servo_output_raw_msg = None
-            self.imu_output_raw_msg = None
-            self.connection_established = False
+        # 位置推定用にRAW_IMUの全サンプルを溜める
+        self.client.cache.enable_stream('RAW_IMU', base.IMU_STREAM_MAXLEN)
+
+    @property
+    def servo_output_raw_msg(self):
+        # 受信スレッドがキャッシュした最新値を参照する
+        return self.client.latest('SERVO_OUTPUT_RAW')
+
+    @property
+    def imu_output_raw_msg(self):
+        return self.client.latest('RAW_IMU')
+
+    def close(self):
+        """共有接続の参照を返す"""
+        if self.owns_client:
+            release_client(self.connection_info)
+            self.owns_client = False
 
     def get_servo_output_raw(self):
         if self.servo_output_raw_msg:
@@ -40,22 +35,16 @@ class GetTelemetry:
         return None
     
     def get_servo_output_raw_data(self):
-        # 実際のMAVLinkデータを取得しようとする
-        try:
-            if self.connection:
-                # 最新のサーボデータを取得
-                self.servo_output_raw_msg = self.connection.recv_match(type='SERVO_OUTPUT_RAW', blocking=False, timeout=0.1)
-                if self.servo_output_raw_msg:
-                    return (
-                        getattr(self.servo_output_raw_msg, 'servo1_raw', 0), 
-                        getattr(self.servo_output_raw_msg, 'servo2_raw', 0), 
-                        getattr(self.servo_output_raw_msg, 'servo3_raw', 0), 
-                        getattr(self.servo_output_raw_msg, 'servo4_raw', 0), 
-                        getattr(self.servo_output_raw_msg, 'servo5_raw', 0), 
-                        getattr(self.servo_output_raw_msg, 'servo6_raw', 0)
-                    )
-        except Exception as e:
-            print(f"MAVLink servo data error: {e}")
+        # 共有接続が受信した最新のサーボデータを使う
+        if self.servo_output_raw_msg:
+            return (
+                getattr(self.servo_output_raw_msg, 'servo1_raw', 0), 
+                getattr(self.servo_output_raw_msg, 'servo2_raw', 0), 
+                getattr(self.servo_output_raw_msg, 'servo3_raw', 0), 
+                getattr(self.servo_output_raw_msg, 'servo4_raw', 0), 
+                getattr(self.servo_output_raw_msg, 'servo5_raw', 0), 
+                getattr(self.servo_output_raw_msg, 'servo6_raw', 0)
+            )
         
         # データが取得できない場合はデフォルト値を返す
         return (0, 0, 0, 0, 0, 0)
@@ -69,20 +58,6 @@ class GetTelemetry:
             acc_z = self.imu_output_raw_msg.zacc * 0.00981
             return acc_x, acc_y, acc_z
         else:
-            # 実際のMAVLinkデータを取得しようとする
-            try:
-                if self.connection:
-                    # 最新のIMUデータを取得
-                    self.imu_output_raw_msg = self.connection.recv_match(type='RAW_IMU', blocking=False, timeout=0.1)
-                    if self.imu_output_raw_msg:
-                        # MAVLinkのRAW_IMUデータは通常ミリG単位なので、m/s²に変換
-                        acc_x = self.imu_output_raw_msg.xacc * 0.00981
-                        acc_y = self.imu_output_raw_msg.yacc * 0.00981
-                        acc_z = self.imu_output_raw_msg.zacc * 0.00981
-                        return acc_x, acc_y, acc_z
-            except Exception as e:
-                print(f"MAVLink IMU data error: {e}")
-            
             # データが取得できない場合はモックデータを返す
             import time
             import math
@@ -95,6 +70,14 @@ class GetTelemetry:
             
             return (acc_x, acc_y, acc_z)
     
+    def get_imu_samples(self):
+        """前回呼び出し以降に受信したRAW_IMUを (time_usec, acc_x, acc_y, acc_z) のリストで取得する"""
+        samples = []
+        for msg in self.client.cache.drain('RAW_IMU'):
+            # ミリG -> m/s²
+            samples.append((msg.time_usec, msg.xacc * 0.00981, msg.yacc * 0.00981, msg.zacc * 0.00981))
+        return samples
+
     def get_imu_output_gyro_data(self):
         if self.imu_output_raw_msg:
             return self.imu_output_raw_msg.xgyro, self.imu_output_raw_msg.ygyro, self.imu_output_raw_msg.zgyro
@@ -112,7 +95,7 @@ class GetTelemetry:
         
     def is_connected(self):
         """接続状態を確認"""
-        return self.connection_established and self.connection is not None
+        return self.client.is_connected()
         
 
 if __name__ == "__main__":
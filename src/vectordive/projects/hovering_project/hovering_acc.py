@@ -0,0 +1,344 @@
+from vectordive.config import base
+from vectordive.workers.allocation import ThrustAllocator
+from vectordive.workers.depth import GetDepthData, get_sample_time
+from vectordive.workers.thruster_command import ThrusterCommandSender
+import logging
+import math
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ホバリング（深度と姿勢の保持）
+# 受信スレッドが更新する共有キャッシュから深度とRAW_IMUを読み、固定周期のスレッドで
+# 深度のPID（＋浮力のフィードフォワード）と姿勢のPD（ロール・ピッチを水平に、ヨーは回転を止める）を計算する
+# 求めた力・モーメントは ThrustAllocator でスラスターのPWMにして ThrusterCommandSender へ渡す（緊急停止中は送られない）
+#
+# 周期は絶対時刻の格子で刻み（処理時間で周期がずれていかない）、各周期の開始の遅れと処理時間をヒストグラムに残す
+# GUIの負荷がある状態で周期を守れているかは report() で確認する
+#
+# 配置によっては出せないモーメントがある（既定の配置はピッチを出せない）。start() で確かめて、
+# 出せない姿勢の軸は警告して制御から外す（擬似逆行列に渡しても捨てられるだけで、他の軸の配分を歪めることがある）
+# 深度（上下の力）を出せない配置では始めない
+
+# 制御する力・モーメントの成分（[Fx, Fy, Fz, Mx, My, Mz] の番号）
+HOVER_AXES = {'heave': 2, 'roll': 3, 'pitch': 4, 'yaw': 5}
+
+
+class JitterHistogram:
+    """時間 [s] の分布を固定幅のビンで数える（最後のビンは範囲外）"""
+
+    def __init__(self, bin_width=None, bins=None):
+        self.bin_width = bin_width if bin_width is not None else base.HOVER_HISTOGRAM_BIN_US * 1e-6
+        self.bins = bins if bins is not None else base.HOVER_HISTOGRAM_BINS
+        self.counts = np.zeros(self.bins + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value):
+        index = min(max(int(value / self.bin_width), 0), self.bins)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """q [%] 点（そのビンの上端、範囲外ならNone）"""
+        if not self.count:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), math.ceil(self.count * q / 100.0)))
+        return None if index >= self.bins else (index + 1) * self.bin_width
+
+    def format(self, width=40):
+        """空でないビンを1行ずつ並べた文字列"""
+        lines = []
+        peak = max(int(self.counts.max()), 1)
+        width_us = self.bin_width * 1e6
+        for i in np.flatnonzero(self.counts):
+            count = int(self.counts[i])
+            label = f"{i * width_us:7.0f}-{(i + 1) * width_us:<7.0f}us" if i < self.bins else f"{i * width_us:7.0f}+       us"
+            lines.append(f"{label} {count:8d} {'#' * max(1, count * width // peak)}")
+        return "\n".join(lines)
+
+    def summary(self):
+        def us(value):
+            return "overflow" if value is None else f"{value * 1e6:.0f}us"
+        return (f"n={self.count} mean={self.mean() * 1e6:.0f}us p50<={us(self.percentile(50))} "
+                f"p99<={us(self.percentile(99))} max={self.maximum * 1e6:.0f}us")
+
+
+class PeriodicScheduler(threading.Thread):
+    """callback(dt) を一定周期で呼ぶスレッド（開始の遅れと処理時間を記録する）
+
+    次の開始時刻は「最初の時刻 + k × 周期」で決め、処理が遅れても周期はずらさない。
+    周期を丸ごと過ぎた場合はその回を飛ばして次の格子に合わせ、飛ばした回数を overrun_count に数える。
+    """
+
+    def __init__(self, callback, rate=None, spin_margin=None):
+        super().__init__(daemon=True)
+        self.callback = callback
+        self.period = 1.0 / (rate if rate is not None else base.HOVER_RATE)
+        # OSのスリープは数百usずれるので、最後の spin_margin 秒はGILを譲りながら待つ
+        self.spin_margin = spin_margin if spin_margin is not None else base.HOVER_SPIN_MARGIN
+        self.stopped = threading.Event()
+        self.latency = JitterHistogram()  # 予定時刻から開始までの遅れ
+        self.duration = JitterHistogram()  # callback の処理時間
+        self.tick_count = 0
+        self.overrun_count = 0
+
+    def run(self):
+        next_time = time.perf_counter()
+        last_start = next_time
+        while not self.stopped.is_set():
+            next_time += self.period
+            self.wait_until(next_time)
+            if self.stopped.is_set():
+                break
+            start = time.perf_counter()
+            lateness = start - next_time
+            if lateness >= self.period:
+                # 間に合わなかった回は飛ばして格子に合わせる
+                missed = int(lateness // self.period)
+                self.overrun_count += missed
+                next_time += missed * self.period
+                lateness -= missed * self.period
+            self.latency.add(lateness)
+            try:
+                self.callback(start - last_start)
+            except Exception as e:
+                logger.error("周期処理のエラー: %s", e)
+            last_start = start
+            self.tick_count += 1
+            self.duration.add(time.perf_counter() - start)
+
+    def wait_until(self, deadline):
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_margin:
+            self.stopped.wait(remaining - self.spin_margin)
+        while time.perf_counter() < deadline and not self.stopped.is_set():
+            time.sleep(0)
+
+    def report(self):
+        """周期の守られ方をログに出す"""
+        logger.info("周期 %.1f ms: %d 回、飛ばした回 %d\n開始の遅れ: %s\n%s\n処理時間: %s",
+                    self.period * 1000, self.tick_count, self.overrun_count,
+                    self.latency.summary(), self.latency.format(), self.duration.summary())
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+class PID:
+    """PID制御（積分は limit で頭打ち、微分は測定値の変化率を使えば目標値の変化で跳ねない）"""
+
+    def __init__(self, kp, ki=0.0, kd=0.0, limit=None):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, error, dt, rate=None):
+        """rate は誤差の変化率（測定値の変化率の符号を反転したもの、Noneなら誤差の差分から求める）"""
+        if dt > 0:
+            self.integral += self.ki * error * dt
+            if self.limit is not None:
+                self.integral = min(max(self.integral, -self.limit), self.limit)
+            if rate is None:
+                rate = (error - self.last_error) / dt if self.last_error is not None else 0.0
+        self.last_error = error
+        return self.kp * error + self.integral + self.kd * (rate or 0.0)
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+
+
+class AttitudeEstimator:
+    """RAW_IMUの加速度と角速度からロール・ピッチを求める相補フィルタ"""
+
+    def __init__(self, gain=None):
+        self.gain = gain if gain is not None else base.HOVER_ATTITUDE_FILTER
+        self.roll = 0.0
+        self.pitch = 0.0
+        self.rates = np.zeros(3)  # 機体の角速度 [rad/s]（p, q, r）
+        self.last_time_usec = None
+
+    def update(self, msg):
+        """新しいRAW_IMUを反映する（同じサンプルなら何もしない）"""
+        if msg.time_usec == self.last_time_usec:
+            return False
+        # ミリG -> m/s²、mrad/s -> rad/s
+        ax, ay, az = msg.xacc * 0.00981, msg.yacc * 0.00981, msg.zacc * 0.00981
+        self.rates = np.array([msg.xgyro, msg.ygyro, msg.zgyro], dtype=np.float64) * 1e-3
+        # 静止時の加速度（重力の反力）の向きから求めた姿勢
+        acc_roll = math.atan2(-ay, -az)
+        acc_pitch = math.atan2(ax, math.hypot(ay, az))
+        dt = (msg.time_usec - self.last_time_usec) * 1e-6 if self.last_time_usec is not None else None
+        if dt is None or not 0 < dt <= base.IMU_MAX_GAP:
+            self.roll, self.pitch = acc_roll, acc_pitch
+        else:
+            self.roll = self.gain * (self.roll + self.rates[0] * dt) + (1 - self.gain) * acc_roll
+            self.pitch = self.gain * (self.pitch + self.rates[1] * dt) + (1 - self.gain) * acc_pitch
+        self.last_time_usec = msg.time_usec
+        return True
+
+
+class HoveringController:
+    """共有キャッシュの深度とRAW_IMUから、深度と姿勢を保つスラスター指令を一定周期で出す"""
+
+    def __init__(self, client, sender=None, allocator=None, target_depth=None, rate=None):
+        self.client = client
+        self.owns_sender = sender is None
+        self.sender = sender if sender is not None else ThrusterCommandSender(client)
+        self.allocator = allocator if allocator is not None else ThrustAllocator()
+        self.depth_data = GetDepthData(client)
+        self.attitude = AttitudeEstimator()
+        self.target_depth = target_depth
+        self.rate = rate
+
+        self.depth_pid = PID(base.HOVER_DEPTH_KP, base.HOVER_DEPTH_KI, base.HOVER_DEPTH_KD,
+                             base.HOVER_DEPTH_INTEGRAL_LIMIT)
+        self.roll_pid = PID(base.HOVER_ATTITUDE_KP, kd=base.HOVER_ATTITUDE_KD)
+        self.pitch_pid = PID(base.HOVER_ATTITUDE_KP, kd=base.HOVER_ATTITUDE_KD)
+
+        self.depth = None
+        self.depth_rate = 0.0
+        self.last_depth_sample = None  # (時刻 [s], 深度 [m])
+        self.wrench = np.zeros(6)
+        self.pwm = None
+        self.holding = False  # データが途切れて中立にしている間はFalse
+        self.axis_enabled = np.ones(6, dtype=bool)  # 配置で出せる成分だけ True（start() で決める）
+        self.scheduler = None
+
+    def set_target_depth(self, depth):
+        """保持する深度 [m] を変える（Noneなら現在の深度）"""
+        self.target_depth = depth if depth is not None else self.depth
+
+    def check_axes(self):
+        """配置で出せない軸を制御から外す（深度を出せなければ ValueError）"""
+        controllable = self.allocator.controllable_axes()
+        if not controllable[HOVER_AXES['heave']]:
+            raise ValueError("thruster geometry cannot produce heave force; depth hold is impossible")
+        for name, axis in HOVER_AXES.items():
+            if not controllable[axis]:
+                logger.warning("ホバリング: スラスターの配置では %s のモーメントを出せないので、この軸は制御しません", name)
+        self.axis_enabled = controllable
+
+    def start(self):
+        """制御を始める（目標深度が未設定なら、最初に読めた深度を保つ）"""
+        self.check_axes()
+        if self.owns_sender and not self.sender.is_alive():
+            self.sender.start()
+        self.depth_pid.reset()
+        self.roll_pid.reset()
+        self.pitch_pid.reset()
+        self.scheduler = PeriodicScheduler(self.step, self.rate)
+        self.scheduler.start()
+
+    def update_depth(self):
+        """最新の深度と、新しいサンプルが届いていれば深度の変化率を更新する（届いていればTrue）"""
+        source = self.depth_data.select_source()
+        if source is None:
+            return False
+        received_time = self.client.cache.get_received_time(source)
+        if received_time is None or time.time() - received_time > base.HOVER_DATA_TIMEOUT:
+            return False
+        msg = self.client.latest(source)
+        depth = self.depth_data.get_current_depth()
+        sample_time = get_sample_time(msg)
+        if self.last_depth_sample is not None and sample_time > self.last_depth_sample[0]:
+            rate = (depth - self.last_depth_sample[1]) / (sample_time - self.last_depth_sample[0])
+            alpha = base.HOVER_DEPTH_RATE_FILTER
+            self.depth_rate = alpha * rate + (1 - alpha) * self.depth_rate
+        if self.last_depth_sample is None or sample_time != self.last_depth_sample[0]:
+            self.last_depth_sample = (sample_time, depth)
+        self.depth = depth
+        return True
+
+    def update_attitude(self):
+        """最新のRAW_IMUで姿勢を更新する（届いていればTrue）"""
+        received_time = self.client.cache.get_received_time('RAW_IMU')
+        if received_time is None or time.time() - received_time > base.HOVER_DATA_TIMEOUT:
+            return False
+        self.attitude.update(self.client.latest('RAW_IMU'))
+        return True
+
+    def step(self, dt):
+        """1周期分の制御（PeriodicScheduler のスレッドから呼ばれる）"""
+        if not (self.update_depth() and self.update_attitude()):
+            # データが途切れたら中立にして、積分が溜まらないようにする
+            if self.holding:
+                logger.warning("ホバリング: 深度またはIMUが途切れたので中立にします")
+                self.holding = False
+                self.depth_pid.reset()
+                self.sender.set_all_pwm([base.THRUSTER_DEFAULT] * self.allocator.count)
+            return
+        if not self.holding:
+            logger.info("ホバリング: 制御を始めます（深度 %.2f m）", self.depth)
+            self.holding = True
+        if self.target_depth is None:
+            self.target_depth = self.depth
+
+        # z下向き: 目標より浅ければ下向きの力（正）を出す。浮力は HOVER_BUOYANCY_FF で打ち消す
+        heave = self.depth_pid.update(self.target_depth - self.depth, dt, -self.depth_rate) + base.HOVER_BUOYANCY_FF
+        p, q, r = self.attitude.rates
+        roll_moment = self.roll_pid.update(-self.attitude.roll, dt, -p)
+        pitch_moment = self.pitch_pid.update(-self.attitude.pitch, dt, -q)
+        yaw_moment = -base.HOVER_YAW_RATE_KP * r
+        wrench = np.array([0.0, 0.0, heave, roll_moment, pitch_moment, yaw_moment])
+        self.wrench = np.where(self.axis_enabled, wrench, 0.0)
+        self.pwm = self.allocator.allocate_pwm(self.wrench)
+        self.sender.set_all_pwm(self.pwm)
+
+    def stop(self):
+        """制御を止めてスラスターを中立に戻す"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler.report()
+            self.scheduler = None
+        self.holding = False
+        if self.owns_sender:
+            self.sender.stop()
+        else:
+            self.sender.set_all_pwm([base.THRUSTER_DEFAULT] * self.allocator.count)
+
+
+if __name__ == "__main__":
+    # 機体に接続して深度を保つ: python -m vectordive.projects.hovering_project.hovering_acc --ip 0.0.0.0 --port 14550 --depth 1.0
+    # 終了時（Ctrl+C または --duration 秒後）に周期の遅れのヒストグラムを出す
+    import argparse
+    from vectordive.services.log_pipeline import setup_logging, shutdown_logging
+    from vectordive.services.mavlink_client import get_client, release_client
+
+    parser = argparse.ArgumentParser(description="VectorDive ホバリング（深度・姿勢の保持）")
+    parser.add_argument("--mode", choices=base.MODE_COMBO + ["Replay"], default="UDP")
+    parser.add_argument("--ip", default=base.IP_EDIT_INFO[1], help="IPアドレス（シリアルの場合はデバイスパス）")
+    parser.add_argument("--port", default=base.PORT_EDIT_INFO[1], help="ポート番号（シリアルの場合はボーレート）")
+    parser.add_argument("--depth", type=float, default=None, help="保持する深度 [m]（省略すると開始時の深度）")
+    parser.add_argument("--rate", type=float, default=base.HOVER_RATE, help="制御周期 [Hz]")
+    parser.add_argument("--duration", type=float, default=None, help="制御する時間 [s]（省略するとCtrl+Cまで）")
+    args = parser.parse_args()
+    setup_logging()
+
+    connection_info = {'ip': args.ip, 'port': args.port, 'mode': args.mode}
+    client = get_client(connection_info)
+    controller = HoveringController(client, target_depth=args.depth, rate=args.rate)
+    controller.start()
+    try:
+        controller.scheduler.join(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+        release_client(connection_info)
+        shutdown_logging()
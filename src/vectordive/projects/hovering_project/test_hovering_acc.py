@@ -0,0 +1,139 @@
+import time
+import numpy as np
+import pytest
+from pymavlink import mavutil
+from vectordive.config import base
+from vectordive.projects.hovering_project.hovering_acc import (PID, HoveringController, JitterHistogram,
+                                                               PeriodicScheduler)
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.workers.allocation import ThrustAllocator
+
+
+class StubClient:
+    def __init__(self):
+        self.cache = TelemetryCache()
+
+    def latest(self, msg_type):
+        return self.cache.get(msg_type)
+
+
+class StubSender:
+    def __init__(self):
+        self.commands = []
+
+    def set_all_pwm(self, values):
+        self.commands.append([int(value) for value in values])
+
+
+def vehicle_state(client, depth, xacc=0, yacc=0, time_usec=1000):
+    """深度（VFR_HUD）と加速度（RAW_IMU、ミリG）を受信したことにする"""
+    client.cache.update(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -depth, 0))
+    client.cache.update(mavutil.mavlink.MAVLink_raw_imu_message(time_usec, xacc, yacc, -1000, 0, 0, 0, 0, 0, 0))
+
+def make_controller(allocator=None, target_depth=1.0):
+    client = StubClient()
+    sender = StubSender()
+    controller = HoveringController(client, sender, allocator, target_depth=target_depth)
+    return client, sender, controller
+
+def test_histogram_percentile_and_overflow_bin():
+    histogram = JitterHistogram(bin_width=1e-4, bins=5)
+    assert histogram.percentile(50) == 0.0
+
+    for value in (0.5e-4, 1.5e-4, 1.5e-4, 10e-4):
+        histogram.add(value)
+
+    np.testing.assert_array_equal(histogram.counts, [1, 2, 0, 0, 0, 1])
+    assert histogram.percentile(50) == pytest.approx(2e-4)
+    # 範囲外のビン（index bins）に入る点はNone
+    assert histogram.percentile(99) is None
+    assert histogram.maximum == 10e-4
+    assert histogram.mean() == pytest.approx(3.375e-4)
+    assert "overflow" in histogram.summary()
+    assert len(histogram.format().splitlines()) == 3
+
+def test_histogram_clamps_negative_values_to_the_first_bin():
+    histogram = JitterHistogram(bin_width=1e-4, bins=5)
+    histogram.add(-1e-5)
+
+    assert histogram.counts[0] == 1
+
+def test_pid_integral_limit_and_rate():
+    pid = PID(2.0, ki=1.0, kd=0.5, limit=0.3)
+
+    assert pid.update(1.0, 0.1) == pytest.approx(2.0 + 0.1)
+    for _ in range(10):
+        output = pid.update(1.0, 0.1)
+    assert pid.integral == pytest.approx(0.3)
+    assert output == pytest.approx(2.0 + 0.3)
+    # rate を渡すとその値で微分項を計算する
+    assert pid.update(1.0, 0.1, rate=-2.0) == pytest.approx(2.0 + 0.3 - 1.0)
+    pid.reset()
+    assert pid.integral == 0.0 and pid.last_error is None
+
+def test_scheduler_skips_missed_periods_instead_of_bursting():
+    period = 0.01
+    starts = []
+
+    def callback(dt):
+        starts.append(time.perf_counter())
+        if len(starts) == 3:
+            time.sleep(period * 3.2)
+
+    scheduler = PeriodicScheduler(callback, rate=1 / period)
+    scheduler.start()
+    time.sleep(0.2)
+    scheduler.stop()
+
+    assert scheduler.overrun_count >= 2
+    assert scheduler.tick_count == len(starts) == scheduler.latency.count == scheduler.duration.count
+    # 遅れた後も周期の格子に合わせて再開し、飛ばした回を続けて実行しない
+    gaps = np.diff(starts)
+    assert gaps[2] >= period * 3.2
+    assert gaps[3:].min() > period * 0.5
+
+def test_step_holds_depth_and_goes_neutral_when_data_is_stale():
+    client, sender, controller = make_controller(target_depth=1.0)
+    vehicle_state(client, depth=0.5)
+
+    controller.step(0.01)
+
+    assert controller.holding
+    # 目標より浅いので下向きの力、T5・T6は中立から動く
+    assert controller.wrench[2] > 0
+    assert sender.commands[-1][4] != base.THRUSTER_DEFAULT
+
+    client.cache.received_time['VFR_HUD'] = time.time() - base.HOVER_DATA_TIMEOUT - 0.1
+    controller.step(0.01)
+
+    assert not controller.holding
+    assert sender.commands[-1] == [base.THRUSTER_DEFAULT] * 6
+    assert controller.depth_pid.integral == 0.0
+    # 途切れている間は中立を1回だけ送る
+    controller.step(0.01)
+    assert len(sender.commands) == 2
+
+def test_default_geometry_drops_pitch_control(caplog):
+    client, sender, controller = make_controller()
+    controller.check_axes()
+
+    assert "pitch" in caplog.text
+    assert not controller.axis_enabled[4]
+    vehicle_state(client, depth=1.0, xacc=500, yacc=-500)
+    controller.step(0.01)
+
+    assert controller.attitude.pitch > 0 and controller.attitude.roll > 0
+    assert controller.wrench[4] == 0.0
+    assert controller.wrench[3] < 0
+
+def test_start_refuses_a_geometry_without_heave():
+    geometry = ThrustAllocator().geometry.copy()
+    geometry[2] = 0.0
+    _, _, controller = make_controller(ThrustAllocator(geometry))
+
+    with pytest.raises(ValueError):
+        controller.start()
+    assert controller.scheduler is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,174 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from vectordive.config import base
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+# アプリケーション全体のログ出力
+# 各スレッドはレコードをキューへ入れるだけにし、文字列の整形と出力（標準エラー・ログファイル・LogConsole）は
+# QueueListener のスレッドで行う。接続が不安定な時に毎周期出るエラーは、同じメッセージを一定時間に1回だけ出す
+# WARNING以上は引数を埋め込んだ文字列で比べ、同じ場所でも内容の違うものはまとめない
+# 緊急停止の記録など必ず残すものは extra={'no_dedup': True} を付ける
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+class DuplicateFilter(logging.Filter):
+    """同じ場所・同じ内容のメッセージを interval 秒に1回だけ通す（省略した件数は次に通す時に付ける）"""
+
+    def __init__(self, interval=None):
+        super().__init__()
+        self.interval = interval if interval is not None else base.LOG_DUPLICATE_INTERVAL
+        self.lock = threading.Lock()
+        self.last_seen = {}  # キー -> [最後に通した時刻, 省略した件数]
+
+    def filter(self, record):
+        if getattr(record, 'no_dedup', False):
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, self.get_text(record))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.last_seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            suppressed = entry[1] if entry is not None else 0
+            self.last_seen[key] = [now, 0]
+            # 古いキーが溜まり続けないよう、時間が経ったものは捨てる
+            if len(self.last_seen) > 1024:
+                self.last_seen = {k: v for k, v in self.last_seen.items() if now - v[0] < self.interval}
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    @staticmethod
+    def get_text(record):
+        """比べる文字列（INFO以下は引数を埋め込む前の書式で、毎回数値が変わるメッセージもまとめる）"""
+        if record.levelno < logging.WARNING:
+            return str(record.msg)
+        try:
+            return record.getMessage()
+        except Exception:
+            return str(record.msg)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """整形せずにレコードをキューへ入れる（QueueHandler.prepare は呼び出し元のスレッドで整形してしまう）"""
+
+    def prepare(self, record):
+        return record
+
+
+class SuppressedCountFormatter(logging.Formatter):
+    """省略した同じメッセージの件数を末尾に付ける"""
+
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" （同じメッセージ {suppressed} 件を省略）"
+        return text
+
+
+class ConsoleHandler(logging.Handler):
+    """登録されたLogConsoleへ渡す（LogConsole.add_log はどのスレッドからでも呼べる）"""
+
+    def __init__(self):
+        super().__init__()
+        self.consoles = []
+
+    def emit(self, record):
+        if not self.consoles:
+            return
+        try:
+            message = record.getMessage()
+            suppressed = getattr(record, 'suppressed', 0)
+            if suppressed:
+                message += f" （同じメッセージ {suppressed} 件を省略）"
+            if record.exc_info:
+                message += f" ({record.exc_info[1]!r})"
+        except Exception:
+            self.handleError(record)
+            return
+        for console in list(self.consoles):
+            console.add_log(message, record.levelno, record.name, record.created)
+
+
+class LogPipeline:
+    """キュー・出力先・出力スレッドをまとめたもの"""
+
+    def __init__(self, level=None, log_file=None):
+        self.queue = queue.SimpleQueue()
+        self.console_handler = ConsoleHandler()
+        formatter = SuppressedCountFormatter(LOG_FORMAT)
+
+        handlers = [self.console_handler]
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+        log_file = log_file if log_file is not None else base.LOG_FILE
+        if log_file:
+            directory = os.path.dirname(log_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file_handler = RotatingFileHandler(log_file, maxBytes=base.LOG_FILE_MAX_BYTES,
+                                               backupCount=base.LOG_FILE_BACKUP_COUNT, encoding='utf-8')
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
+        self.handlers = handlers
+
+        self.queue_handler = DeferredQueueHandler(self.queue)
+        self.queue_handler.addFilter(DuplicateFilter())
+        self.logger = logging.getLogger('vectordive')
+        self.logger.setLevel(level if level is not None else base.LOG_LEVEL)
+        self.logger.addHandler(self.queue_handler)
+        # ルートロガーへは流さない（二重に出力しない）
+        self.logger.propagate = False
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def add_console(self, console):
+        """LogConsoleを出力先に加える"""
+        self.console_handler.consoles.append(console)
+
+    def remove_console(self, console):
+        """LogConsoleを出力先から外す"""
+        if console in self.console_handler.consoles:
+            self.console_handler.consoles.remove(console)
+
+    def stop(self):
+        """キューに残ったレコードを出力してから出力スレッドを止める"""
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        self.logger.propagate = True
+        for handler in self.handlers:
+            handler.close()
+
+
+def setup_logging(level=None, log_file=None):
+    """ログ出力を開始する（2回目以降は最初のものを返す）"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline(level, log_file)
+        return _pipeline
+
+
+def get_pipeline():
+    """開始済みのログ出力（開始していなければNone）"""
+    return _pipeline
+
+
+def shutdown_logging():
+    """ログ出力を止める"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
@@ -0,0 +1,319 @@
+from pymavlink import mavutil
+from PyQt5.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+from vectordive.config import base
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.services.mavlink_transport import AsyncMavlinkLink
+from vectordive.services.telemetry_log import TelemetryRecorder, make_log_path
+from vectordive.services.telemetry_snapshot import TelemetrySnapshot
+from vectordive.workers.daemon_reader import DaemonReader
+from vectordive.workers.mavlink_reader import MavlinkReader
+from vectordive.workers.replay import ReplaySource
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 1台の機体につき1本のMAVLink接続を保持し、受信メッセージを購読者へ配信する
+# GetTelemetry / 位置推定 / テレメトリバーはすべてこの接続を共有する
+# ソケットは受信スレッドだけが読み、GUI側はキャッシュの最新値を参照する
+
+
+def build_connection_string(connection_info):
+    """接続情報からmavutil用の接続文字列を組み立てる"""
+    if connection_info.get('mode') == 'Serial':
+        # シリアルの場合は ip にデバイスパス、port にボーレートを入れる
+        return connection_info['ip']
+    if connection_info.get('mode') == 'Replay':
+        # 再生の場合は ip にtlogのパス、port に再生速度を入れる
+        return f"replay:{connection_info['ip']}"
+    if connection_info.get('mode') == 'Daemon':
+        # 配信デーモンの購読の場合は ip にUnixソケットのパスを入れる
+        return f"unix:{connection_info['ip']}"
+    return f"udpin:{connection_info['ip']}:{connection_info['port']}"
+
+
+def get_baudrate(connection_info):
+    """シリアル接続のボーレートを取得する"""
+    if connection_info.get('mode') == 'Serial':
+        try:
+            return int(connection_info['port'])
+        except (KeyError, ValueError):
+            pass
+    return base.SERIAL_BAUDRATE
+
+
+def open_connection(connection_info):
+    """接続情報からmavutilの接続を開く"""
+    return mavutil.mavlink_connection(build_connection_string(connection_info),
+                                      baud=get_baudrate(connection_info))
+
+
+class MavlinkClient(QObject):
+    """MAVLink接続を1本だけ保持するリンクマネージャー"""
+
+    # 更新されたメッセージタイプ（GUIスレッドで上限レート付きで発行）
+    message_updated = pyqtSignal(str)
+
+    def __init__(self, connection_info, parent=None):
+        super().__init__(parent)
+        self.connection_info = connection_info
+        self.connection_string = build_connection_string(connection_info)
+        self.connection = None
+        self.reader = None
+        self.cache = TelemetryCache()
+        self.subscribers = {}  # メッセージタイプ -> コールバックのリスト
+        self.ref_count = 0
+        self.last_notify_time = 0.0
+        self.recorder = None
+        self.snapshot = None
+
+        # 購読者への通知を一定レートにまとめるタイマー
+        self.notify_timer = QTimer(self)
+        self.notify_timer.timeout.connect(self.notify_subscribers)
+
+    def open(self):
+        """ソケットを開いて受信スレッドを開始する（Heartbeatは待たない）"""
+        if self.connection is not None:
+            return True
+        try:
+            logger.info("MAVLink接続を試行中: %s", self.connection_string)
+            if self.connection_info.get('mode') == 'Replay':
+                speed = float(self.connection_info.get('port') or base.REPLAY_SPEED)
+                source = ReplaySource(self.connection_info['ip'], self.cache, speed)
+                source.start()
+                self.attach(source, source)
+                return True
+            if self.connection_info.get('mode') == 'Daemon':
+                reader = DaemonReader(self.connection_info['ip'], self.cache)
+                reader.start()
+                self.attach(reader, reader)
+                return True
+            if base.LINK_TRANSPORT == 'async':
+                self.attach_async()
+                return True
+            connection = open_connection(self.connection_info)
+            reader = MavlinkReader(connection, self.cache)
+            reader.start()
+            self.attach(connection, reader)
+            return True
+        except Exception as e:
+            logger.error("MAVLink接続エラー: %s", e)
+            self.connection = None
+            self.reader = None
+            return False
+
+    def attach(self, connection, reader):
+        """開いている接続と受信スレッドを引き継ぐ（接続確認済みのソケットを再利用する）"""
+        self.connection = connection
+        self.reader = reader
+        self.cache = reader.cache
+        # Qtのイベントループがない場合（スクリプト利用時）はキャッシュ参照のみ
+        if QCoreApplication.instance() is not None:
+            self.notify_timer.start(base.LINK_NOTIFY_INTERVAL_MS)
+        self.start_auto_recording()
+
+    def attach_async(self, connection=None):
+        """Qtのイベントループ上で動くイベント駆動の接続に切り替える（受信スレッドなし）
+
+        connection を渡すと、そのmavutil接続が開いているソケットを引き継ぐ
+        """
+        link = AsyncMavlinkLink(self.connection_info, self.cache, self.on_message_arrived)
+        link.open(connection.port if connection is not None else None)
+        self.connection = link
+        self.reader = None
+        if QCoreApplication.instance() is not None:
+            self.notify_timer.start(base.LINK_NOTIFY_INTERVAL_MS)
+        self.start_auto_recording()
+
+    def start_auto_recording(self):
+        """設定で有効な場合は接続時に記録と共有メモリへの公開を開始する（再生中は記録しない）"""
+        if base.RECORD_TELEMETRY and self.connection_info.get('mode') != 'Replay':
+            self.start_recording()
+        if base.PUBLISH_SNAPSHOT:
+            self.start_snapshot()
+
+    def start_snapshot(self, name=None):
+        """最新状態の共有メモリへの公開を開始する"""
+        if self.snapshot is not None:
+            return True
+        try:
+            self.snapshot = TelemetrySnapshot.create(name)
+        except FileExistsError:
+            # 配信デーモンなど、他のプロセスが既に公開している
+            logger.warning("共有メモリは他のプロセスが公開中のため、このプロセスからは公開しません")
+            return False
+        self.cache.add_sink(self.snapshot)
+        return True
+
+    def stop_snapshot(self):
+        """共有メモリへの公開を停止して削除する"""
+        if self.snapshot is None:
+            return
+        self.cache.remove_sink(self.snapshot)
+        self.snapshot.close()
+        self.snapshot = None
+
+    def start_recording(self, path=None):
+        """受信した全フレームのtlogへの記録を開始する"""
+        if self.recorder is not None:
+            return self.recorder.path
+        try:
+            self.recorder = TelemetryRecorder(path if path is not None else make_log_path())
+        except OSError as e:
+            logger.error("テレメトリ記録エラー: %s", e)
+            return None
+        self.cache.add_sink(self.recorder)
+        logger.info("テレメトリを記録中: %s", self.recorder.path)
+        return self.recorder.path
+
+    def stop_recording(self):
+        """記録を停止してファイルを閉じる"""
+        if self.recorder is None:
+            return
+        self.cache.remove_sink(self.recorder)
+        self.recorder.close()
+        self.recorder = None
+
+    def on_message_arrived(self):
+        """イベント駆動の接続でパケットが届いた時の処理（通知間隔の範囲内で即座に配信）"""
+        if time.perf_counter() - self.last_notify_time >= base.LINK_NOTIFY_INTERVAL_MS / 1000.0:
+            self.notify_subscribers()
+
+    def close(self):
+        """受信スレッドを止めてソケットを閉じる"""
+        self.notify_timer.stop()
+        self.stop_recording()
+        self.stop_snapshot()
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                logger.error("MAVLink切断エラー: %s", e)
+        self.connection = None
+        self.cache.clear()
+
+    def wait_heartbeat(self, timeout=None, callback=None):
+        """Heartbeatを受信するまで待機する（ソケットは受信スレッドが読む）
+
+        callback を渡すと待たずに戻り、受信できたかどうか（bool）を後から callback に渡す。
+        asyncトランスポートではGUIスレッドのイベントループが受信するため、callback なしでは待たず、
+        既に受信しているかどうかだけを返す。
+        """
+        if self.connection is None and not self.open():
+            if callback is not None:
+                callback(False)
+            return False
+        timeout = timeout if timeout is not None else base.HB_TIMEOUT
+        since = time.time() - base.HB_TIMEOUT
+        if callback is not None:
+            self.poll_heartbeat(time.time() + timeout, since, callback)
+            return False
+        if isinstance(self.connection, AsyncMavlinkLink):
+            # ここでブロックするとイベントループが止まり、Heartbeatを受信できない
+            logger.warning("asyncトランスポートではHeartbeatを待てません（callback を渡してください）")
+            received_time = self.cache.get_received_time('HEARTBEAT')
+            return received_time is not None and received_time > since
+        return self.cache.wait_for('HEARTBEAT', timeout, since) is not None
+
+    def poll_heartbeat(self, deadline, since, callback):
+        """イベントループを止めずに PROBE_POLL_INTERVAL ごとにHeartbeatの受信を確認する"""
+        received_time = self.cache.get_received_time('HEARTBEAT')
+        if received_time is not None and received_time > since:
+            callback(True)
+        elif time.time() >= deadline:
+            callback(False)
+        else:
+            QTimer.singleShot(int(base.PROBE_POLL_INTERVAL * 1000),
+                              lambda: self.poll_heartbeat(deadline, since, callback))
+
+    def subscribe(self, msg_type, callback):
+        """メッセージタイプごとにコールバックを登録する"""
+        callbacks = self.subscribers.setdefault(msg_type, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def unsubscribe(self, msg_type, callback):
+        """コールバックの登録を解除する"""
+        callbacks = self.subscribers.get(msg_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def latest(self, msg_type):
+        """最新メッセージを取得する（ソケットには触れない）"""
+        return self.cache.get(msg_type)
+
+    def notify_subscribers(self):
+        """前回以降に更新されたタイプの最新メッセージを購読者へ配信する"""
+        self.last_notify_time = time.perf_counter()
+        for msg_type in self.cache.pop_updated():
+            msg = self.cache.get(msg_type)
+            if msg is None:
+                continue
+            for callback in list(self.subscribers.get(msg_type, [])):
+                try:
+                    callback(msg)
+                except Exception as e:
+                    logger.error("MAVLink購読者エラー (%s): %s", msg_type, e)
+            self.message_updated.emit(msg_type)
+
+    def is_connected(self):
+        """直近のHeartbeatがタイムアウト内に届いているか"""
+        if self.connection is None:
+            return False
+        last_heartbeat_time = self.cache.get_received_time('HEARTBEAT')
+        if last_heartbeat_time is None:
+            return False
+        return time.time() - last_heartbeat_time < base.HB_TIMEOUT
+
+
+# 接続文字列 -> MavlinkClient
+_clients = {}
+
+
+def get_client(connection_info):
+    """接続情報に対応する共有MavlinkClientを取得する（なければ作成して開く）"""
+    connection_string = build_connection_string(connection_info)
+    client = _clients.get(connection_string)
+    if client is None:
+        client = MavlinkClient(connection_info)
+        _clients[connection_string] = client
+    if client.connection is None:
+        client.open()
+    client.ref_count += 1
+    return client
+
+
+def register_client(connection_info, connection, reader):
+    """接続確認済みの接続を共有MavlinkClientとして登録する（参照を1つ持った状態で返す）"""
+    connection_string = build_connection_string(connection_info)
+    client = _clients.get(connection_string)
+    if client is not None and client.connection is not None:
+        # 既に同じ接続先が開いている場合は新しい接続を閉じて既存のものを使う
+        reader.stop()
+        connection.close()
+    else:
+        client = MavlinkClient(connection_info)
+        if base.LINK_TRANSPORT == 'async':
+            # 受信スレッドを止め、Heartbeatを受信したソケットをイベント駆動で引き継ぐ
+            reader.stop()
+            client.attach_async(connection)
+        else:
+            client.attach(connection, reader)
+        _clients[connection_string] = client
+    client.ref_count += 1
+    return client
+
+
+def release_client(connection_info):
+    """共有MavlinkClientの参照を解放する（最後の参照で接続を閉じる）"""
+    connection_string = build_connection_string(connection_info)
+    client = _clients.get(connection_string)
+    if client is None:
+        return
+    client.ref_count -= 1
+    if client.ref_count <= 0:
+        client.close()
+        del _clients[connection_string]
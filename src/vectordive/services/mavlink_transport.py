@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import socket
+import time
+from pymavlink import mavutil
+from PyQt5.QtCore import QSocketNotifier
+from vectordive.config import base
+
+logger = logging.getLogger(__name__)
+
+# 受信スレッドを使わず、Qtのイベントループ上でパケット到着時にだけ処理するMAVLinkトランスポート
+# qasyncのイベントループが動いていればasyncioのトランスポートとして、
+# 動いていなければQSocketNotifierで同じプロトコルを駆動する
+
+
+def get_running_loop():
+    """このスレッドで動いているasyncioのイベントループを取得する（なければNone）"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class MavlinkParserMixin:
+    """受信バイト列をpymavlinkでデコードしてキャッシュへ書き込む"""
+
+    def init_parser(self, cache, on_message=None):
+        self.cache = cache
+        self.on_message = on_message
+        self.parser = mavutil.mavlink.MAVLink(None)
+        self.parser.robust_parsing = True
+
+    def feed(self, data):
+        msgs = self.parser.parse_buffer(data)
+        if not msgs:
+            return
+        now = time.time()
+        for msg in msgs:
+            if msg.get_type() == 'BAD_DATA':
+                continue
+            # mavutilの接続と同様に受信時刻を付ける
+            msg._timestamp = now
+            self.cache.update(msg)
+        if self.on_message is not None:
+            self.on_message()
+
+
+class MavlinkDatagramProtocol(MavlinkParserMixin, asyncio.DatagramProtocol):
+    """UDP受信用のasyncioプロトコル"""
+
+    def __init__(self, cache, on_message=None):
+        self.init_parser(cache, on_message)
+        self.transport = None
+        self.last_address = None  # udpinと同様に最後の送信元へ返信する
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.last_address = addr
+        self.feed(data)
+
+    def error_received(self, exc):
+        logger.error("MAVLink UDP受信エラー: %s", exc)
+
+    def write(self, buf):
+        if self.transport is not None and self.last_address is not None:
+            self.transport.sendto(buf, self.last_address)
+
+
+class MavlinkSerialProtocol(MavlinkParserMixin, asyncio.Protocol):
+    """シリアル受信用のプロトコル（読み込み可能になった時だけ読む）"""
+
+    def __init__(self, port, cache, on_message=None):
+        self.init_parser(cache, on_message)
+        self.port = port
+
+    def read_ready(self):
+        try:
+            data = self.port.read(self.port.in_waiting or 1)
+        except Exception as e:
+            logger.error("MAVLinkシリアル受信エラー: %s", e)
+            return
+        if data:
+            self.feed(data)
+
+    def write(self, buf):
+        self.port.write(buf)
+
+
+class QtDatagramTransport(asyncio.DatagramTransport):
+    """QSocketNotifierでUDPソケットを監視し、プロトコルへ受け渡すブリッジ"""
+
+    def __init__(self, sock, protocol):
+        super().__init__()
+        self.sock = sock
+        self.protocol = protocol
+        self.notifier = QSocketNotifier(sock.fileno(), QSocketNotifier.Read)
+        self.notifier.activated.connect(self.read_ready)
+        self.protocol.connection_made(self)
+
+    def read_ready(self):
+        # 届いているデータグラムをすべて読み切る
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.protocol.error_received(e)
+                return
+            self.protocol.datagram_received(data, addr)
+
+    def sendto(self, data, addr=None):
+        try:
+            self.sock.sendto(data, addr)
+        except OSError as e:
+            self.protocol.error_received(e)
+
+    def close(self):
+        self.notifier.setEnabled(False)
+        self.sock.close()
+
+
+class AsyncMavlinkLink:
+    """イベント駆動のMAVLink接続（mavutilの接続と同様に .mav で送信できる）"""
+
+    def __init__(self, connection_info, cache, on_message=None):
+        self.connection_info = connection_info
+        self.cache = cache
+        self.on_message = on_message
+        self.protocol = None
+        self.transport = None
+        self.endpoint_task = None  # asyncioのUDPエンドポイントを作るタスク（ループは弱参照しか持たないのでここで持つ）
+        self.error = None  # エンドポイントを作れなかった時の例外
+        self.serial_port = None
+        self.serial_notifier = None
+        self.mav = None
+
+    def open(self, port=None):
+        """ソケット（またはシリアルポート）を開いて受信を開始する
+
+        port に開いているソケット／シリアルポートを渡すとそれを引き継ぐ
+        """
+        if self.connection_info.get('mode') == 'Serial':
+            self.open_serial(port)
+        else:
+            self.open_udp(port)
+        # 送信はプロトコル経由で行う
+        self.mav = mavutil.mavlink.MAVLink(self.protocol, srcSystem=255)
+
+    def open_udp(self, sock=None):
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.connection_info['ip'], int(self.connection_info['port'])))
+        sock.setblocking(False)
+        self.protocol = MavlinkDatagramProtocol(self.cache, self.on_message)
+
+        loop = get_running_loop()
+        if loop is not None:
+            # qasyncなどでasyncioのループがQt上で動いている場合（できるまでの送信は捨てられる）
+            self.endpoint_task = asyncio.ensure_future(
+                loop.create_datagram_endpoint(lambda: self.protocol, sock=sock), loop=loop)
+            self.endpoint_task.add_done_callback(lambda task: self.endpoint_ready(task, sock))
+        else:
+            self.transport = QtDatagramTransport(sock, self.protocol)
+
+    def endpoint_ready(self, task, sock):
+        """UDPエンドポイントができた時（失敗・取り消しの時はソケットを閉じてエラーを残す）"""
+        if task.cancelled():
+            sock.close()
+            return
+        error = task.exception()
+        if error is not None:
+            self.error = error
+            logger.error("MAVLink UDPの受信を開始できません: %s", error)
+            sock.close()
+            return
+        self.transport, _ = task.result()
+
+    def open_serial(self, serial_port=None):
+        if serial_port is None:
+            import serial
+            baudrate = int(self.connection_info.get('port', base.SERIAL_BAUDRATE))
+            serial_port = serial.Serial(self.connection_info['ip'], baudrate, timeout=0)
+        self.serial_port = serial_port
+        self.protocol = MavlinkSerialProtocol(self.serial_port, self.cache, self.on_message)
+
+        loop = get_running_loop()
+        if loop is not None:
+            loop.add_reader(self.serial_port.fileno(), self.protocol.read_ready)
+        else:
+            self.serial_notifier = QSocketNotifier(self.serial_port.fileno(), QSocketNotifier.Read)
+            self.serial_notifier.activated.connect(self.protocol.read_ready)
+
+    def close(self):
+        """受信を止めて閉じる"""
+        if self.serial_port is not None:
+            loop = get_running_loop()
+            if loop is not None:
+                loop.remove_reader(self.serial_port.fileno())
+            if self.serial_notifier is not None:
+                self.serial_notifier.setEnabled(False)
+            self.serial_port.close()
+            self.serial_port = None
+        if self.endpoint_task is not None and not self.endpoint_task.done():
+            self.endpoint_task.cancel()
+        self.endpoint_task = None
+        transport = self.transport or getattr(self.protocol, 'transport', None)
+        if transport is not None:
+            transport.close()
+        self.transport = None
@@ -0,0 +1,110 @@
+from collections import deque
+import threading
+import time
+
+# 受信スレッドとGUIスレッドの間で共有する、メッセージタイプごとの最新値キャッシュ
+
+
+class TelemetryCache:
+    """メッセージタイプごとに最新のMAVLinkメッセージを保持する（スレッドセーフ）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.latest = {}  # メッセージタイプ -> 最新メッセージ
+        self.received_time = {}  # メッセージタイプ -> 受信時刻（time.time()）
+        self.counts = {}  # メッセージタイプ -> 受信数
+        self.updated_types = set()  # 前回pop_updated以降に更新されたタイプ
+        self.streams = {}  # メッセージタイプ -> 全サンプルを溜めるキュー（enable_streamで有効化）
+        self.sinks = ()  # 受信した全メッセージを渡す先（記録・配信など。write(msg) を持つ）
+
+    def update(self, msg):
+        """受信メッセージで最新値を更新する（受信スレッドから呼ばれる）"""
+        msg_type = msg.get_type()
+        with self.condition:
+            self.latest[msg_type] = msg
+            self.received_time[msg_type] = time.time()
+            self.counts[msg_type] = self.counts.get(msg_type, 0) + 1
+            self.updated_types.add(msg_type)
+            stream = self.streams.get(msg_type)
+            if stream is not None:
+                stream.append(msg)
+            self.condition.notify_all()
+        for sink in self.sinks:
+            sink.write(msg)
+
+    def get(self, msg_type):
+        """最新メッセージを取得する（なければNone）"""
+        with self.lock:
+            return self.latest.get(msg_type)
+
+    def get_received_time(self, msg_type):
+        """最新メッセージの受信時刻を取得する（なければNone）"""
+        with self.lock:
+            return self.received_time.get(msg_type)
+
+    def get_count(self, msg_type):
+        """受信数を取得する"""
+        with self.lock:
+            return self.counts.get(msg_type, 0)
+
+    def snapshot(self):
+        """全タイプの最新メッセージのコピーを取得する"""
+        with self.lock:
+            return dict(self.latest)
+
+    def pop_updated(self):
+        """前回呼び出し以降に更新されたタイプを取得してクリアする"""
+        with self.lock:
+            updated = self.updated_types
+            self.updated_types = set()
+            return updated
+
+    def add_sink(self, sink):
+        """受信した全メッセージを渡す先を追加する（受信スレッドから write(msg) が呼ばれる）"""
+        with self.lock:
+            if sink not in self.sinks:
+                self.sinks = self.sinks + (sink,)
+
+    def remove_sink(self, sink):
+        """メッセージを渡す先を削除する"""
+        with self.lock:
+            self.sinks = tuple(s for s in self.sinks if s is not sink)
+
+    def enable_stream(self, msg_type, maxlen):
+        """最新値だけでなく全サンプルを溜めるタイプを登録する（古いものから捨てる）"""
+        with self.lock:
+            if msg_type not in self.streams:
+                self.streams[msg_type] = deque(maxlen=maxlen)
+
+    def drain(self, msg_type):
+        """溜まっているサンプルを受信順にすべて取り出す"""
+        with self.lock:
+            stream = self.streams.get(msg_type)
+            if not stream:
+                return []
+            samples = list(stream)
+            stream.clear()
+            return samples
+
+    def wait_for(self, msg_type, timeout, since=None):
+        """指定タイプのメッセージをsince以降に受信するまで待つ"""
+        deadline = time.time() + timeout
+        since = since if since is not None else 0.0
+        with self.condition:
+            while self.received_time.get(msg_type, 0.0) <= since:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.latest[msg_type]
+
+    def clear(self):
+        """キャッシュを空にする"""
+        with self.lock:
+            self.latest.clear()
+            self.received_time.clear()
+            self.counts.clear()
+            self.updated_types.clear()
+            for stream in self.streams.values():
+                stream.clear()
@@ -0,0 +1,80 @@
+from vectordive.config import base
+from vectordive.services.mavlink_client import build_connection_string, open_connection
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.services.telemetry_fanout import TelemetryFanout
+from vectordive.services.telemetry_snapshot import TelemetrySnapshot
+from vectordive.workers.mavlink_reader import MavlinkReader
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# GUIなしで機体との接続を1本だけ持ち、ローカルの複数のGUI・記録ツールへ配信するデーモン
+# （udpin:0.0.0.0:14550 をbindできるのは1プロセスだけなので、操縦者・副操縦者・記録用の端末はこれを購読する）
+
+
+class TelemetryDaemon:
+    """機体との接続と、購読者への配信スレッドをまとめて管理する"""
+
+    def __init__(self, connection_info, socket_path=None):
+        self.connection_info = connection_info
+        self.socket_path = socket_path if socket_path is not None else base.DAEMON_SOCKET_PATH
+        self.cache = TelemetryCache()
+        self.connection = None
+        self.reader = None
+        self.fanout = None
+        self.snapshot = None
+        self.write_lock = threading.Lock()
+
+    def start(self):
+        """機体との接続を開き、受信スレッドと配信スレッドを開始する（同じソケットでデーモンが動いていれば RuntimeError）"""
+        # 先にソケットを確保して、2つ目のデーモンが機体との接続を開く前に止まるようにする
+        self.fanout = TelemetryFanout(self.socket_path, self.write_upstream,
+                                      lambda: list(self.cache.snapshot().values()))
+        logger.info("MAVLink接続を開いています: %s", build_connection_string(self.connection_info))
+        self.connection = open_connection(self.connection_info)
+        self.cache.add_sink(self.fanout)
+        self.fanout.start()
+        if base.PUBLISH_SNAPSHOT:
+            try:
+                self.snapshot = TelemetrySnapshot.create()
+                self.cache.add_sink(self.snapshot)
+            except FileExistsError:
+                # GUIなど、他のプロセスが既に公開している
+                logger.warning("共有メモリは他のプロセスが公開中のため、このデーモンからは公開しません")
+        self.reader = MavlinkReader(self.connection, self.cache)
+        self.reader.start()
+        logger.info("購読者の接続を待っています: %s", self.socket_path)
+
+    def write_upstream(self, frame):
+        """購読者から届いたフレームを機体へ送る"""
+        with self.write_lock:
+            self.connection.write(frame)
+
+    def run_forever(self, status_interval=None):
+        """停止されるまで一定間隔で状態を表示する"""
+        status_interval = status_interval if status_interval is not None else base.DAEMON_STATUS_INTERVAL
+        last_count = 0
+        while not self.reader.stopped.wait(status_interval):
+            count = sum(self.cache.counts.values())
+            heartbeat_time = self.cache.get_received_time('HEARTBEAT')
+            link = "OK" if heartbeat_time and time.time() - heartbeat_time < base.HB_TIMEOUT else "no heartbeat"
+            subscribers = ", ".join(f"#{number}: queued {queued}B dropped {dropped}"
+                                    for number, queued, dropped, _ in self.fanout.get_stats())
+            logger.info("link %s, %.0f msg/s, subscribers [%s]",
+                        link, (count - last_count) / status_interval, subscribers)
+            last_count = count
+
+    def stop(self):
+        """受信と配信を止めて接続を閉じる"""
+        if self.reader is not None:
+            self.reader.stop()
+        if self.fanout is not None:
+            self.cache.remove_sink(self.fanout)
+            self.fanout.stop()
+        if self.snapshot is not None:
+            self.cache.remove_sink(self.snapshot)
+            self.snapshot.close()
+        if self.connection is not None:
+            self.connection.close()
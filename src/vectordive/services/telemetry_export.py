@@ -0,0 +1,133 @@
+from vectordive.config import base
+from vectordive.services.telemetry_log import TelemetryLog, get_frame_msgid, get_msgid
+from vectordive.workers.depth import get_depth_value
+import numpy as np
+import os
+
+# 記録したtlogをメッセージタイプごとの列（.npy）に書き出す
+# 1回目はフレームのヘッダだけを見てタイプごとのレコード数を数え、出力をメモリマップで確保してから
+# 2回目で必要なタイプだけデコードして埋める
+# （ログが数GBでもメモリ使用量は一定で、書き出した列は np.load(mmap_mode='r') でコピーなしに読める）
+
+# 出力するタイプと列（フィールド名, dtype）
+EXPORT_COLUMNS = {
+    'SERVO_OUTPUT_RAW': [(f"servo{i}_raw", np.uint16) for i in range(1, 7)],
+    'RAW_IMU': [('time_usec', np.uint64)] + [(f"{axis}{sensor}", np.int16)
+                                            for sensor in ('acc', 'gyro', 'mag') for axis in 'xyz'],
+}
+PROGRESS_INTERVAL = 100000  # 進捗を表示するメッセージ数の間隔
+
+
+def count_msgids(log):
+    """メッセージIDごとのレコード数を数える（デコードはしない）"""
+    counts = {}
+    for _, _, frame_start, _ in log.iter_records():
+        msgid = get_frame_msgid(log.data, frame_start)
+        counts[msgid] = counts.get(msgid, 0) + 1
+    return counts
+
+
+def get_depth_type(counts):
+    """ログに含まれる深度のメッセージのうち、優先順位の最も高いタイプ"""
+    for msg_type in base.DEPTH_MESSAGE_TYPES:
+        if counts.get(get_msgid(msg_type), 0) > 0:
+            return msg_type
+    return None
+
+
+def export_columns(log_path, output_dir=None, verbose=True):
+    """tlogを列ファイルに書き出し、出力先のディレクトリを返す
+
+    <出力先>/<タイプ>/time.npy（記録時刻 [s]）と各フィールドの .npy を作る
+    深度は <出力先>/depth/time.npy, depth.npy（m、下向き正）
+    """
+    output_dir = output_dir if output_dir is not None else os.path.splitext(log_path)[0] + "_columns"
+    log = TelemetryLog(log_path)
+    try:
+        counts = count_msgids(log)
+
+        # タイプ -> (列名 -> メモリマップ, 値を書く列のリスト, 値を取り出す関数)
+        writers = {}
+        for msg_type, columns in EXPORT_COLUMNS.items():
+            count = counts.get(get_msgid(msg_type), 0)
+            arrays = open_columns(os.path.join(output_dir, msg_type.lower()), count,
+                                  [('time', np.float64)] + columns)
+            fields = [name for name, _ in columns]
+            writers[msg_type] = (arrays, [arrays[f] for f in fields],
+                                 lambda msg, fields=fields: [getattr(msg, f) for f in fields])
+
+        depth_type = get_depth_type(counts)
+        if depth_type is not None:
+            count = counts[get_msgid(depth_type)]
+            arrays = open_columns(os.path.join(output_dir, 'depth'), count,
+                                  [('time', np.float64), ('depth', np.float64)])
+            writers[depth_type] = (arrays, [arrays['depth']], lambda msg: [get_depth_value(msg)])
+
+        # 書き出すタイプのレコードだけをログの順に1回読む
+        msgids = {get_msgid(msg_type) for msg_type in writers}
+        total = sum(counts.get(msgid, 0) for msgid in msgids)
+        cursors = dict.fromkeys(writers, 0)
+        for n, (timestamp, msg) in enumerate(log.iter_messages(msgids=msgids), 1):
+            msg_type = msg.get_type()
+            arrays, value_arrays, get_values = writers[msg_type]
+            row = cursors[msg_type]
+            arrays['time'][row] = timestamp
+            for array, value in zip(value_arrays, get_values(msg)):
+                array[row] = value
+            cursors[msg_type] = row + 1
+            if verbose and n % PROGRESS_INTERVAL == 0:
+                print(f"{n}/{total} messages")
+
+        for msg_type, (arrays, _, _) in writers.items():
+            for array in arrays.values():
+                array.flush()
+            # CRCエラーなどでデコードできなかった行は切り詰める
+            if cursors[msg_type] < len(arrays['time']):
+                truncate_columns(arrays, cursors[msg_type])
+            if verbose:
+                print(f"{msg_type}: {cursors[msg_type]} rows")
+        del writers
+    finally:
+        log.close()
+    return output_dir
+
+
+def open_columns(directory, count, columns):
+    """列ごとに長さ count の .npy をメモリマップで作る"""
+    os.makedirs(directory, exist_ok=True)
+    return {name: np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode='w+',
+                                            dtype=dtype, shape=(count,))
+            for name, dtype in columns}
+
+
+def truncate_columns(arrays, count):
+    """列ファイルを先頭 count 行だけにする（別ファイルに書いて置き換える）"""
+    for array in arrays.values():
+        path = array.filename
+        with open(path + ".tmp", 'wb') as f:
+            np.save(f, array[:count])
+        os.replace(path + ".tmp", path)
+
+
+def load_columns(directory):
+    """書き出した列をメモリマップで読み込む（タイプ -> 列名 -> 配列）"""
+    tables = {}
+    for table in sorted(os.listdir(directory)):
+        table_dir = os.path.join(directory, table)
+        if not os.path.isdir(table_dir):
+            continue
+        tables[table] = {os.path.splitext(name)[0]: np.load(os.path.join(table_dir, name), mmap_mode='r')
+                         for name in sorted(os.listdir(table_dir)) if name.endswith(".npy")}
+    return tables
+
+
+if __name__ == "__main__":
+    # python -m vectordive.services.telemetry_export dive.tlog [出力先]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="記録したtlogをメッセージタイプごとの .npy 列に書き出す")
+    parser.add_argument("log", help="tlogファイル")
+    parser.add_argument("output", nargs="?", help="出力先ディレクトリ（既定: <ログ名>_columns）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    args = parser.parse_args()
+    print(f"書き出し先: {export_columns(args.log, args.output, verbose=not args.quiet)}")
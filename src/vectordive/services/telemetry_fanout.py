@@ -0,0 +1,216 @@
+from collections import deque
+from vectordive.config import base
+from vectordive.services.telemetry_log import make_record, split_frames
+import logging
+import os
+import selectors
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 受信した生フレームをUnixソケットで複数のローカル購読者へ配信する
+# 購読者へはtlog形式（タイムスタンプ + 生フレーム）のバイト列を流し、購読者から届いたフレーム（操縦コマンドなど）は機体へ転送する
+# 購読者ごとに送信待ちのバイト数の上限を持ち、溢れた場合はその購読者の古いレコードから捨てる
+# （遅い購読者がいても受信スレッドや他の購読者は待たない）
+
+
+class Subscriber:
+    """配信先の購読者1つ分の送信キュー"""
+
+    def __init__(self, sock, number):
+        self.sock = sock
+        self.number = number
+        self.queue = deque()  # 送信待ちのレコード
+        self.queued_bytes = 0
+        self.pending = b''  # 送信途中のバイト列（レコードの途中で捨てないよう別に持つ）
+        self.upstream = b''  # 購読者から届いた途中までのフレーム
+        self.dropped = 0  # 溢れて捨てたレコード数
+        self.sent_bytes = 0
+        self.events = selectors.EVENT_READ
+
+
+class TelemetryFanout(threading.Thread):
+    """TelemetryCacheの配信先として登録し、受信した全メッセージを購読者へ配る送信スレッド"""
+
+    def __init__(self, socket_path=None, on_upstream=None, get_snapshot=None, queue_bytes=None):
+        super().__init__(daemon=True)
+        self.socket_path = socket_path if socket_path is not None else base.DAEMON_SOCKET_PATH
+        self.on_upstream = on_upstream  # 購読者から届いたフレームを機体へ送る関数
+        self.get_snapshot = get_snapshot  # 新しい購読者へ最初に送る最新メッセージの一覧を返す関数
+        self.queue_bytes = queue_bytes if queue_bytes is not None else base.FANOUT_QUEUE_BYTES
+        self.lock = threading.Lock()
+        self.subscribers = {}  # ソケット -> Subscriber
+        self.subscriber_count = 0
+        self.stopped = threading.Event()
+        self.wake_pending = False
+
+        self.remove_stale_socket()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        # 受信スレッドから送信スレッドを起こすためのソケット
+        self.wake_receiver, self.wake_sender = socket.socketpair()
+        self.wake_receiver.setblocking(False)
+        self.wake_sender.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.wake_receiver, selectors.EVENT_READ)
+
+    def remove_stale_socket(self):
+        """前回のソケットファイルが残っていれば消す（接続できる＝デーモンが動いている時は消さずにエラーにする）"""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except ConnectionRefusedError:
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"telemetry daemon already running on {self.socket_path}")
+
+    def write(self, msg):
+        """受信したメッセージを全購読者の送信キューへ入れる（受信スレッドから呼ばれる）"""
+        if not self.subscribers or not msg.get_msgbuf():
+            return
+        record = make_record(msg)
+        with self.lock:
+            for subscriber in self.subscribers.values():
+                self.enqueue(subscriber, record)
+            if self.wake_pending:
+                return
+            self.wake_pending = True
+        try:
+            self.wake_sender.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def enqueue(self, subscriber, record):
+        """送信キューへ入れる（上限を超える分は古いレコードから捨てる、lockを持って呼ぶ）"""
+        subscriber.queue.append(record)
+        subscriber.queued_bytes += len(record)
+        while subscriber.queued_bytes > self.queue_bytes and len(subscriber.queue) > 1:
+            subscriber.queued_bytes -= len(subscriber.queue.popleft())
+            subscriber.dropped += 1
+
+    def run(self):
+        while not self.stopped.is_set():
+            for key, events in self.selector.select(base.READER_SELECT_TIMEOUT):
+                if key.fileobj is self.listener:
+                    self.accept()
+                elif key.fileobj is self.wake_receiver:
+                    self.drain_wake()
+                else:
+                    subscriber = key.data
+                    if events & selectors.EVENT_READ:
+                        self.read_upstream(subscriber)
+                    if events & selectors.EVENT_WRITE and subscriber.sock in self.subscribers:
+                        self.flush(subscriber)
+            for subscriber in list(self.subscribers.values()):
+                self.flush(subscriber)
+
+    def accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        self.subscriber_count += 1
+        subscriber = Subscriber(sock, self.subscriber_count)
+        with self.lock:
+            # 最初に各タイプの最新メッセージを送り、購読者側のキャッシュをすぐに埋める
+            if self.get_snapshot is not None:
+                for msg in self.get_snapshot():
+                    if msg.get_msgbuf():
+                        self.enqueue(subscriber, make_record(msg))
+            self.subscribers[sock] = subscriber
+        self.selector.register(sock, selectors.EVENT_READ, subscriber)
+        logger.info("購読者 #%d が接続しました", subscriber.number)
+
+    def drain_wake(self):
+        with self.lock:
+            self.wake_pending = False
+        try:
+            while self.wake_receiver.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def read_upstream(self, subscriber):
+        """購読者から届いたフレームを機体へ転送する"""
+        try:
+            data = subscriber.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.remove(subscriber)
+            return
+        frames, subscriber.upstream = split_frames(subscriber.upstream + data)
+        if self.on_upstream is None:
+            return
+        for frame in frames:
+            try:
+                self.on_upstream(frame)
+            except Exception as e:
+                logger.error("機体への転送エラー: %s", e)
+
+    def flush(self, subscriber):
+        """送信キューをソケットが受け付けるだけ送る（送り切れない分は次に書き込み可能になった時に送る）"""
+        if not subscriber.pending:
+            with self.lock:
+                if subscriber.queue:
+                    subscriber.pending = b''.join(subscriber.queue)
+                    subscriber.queue.clear()
+                    subscriber.queued_bytes = 0
+        if subscriber.pending:
+            try:
+                sent = subscriber.sock.send(subscriber.pending)
+                subscriber.pending = subscriber.pending[sent:]
+                subscriber.sent_bytes += sent
+            except BlockingIOError:
+                pass
+            except OSError:
+                self.remove(subscriber)
+                return
+        events = selectors.EVENT_READ
+        if subscriber.pending:
+            events |= selectors.EVENT_WRITE
+        if events != subscriber.events:
+            subscriber.events = events
+            self.selector.modify(subscriber.sock, events, subscriber)
+
+    def remove(self, subscriber):
+        with self.lock:
+            self.subscribers.pop(subscriber.sock, None)
+        try:
+            self.selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+        logger.info("購読者 #%d が切断しました（破棄 %d レコード）", subscriber.number, subscriber.dropped)
+
+    def get_stats(self):
+        """購読者ごとの (番号, 送信待ちバイト数, 破棄したレコード数, 送信済みバイト数)"""
+        with self.lock:
+            return [(s.number, s.queued_bytes + len(s.pending), s.dropped, s.sent_bytes)
+                    for s in self.subscribers.values()]
+
+    def stop(self, timeout=1.0):
+        """送信スレッドを止めて全購読者を切断する"""
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        for subscriber in list(self.subscribers.values()):
+            self.remove(subscriber)
+        self.selector.close()
+        self.listener.close()
+        self.wake_receiver.close()
+        self.wake_sender.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
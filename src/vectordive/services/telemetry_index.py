@@ -0,0 +1,173 @@
+from vectordive.services.telemetry_log import TelemetryLog, get_frame_msgid, get_msgid
+import logging
+import numpy as np
+import os
+
+logger = logging.getLogger(__name__)
+
+# 記録したtlogの索引（サイドカーファイル <ログ>.idx.npz）
+# ログを1回だけ先頭から読み、レコードごとの (位置, 時刻, メッセージID) を列として保存する
+# 時刻からの位置の検索は二分探索、メッセージタイプごとの位置は保存済みの配列から取り出す
+
+INDEX_SUFFIX = ".idx.npz"
+
+
+def get_index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+
+class TelemetryIndex:
+    """tlogのレコード位置の索引"""
+
+    def __init__(self, offsets, timestamps, msgids, log_size):
+        self.offsets = offsets  # レコード先頭のバイト位置 (N,)
+        self.timestamps = timestamps  # 記録時刻 [s] (N,)
+        self.msgids = msgids  # メッセージID (N,)
+        self.log_size = log_size  # 索引に含めた最後のレコードの終端（追記分だけ索引を作るのに使う）
+        # 受信時刻はまれに前後するので、検索用に単調増加にしたものを持つ
+        self.search_times = np.maximum.accumulate(timestamps) if len(timestamps) else timestamps
+        self.type_offsets = {}  # メッセージID -> そのタイプのレコード位置
+
+    @classmethod
+    def build(cls, log, start=0, chunk_size=65536):
+        """ログを1回読んで索引を作る（メモリは列の分だけ使う）"""
+        offset_chunks, time_chunks, msgid_chunks = [], [], []
+        offsets = np.empty(chunk_size, dtype=np.uint64)
+        timestamps = np.empty(chunk_size, dtype=np.float64)
+        msgids = np.empty(chunk_size, dtype=np.uint32)
+        count = 0
+        indexed_size = start
+        for offset, timestamp, frame_start, frame_end in log.iter_records(start):
+            indexed_size = frame_end
+            offsets[count] = offset
+            timestamps[count] = timestamp
+            msgids[count] = get_frame_msgid(log.data, frame_start)
+            count += 1
+            if count == chunk_size:
+                offset_chunks.append(offsets.copy())
+                time_chunks.append(timestamps.copy())
+                msgid_chunks.append(msgids.copy())
+                count = 0
+        offset_chunks.append(offsets[:count])
+        time_chunks.append(timestamps[:count])
+        msgid_chunks.append(msgids[:count])
+        return cls(np.concatenate(offset_chunks), np.concatenate(time_chunks),
+                   np.concatenate(msgid_chunks), indexed_size)
+
+    def extend(self, log):
+        """前回索引を作った後にログへ追記された分だけ索引に加える"""
+        if log.size <= self.log_size:
+            return self
+        appended = TelemetryIndex.build(log, self.log_size)
+        return TelemetryIndex(np.concatenate((self.offsets, appended.offsets)),
+                              np.concatenate((self.timestamps, appended.timestamps)),
+                              np.concatenate((self.msgids, appended.msgids)), appended.log_size)
+
+    def save(self, path):
+        # タイプごとの位置も保存しておき、読み込み時に作り直さない
+        types = {f"type_{msgid}": self.get_type_offsets(msgid) for msgid in np.unique(self.msgids)}
+        with open(path, 'wb') as f:
+            np.savez(f, offsets=self.offsets, timestamps=self.timestamps, msgids=self.msgids,
+                     log_size=np.array(self.log_size), **types)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(data['offsets'], data['timestamps'], data['msgids'], int(data['log_size']))
+            for name in data.files:
+                if name.startswith("type_"):
+                    index.type_offsets[int(name[5:])] = data[name]
+        return index
+
+    @classmethod
+    def open(cls, log):
+        """サイドカーの索引を読み込む（なければ作り、ログが伸びていれば追記分を加えて保存する）"""
+        path = get_index_path(log.path)
+        index = None
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("索引の読み込みエラー（作り直します）: %s", e)
+        if index is not None and index.log_size > log.size:
+            index = None  # ログが差し替えられた
+        if index is None:
+            index = cls.build(log)
+        elif index.log_size < log.size:
+            index = index.extend(log)
+        else:
+            return index
+        try:
+            index.save(path)
+        except OSError as e:
+            logger.error("索引の保存エラー: %s", e)
+        return index
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def start_time(self):
+        return float(self.timestamps[0]) if len(self.timestamps) else 0.0
+
+    @property
+    def end_time(self):
+        return float(self.search_times[-1]) if len(self.search_times) else 0.0
+
+    def find_position(self, timestamp):
+        """timestamp 以降の最初のレコードの番号（二分探索）"""
+        return int(np.searchsorted(self.search_times, timestamp, side='left'))
+
+    def find_offset(self, timestamp):
+        """timestamp 以降の最初のレコードのバイト位置（なければログの末尾）"""
+        position = self.find_position(timestamp)
+        if position >= len(self.offsets):
+            return self.log_size
+        return int(self.offsets[position])
+
+    def find_offset_elapsed(self, seconds):
+        """ログ開始からの経過秒数でレコード位置を探す（「47分目」など）"""
+        return self.find_offset(self.start_time + seconds)
+
+    def get_type_offsets(self, msgid):
+        """メッセージIDのレコード位置を取得する"""
+        offsets = self.type_offsets.get(msgid)
+        if offsets is None:
+            offsets = self.offsets[self.msgids == msgid]
+            self.type_offsets[msgid] = offsets
+        return offsets
+
+    def get_type_range(self, msgid, start_time=None, end_time=None):
+        """メッセージIDのレコードのうち、時刻の範囲内の位置を取得する"""
+        offsets = self.get_type_offsets(msgid)
+        start = 0 if start_time is None else np.searchsorted(offsets, self.find_offset(start_time))
+        end = len(offsets) if end_time is None else np.searchsorted(offsets, self.find_offset(end_time))
+        return offsets[start:end]
+
+    def get_types_from(self, msgids, offset=0):
+        """複数のメッセージIDのレコード位置を、offset 以降についてログの順に取得する"""
+        offsets = np.sort(np.concatenate([self.get_type_offsets(msgid) for msgid in msgids]))
+        return offsets[np.searchsorted(offsets, offset):]
+
+
+class IndexedTelemetryLog(TelemetryLog):
+    """索引付きのtlog（時刻への移動と、必要なタイプだけの読み出しができる）"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.index = TelemetryIndex.open(self)
+
+    def iter_type(self, msg_type, start_time=None, end_time=None):
+        """指定したタイプのメッセージだけを (タイムスタンプ [s], メッセージ) で順に返す"""
+        return self.iter_offsets(self.get_type_range(msg_type, start_time, end_time))
+
+    def get_type_range(self, msg_type, start_time=None, end_time=None):
+        return self.index.get_type_range(get_msgid(msg_type), start_time, end_time)
+
+    def iter_from(self, timestamp, msg_types=None):
+        """timestamp 以降のメッセージを順に返す（msg_types を渡すとそのタイプだけ）"""
+        offset = self.index.find_offset(timestamp)
+        if msg_types is None:
+            return self.iter_messages(offset)
+        msgids = [get_msgid(msg_type) for msg_type in msg_types]
+        return self.iter_offsets(self.index.get_types_from(msgids, offset))
@@ -0,0 +1,209 @@
+from pymavlink import mavutil
+from vectordive.config import base
+import mmap
+import os
+import struct
+import threading
+import time
+
+# 受信したMAVLinkフレームをそのままファイルへ記録し、後から読み出す
+# 形式はpymavlinkのtlogと同じ（8バイトのビッグエンディアンのマイクロ秒タイムスタンプ + 生フレーム）
+# なので、MAVProxyやmavlogdumpなどの既存ツールでもそのまま開ける
+
+TIMESTAMP_FORMAT = struct.Struct('>Q')
+TIMESTAMP_LEN = TIMESTAMP_FORMAT.size
+
+# フレーム長 = ヘッダ + ペイロード + CRC(2)（+ 署名）
+FRAME_OVERHEAD_V1 = mavutil.mavlink.HEADER_LEN_V1 + 2
+FRAME_OVERHEAD_V2 = mavutil.mavlink.HEADER_LEN_V2 + 2
+
+
+def get_frame_length(buf, pos):
+    """pos から始まるMAVLinkフレームの長さを返す（フレームでなければNone）"""
+    if pos + 2 > len(buf):
+        return None
+    magic = buf[pos]
+    if magic == mavutil.mavlink.PROTOCOL_MARKER_V1:
+        return buf[pos + 1] + FRAME_OVERHEAD_V1
+    if magic == mavutil.mavlink.PROTOCOL_MARKER_V2:
+        if pos + 3 > len(buf):
+            return None
+        length = buf[pos + 1] + FRAME_OVERHEAD_V2
+        if buf[pos + 2] & mavutil.mavlink.MAVLINK_IFLAG_SIGNED:
+            length += mavutil.mavlink.MAVLINK_SIGNATURE_BLOCK_LEN
+        return length
+    return None
+
+
+def get_frame_msgid(buf, pos):
+    """フレームをデコードせずにメッセージIDを読む"""
+    if buf[pos] == mavutil.mavlink.PROTOCOL_MARKER_V1:
+        return buf[pos + 5]
+    return buf[pos + 7] | (buf[pos + 8] << 8) | (buf[pos + 9] << 16)
+
+
+def split_frames(buf):
+    """バイト列から完全なMAVLinkフレームを切り出す（フレームのリスト, 残りのバイト列）"""
+    frames = []
+    pos = 0
+    while pos < len(buf):
+        length = get_frame_length(buf, pos)
+        if length is None:
+            if buf[pos] in (mavutil.mavlink.PROTOCOL_MARKER_V1, mavutil.mavlink.PROTOCOL_MARKER_V2):
+                break  # ヘッダがまだ届いていない
+            pos += 1
+            continue
+        if pos + length > len(buf):
+            break
+        frames.append(bytes(buf[pos:pos + length]))
+        pos += length
+    return frames, buf[pos:]
+
+
+def split_records(buf):
+    """tlog形式のバイト列から完全なレコードを切り出す（(タイムスタンプ [s], フレーム) のリスト, 残りのバイト列）"""
+    records = []
+    pos = 0
+    while pos + TIMESTAMP_LEN < len(buf):
+        frame_start = pos + TIMESTAMP_LEN
+        length = get_frame_length(buf, frame_start)
+        if length is None:
+            if frame_start + 3 > len(buf):
+                break
+            pos += 1
+            continue
+        if frame_start + length > len(buf):
+            break
+        (timestamp_us,) = TIMESTAMP_FORMAT.unpack_from(buf, pos)
+        records.append((timestamp_us * 1e-6, bytes(buf[frame_start:frame_start + length])))
+        pos = frame_start + length
+    return records, buf[pos:]
+
+
+def make_record(msg, timestamp=None):
+    """メッセージをtlog形式のレコード（タイムスタンプ + 生フレーム）にする"""
+    if timestamp is None:
+        timestamp = getattr(msg, '_timestamp', None) or time.time()
+    return TIMESTAMP_FORMAT.pack(int(timestamp * 1e6)) + msg.get_msgbuf()
+
+
+def get_msgid(msg_type):
+    """メッセージタイプ名からメッセージIDを取得する"""
+    return getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_type}")
+
+
+class TelemetryRecorder:
+    """受信したフレームをtlog形式で追記するレコーダー（複数スレッドから書き込める）"""
+
+    def __init__(self, path, buffer_size=None):
+        self.path = path
+        self.lock = threading.Lock()
+        buffer_size = buffer_size if buffer_size is not None else base.RECORDER_BUFFER_SIZE
+        self.file = open(path, 'ab', buffering=buffer_size)
+        self.frame_count = 0
+
+    def write(self, msg, timestamp=None):
+        """メッセージの生フレームを受信時刻とともに書き込む"""
+        if not msg.get_msgbuf():
+            return
+        record = make_record(msg, timestamp)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(record)
+            self.frame_count += 1
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def make_log_path(directory=None):
+    """記録ファイルのパスを日時から作る"""
+    directory = directory if directory is not None else base.TELEMETRY_LOG_DIR
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime("dive_%Y%m%d_%H%M%S.tlog"))
+
+
+class TelemetryLog:
+    """記録したtlogファイルをメモリマップして読み出す"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        # 空のファイルはメモリマップできない
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b''
+        self.parser = mavutil.mavlink.MAVLink(None)
+        self.parser.robust_parsing = True
+
+    def iter_records(self, offset=0, end=None):
+        """(レコードの位置, タイムスタンプ [s], フレーム開始位置, フレーム終了位置) を順に返す
+
+        壊れたレコードは1バイトずつずらして次のフレームを探す
+        """
+        data = self.data
+        end = self.size if end is None else min(end, self.size)
+        while offset + TIMESTAMP_LEN < end:
+            frame_start = offset + TIMESTAMP_LEN
+            length = get_frame_length(data, frame_start)
+            if length is None:
+                offset += 1
+                continue
+            if frame_start + length > self.size:
+                break  # 書き込み途中の最後のレコード
+            (timestamp_us,) = TIMESTAMP_FORMAT.unpack_from(data, offset)
+            yield offset, timestamp_us * 1e-6, frame_start, frame_start + length
+            offset = frame_start + length
+
+    def read_record(self, offset):
+        """offset のレコードを (タイムスタンプ [s], フレーム開始位置, フレーム終了位置) で読む（なければNone）"""
+        frame_start = offset + TIMESTAMP_LEN
+        length = get_frame_length(self.data, frame_start)
+        if length is None or frame_start + length > self.size:
+            return None
+        (timestamp_us,) = TIMESTAMP_FORMAT.unpack_from(self.data, offset)
+        return timestamp_us * 1e-6, frame_start, frame_start + length
+
+    def decode(self, frame_start, frame_end):
+        """フレームをデコードする（CRCエラーなどはNone）"""
+        try:
+            return self.parser.decode(bytearray(self.data[frame_start:frame_end]))
+        except mavutil.mavlink.MAVError:
+            return None
+
+    def iter_messages(self, offset=0, end=None, msgids=None):
+        """(タイムスタンプ [s], メッセージ) を順に返す（msgids を渡すとそのIDだけデコードする）"""
+        for _, timestamp, frame_start, frame_end in self.iter_records(offset, end):
+            if msgids is not None and get_frame_msgid(self.data, frame_start) not in msgids:
+                continue
+            msg = self.decode(frame_start, frame_end)
+            if msg is None:
+                continue
+            msg._timestamp = timestamp
+            yield timestamp, msg
+
+    def iter_offsets(self, offsets):
+        """索引から取り出したレコード位置のメッセージだけを (タイムスタンプ [s], メッセージ) で順に返す"""
+        for offset in offsets:
+            record = self.read_record(int(offset))
+            if record is None:
+                continue
+            timestamp, frame_start, frame_end = record
+            msg = self.decode(frame_start, frame_end)
+            if msg is None:
+                continue
+            msg._timestamp = timestamp
+            yield timestamp, msg
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
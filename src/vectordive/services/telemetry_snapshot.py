@@ -0,0 +1,155 @@
+from multiprocessing import resource_tracker, shared_memory
+from vectordive.config import base
+from vectordive.workers.depth import get_depth_value
+import numpy as np
+import threading
+import time
+
+# 機体の最新状態を固定レイアウトの共有メモリに置き、他のプロセス（グラフ・記録・自動操縦スクリプト）から
+# シリアライズなしで読めるようにする
+# 書き込み中は seq を奇数にし（seqlock）、読み手は seq が偶数で前後一致した時だけ読んだ値を使う
+
+SNAPSHOT_VERSION = 1
+
+# レイアウト（ProgressBar.update_from_servo_data と PositionEstimationWidget の表示項目に合わせる）
+SNAPSHOT_DTYPE = np.dtype([
+    ('seq', '<u8'),  # seqlockのカウンタ（奇数: 書き込み中）
+    ('version', '<u4'),
+    ('update_time', '<f8'),  # 最後に書き込んだ時刻（time.time()）
+    ('servo_raw', '<u2', (6,)),  # スラスターのPWM値 T1-T6
+    ('servo_time', '<f8'),
+    ('imu_acc', '<f8', (3,)),  # 加速度 [m/s²]
+    ('imu_gyro', '<f8', (3,)),  # RAW_IMUの角速度（生値）
+    ('imu_mag', '<f8', (3,)),  # RAW_IMUの磁気（生値）
+    ('imu_time_usec', '<u8'),
+    ('position', '<f8', (3,)),  # 推定位置 [m]
+    ('velocity', '<f8', (3,)),  # 推定速度 [m/s]
+    ('position_time', '<f8'),
+    ('depth', '<f8'),  # 深度 [m]
+    ('depth_time', '<f8'),
+], align=True)
+
+# このプロセスが書き手として作った共有メモリの名前
+_created_names = set()
+
+
+class TelemetrySnapshot:
+    """共有メモリ上の最新状態（書き手は1プロセス、読み手は何プロセスでもよい）"""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.state = np.ndarray((), dtype=SNAPSHOT_DTYPE, buffer=shm.buf)
+        self.write_lock = threading.Lock()  # 同じプロセス内の書き手（受信スレッドとGUIスレッド）の排他
+        self.depth_priority = len(base.DEPTH_MESSAGE_TYPES)
+
+    @classmethod
+    def create(cls, name=None):
+        """共有メモリを作って書き手になる（同じ名前が既にあればFileExistsError）"""
+        shm = shared_memory.SharedMemory(name or base.SNAPSHOT_NAME, create=True, size=SNAPSHOT_DTYPE.itemsize)
+        snapshot = cls(shm, owner=True)
+        snapshot.state[()] = np.zeros((), dtype=SNAPSHOT_DTYPE)
+        snapshot.state['version'] = SNAPSHOT_VERSION
+        _created_names.add(shm.name)
+        return snapshot
+
+    @classmethod
+    def attach(cls, name=None):
+        """既存の共有メモリを読み手として開く"""
+        shm = shared_memory.SharedMemory(name or base.SNAPSHOT_NAME)
+        # Python 3.12以前は読み手の終了時にも共有メモリが削除されてしまうので、追跡から外す
+        # （同じプロセスの書き手が作ったものは書き手が削除するので外さない）
+        if shm.name not in _created_names:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        snapshot = cls(shm, owner=False)
+        version = int(snapshot.state['version'])
+        if version != SNAPSHOT_VERSION:
+            snapshot.close()
+            raise ValueError(f"共有メモリのレイアウトが異なります: version {version}")
+        return snapshot
+
+    def publish(self, **fields):
+        """フィールドをまとめて書き込む（読み手は全フィールドが揃った状態だけを見る）"""
+        with self.write_lock:
+            state = self.state
+            if state is None:
+                # 閉じた後（受信スレッドが remove_sink 前の配信先を使っている場合）は何もしない
+                return
+            state['seq'] += 1
+            for name, value in fields.items():
+                state[name] = value
+            state['update_time'] = time.time()
+            state['seq'] += 1
+
+    def write(self, msg):
+        """受信メッセージで状態を更新する（TelemetryCacheの配信先として受信スレッドから呼ばれる）"""
+        if self.state is None:
+            return
+        msg_type = msg.get_type()
+        if msg_type == 'SERVO_OUTPUT_RAW':
+            self.publish(servo_raw=(msg.servo1_raw, msg.servo2_raw, msg.servo3_raw,
+                                    msg.servo4_raw, msg.servo5_raw, msg.servo6_raw),
+                         servo_time=time.time())
+        elif msg_type == 'RAW_IMU':
+            # ミリG -> m/s²
+            self.publish(imu_acc=(msg.xacc * 0.00981, msg.yacc * 0.00981, msg.zacc * 0.00981),
+                         imu_gyro=(msg.xgyro, msg.ygyro, msg.zgyro),
+                         imu_mag=(msg.xmag, msg.ymag, msg.zmag),
+                         imu_time_usec=msg.time_usec)
+        elif msg_type in base.DEPTH_MESSAGE_TYPES:
+            # 優先順位の高いメッセージを受信したら、それより低いものでは上書きしない
+            priority = base.DEPTH_MESSAGE_TYPES.index(msg_type)
+            if priority <= self.depth_priority:
+                self.depth_priority = priority
+                self.publish(depth=get_depth_value(msg), depth_time=time.time())
+
+    def publish_position(self, position, velocity):
+        """推定した位置と速度を書き込む"""
+        self.publish(position=position, velocity=velocity, position_time=time.time())
+
+    def read(self, timeout=1.0):
+        """一貫した状態のコピーを読む（書き込み中なら書き終わるまで読み直す）"""
+        state = self.state
+        deadline = time.perf_counter() + timeout
+        while True:
+            seq = int(state['seq'])
+            if seq % 2 == 0:
+                copy = state.copy()
+                if int(state['seq']) == seq:
+                    return copy
+            if time.perf_counter() > deadline:
+                raise TimeoutError("共有メモリの書き込みが終わりません")
+            time.sleep(0)
+
+    def close(self):
+        """共有メモリを閉じる（書き手の場合は削除する）
+
+        書き込み中の publish が終わるのを待ってから閉じ、以降の write / publish は何もしない
+        """
+        with self.write_lock:
+            if self.state is None:
+                return
+            self.state = None
+            self.shm.close()
+        if self.owner:
+            _created_names.discard(self.shm.name)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+if __name__ == "__main__":
+    # 他のプロセスから読む例: python -m vectordive.services.telemetry_snapshot
+    snapshot = TelemetrySnapshot.attach()
+    try:
+        while True:
+            state = snapshot.read()
+            print(f"seq={int(state['seq'])} servo={state['servo_raw'].tolist()} "
+                  f"acc={np.round(state['imu_acc'], 2).tolist()} depth={float(state['depth']):.2f} "
+                  f"pos={np.round(state['position'], 2).tolist()}")
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        snapshot.close()
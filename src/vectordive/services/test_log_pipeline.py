@@ -0,0 +1,67 @@
+import logging
+import pytest
+from vectordive.services.log_pipeline import DuplicateFilter
+from vectordive.workers.thruster_command import ThrusterCommandSender
+
+
+def make_record(level, msg, *args, lineno=10, **extra):
+    record = logging.LogRecord("vectordive.test", level, "test.py", lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_repeated_message_is_suppressed_and_counted():
+    dedup = DuplicateFilter(interval=60.0)
+
+    assert dedup.filter(make_record(logging.ERROR, "受信エラー: %s", "timeout"))
+    assert not dedup.filter(make_record(logging.ERROR, "受信エラー: %s", "timeout"))
+    assert not dedup.filter(make_record(logging.ERROR, "受信エラー: %s", "timeout"))
+    # 別の場所からのものはまとめない
+    assert dedup.filter(make_record(logging.ERROR, "受信エラー: %s", "timeout", lineno=20))
+
+def test_suppressed_count_is_attached_after_the_interval():
+    dedup = DuplicateFilter(interval=0.0)
+    first = make_record(logging.ERROR, "受信エラー")
+    dedup.filter(first)
+    dedup.interval = 60.0
+    assert not dedup.filter(make_record(logging.ERROR, "受信エラー"))
+    dedup.interval = 0.0
+
+    record = make_record(logging.ERROR, "受信エラー")
+    assert dedup.filter(record)
+    assert record.suppressed == 1
+    assert not hasattr(first, 'suppressed')
+
+def test_info_with_changing_arguments_is_merged():
+    dedup = DuplicateFilter(interval=60.0)
+
+    assert dedup.filter(make_record(logging.INFO, "受信 %d 件", 1))
+    assert not dedup.filter(make_record(logging.INFO, "受信 %d 件", 2))
+
+@pytest.mark.parametrize("level", [logging.WARNING, logging.ERROR])
+def test_warnings_with_different_arguments_are_kept(level):
+    dedup = DuplicateFilter(interval=60.0)
+
+    assert dedup.filter(make_record(level, "ポート %s を開けません", "/dev/ttyUSB0"))
+    assert dedup.filter(make_record(level, "ポート %s を開けません", "/dev/ttyUSB1"))
+    assert not dedup.filter(make_record(level, "ポート %s を開けません", "/dev/ttyUSB0"))
+
+def test_no_dedup_records_always_pass():
+    dedup = DuplicateFilter(interval=60.0)
+
+    for _ in range(3):
+        assert dedup.filter(make_record(logging.WARNING, "緊急停止: 押してから送信まで %.2f ms", 0.1, no_dedup=True))
+
+def test_emergency_stop_latency_is_logged_every_time(caplog):
+    dedup = DuplicateFilter(interval=60.0)
+    sender = ThrusterCommandSender(None)
+    with caplog.at_level(logging.WARNING, logger="vectordive.workers.thruster_command"):
+        for _ in range(2):
+            sender.emergency_stop(pressed_time=0.0, disarm=False)
+    sender.stop()
+
+    latency = [record for record in caplog.records if "押してから送信まで" in record.getMessage()]
+    assert len(latency) == 2
+    assert all(dedup.filter(record) for record in latency)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,112 @@
+import socket
+import pytest
+from pymavlink import mavutil
+from vectordive.services import mavlink_client
+from vectordive.services.mavlink_client import get_client, register_client, release_client
+from vectordive.services.telemetry_cache import TelemetryCache
+
+LOCAL_UDP = {'ip': '127.0.0.1', 'port': '0', 'mode': 'UDP'}
+
+
+def heartbeat():
+    mav = mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    msg = mav.heartbeat_encode(mavutil.mavlink.MAV_TYPE_SUBMARINE, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                               0, 0, 0)
+    msg.pack(mav)
+    return msg
+
+
+class StubConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class StubReader:
+    def __init__(self):
+        self.cache = TelemetryCache()
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture(autouse=True)
+def clients(monkeypatch):
+    """テストごとに共有接続の一覧を空にする"""
+    registry = {}
+    monkeypatch.setattr(mavlink_client, '_clients', registry)
+    yield registry
+    for client in list(registry.values()):
+        client.close()
+
+def test_same_vehicle_shares_one_client_until_the_last_release(clients):
+    first = get_client(LOCAL_UDP)
+    second = get_client(dict(LOCAL_UDP))
+
+    assert first is second
+    assert first.ref_count == 2
+    connection, reader = first.connection, first.reader
+    assert connection is not None and reader.is_alive()
+
+    release_client(LOCAL_UDP)
+    assert first.connection is connection
+    release_client(LOCAL_UDP)
+    assert first.connection is None and first.reader is None
+    assert not reader.is_alive()
+    assert clients == {}
+    # 登録されていないものを解放しても何もしない
+    release_client(LOCAL_UDP)
+
+def test_different_vehicles_get_different_clients():
+    first = get_client(LOCAL_UDP)
+    second = get_client({'ip': '127.0.0.1', 'port': '1', 'mode': 'Serial'})
+
+    assert first is not second
+    assert second.connection_string == '127.0.0.1'
+
+def test_heartbeat_reaches_cache_and_subscribers():
+    client = get_client(LOCAL_UDP)
+    received = []
+    client.subscribe('HEARTBEAT', received.append)
+    client.subscribe('HEARTBEAT', lambda msg: 1 / 0)  # 他の購読者のエラーで止まらない
+    client.subscribe('HEARTBEAT', received.append)
+
+    vehicle = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        vehicle.sendto(heartbeat().get_msgbuf(), client.connection.port.getsockname())
+        assert client.wait_heartbeat(timeout=2.0)
+    finally:
+        vehicle.close()
+    assert client.is_connected()
+    assert client.latest('HEARTBEAT').type == mavutil.mavlink.MAV_TYPE_SUBMARINE
+
+    client.notify_subscribers()
+    assert len(received) == 1
+    client.unsubscribe('HEARTBEAT', received.append)
+    client.cache.update(heartbeat())
+    client.notify_subscribers()
+    assert len(received) == 1
+
+def test_register_reuses_an_open_client_and_closes_the_new_link():
+    connection, reader = StubConnection(), StubReader()
+    client = register_client(LOCAL_UDP, connection, reader)
+
+    assert client.connection is connection
+    assert client.cache is reader.cache
+    assert client.ref_count == 1
+
+    duplicate_connection, duplicate_reader = StubConnection(), StubReader()
+    assert register_client(LOCAL_UDP, duplicate_connection, duplicate_reader) is client
+    assert client.ref_count == 2
+    assert duplicate_connection.closed and duplicate_reader.stopped
+    assert not connection.closed
+
+    release_client(LOCAL_UDP)
+    release_client(LOCAL_UDP)
+    assert connection.closed and reader.stopped
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,81 @@
+import asyncio
+import socket
+import pytest
+from pymavlink import mavutil
+from vectordive.services.mavlink_transport import AsyncMavlinkLink
+from vectordive.services.telemetry_cache import TelemetryCache
+
+
+def heartbeat_frame():
+    mav = mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    msg = mav.heartbeat_encode(mavutil.mavlink.MAV_TYPE_SUBMARINE, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                               0, 0, 0)
+    return bytes(msg.pack(mav))
+
+async def wait_for(condition, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+def test_async_udp_receives_and_replies():
+    async def scenario():
+        cache = TelemetryCache()
+        link = AsyncMavlinkLink({'ip': '127.0.0.1', 'port': '0', 'mode': 'UDP'}, cache)
+        link.open()
+        # エンドポイントができるまでのタスクはリンクが持ち、できたらトランスポートが入る
+        assert link.endpoint_task is not None
+        await link.endpoint_task
+        assert link.transport is not None and link.error is None
+        address = link.transport.get_extra_info('sockname')
+
+        vehicle = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        vehicle.setblocking(False)
+        try:
+            vehicle.sendto(heartbeat_frame(), address)
+            assert await wait_for(lambda: cache.get('HEARTBEAT') is not None)
+            # 最後の送信元（機体）へ返信する
+            link.mav.command_long_send(1, 1, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 0, 0, 0, 0, 0, 0, 0, 0)
+            data = await asyncio.wait_for(asyncio.get_running_loop().sock_recv(vehicle, 65535), 2.0)
+            assert mavutil.mavlink.MAVLink(None).decode(bytearray(data)).get_type() == 'COMMAND_LONG'
+        finally:
+            vehicle.close()
+            link.close()
+        assert link.transport is None
+
+    asyncio.run(scenario())
+
+def test_async_endpoint_error_is_kept_and_logged(caplog):
+    async def scenario():
+        link = AsyncMavlinkLink({'ip': '127.0.0.1', 'port': '0', 'mode': 'UDP'}, TelemetryCache())
+        # UDPでないソケットではエンドポイントを作れない
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        link.open(sock)
+        with pytest.raises(ValueError):
+            await link.endpoint_task
+        await asyncio.sleep(0)
+        assert isinstance(link.error, ValueError)
+        assert link.transport is None
+        assert sock.fileno() == -1
+        link.close()
+
+    asyncio.run(scenario())
+    assert "MAVLink UDPの受信を開始できません" in caplog.text
+
+def test_close_before_the_endpoint_exists_cancels_it():
+    async def scenario():
+        link = AsyncMavlinkLink({'ip': '127.0.0.1', 'port': '0', 'mode': 'UDP'}, TelemetryCache())
+        link.open()
+        task = link.endpoint_task
+        link.close()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert link.transport is None
+
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_cache import TelemetryCache
+
+
+def vfr_hud(alt):
+    return mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, alt, 0)
+
+def heartbeat():
+    return mavutil.mavlink.MAVLink_heartbeat_message(0, 0, 0, 0, 0, 3)
+
+
+class ListSink:
+    def __init__(self):
+        self.msgs = []
+
+    def write(self, msg):
+        self.msgs.append(msg)
+
+
+def test_update_keeps_latest_time_and_count():
+    cache = TelemetryCache()
+    assert cache.get('VFR_HUD') is None
+    assert cache.get_received_time('VFR_HUD') is None
+
+    before = time.time()
+    cache.update(vfr_hud(-1.0))
+    cache.update(vfr_hud(-2.0))
+
+    assert cache.get('VFR_HUD').alt == -2.0
+    assert cache.get_count('VFR_HUD') == 2
+    assert cache.get_received_time('VFR_HUD') >= before
+    assert set(cache.snapshot()) == {'VFR_HUD'}
+
+def test_pop_updated_reports_each_type_once():
+    cache = TelemetryCache()
+    cache.update(vfr_hud(-1.0))
+    cache.update(vfr_hud(-2.0))
+    cache.update(heartbeat())
+
+    assert cache.pop_updated() == {'VFR_HUD', 'HEARTBEAT'}
+    assert cache.pop_updated() == set()
+
+def test_sinks_receive_every_message_until_removed():
+    cache = TelemetryCache()
+    sink = ListSink()
+    cache.add_sink(sink)
+    cache.add_sink(sink)  # 同じものは1回だけ
+
+    cache.update(vfr_hud(-1.0))
+    cache.update(heartbeat())
+    cache.remove_sink(sink)
+    cache.update(vfr_hud(-2.0))
+
+    assert [msg.get_type() for msg in sink.msgs] == ['VFR_HUD', 'HEARTBEAT']
+
+def test_stream_keeps_all_samples_in_order_and_drops_the_oldest():
+    cache = TelemetryCache()
+    assert cache.drain('VFR_HUD') == []
+    cache.enable_stream('VFR_HUD', maxlen=3)
+
+    for alt in range(5):
+        cache.update(vfr_hud(-alt))
+    cache.update(heartbeat())
+
+    assert [msg.alt for msg in cache.drain('VFR_HUD')] == [-2, -3, -4]
+    assert cache.drain('VFR_HUD') == []
+    assert cache.drain('HEARTBEAT') == []
+
+def test_wait_for_returns_messages_after_since():
+    cache = TelemetryCache()
+    assert cache.wait_for('HEARTBEAT', 0.01) is None
+
+    cache.update(heartbeat())
+    received_time = cache.get_received_time('HEARTBEAT')
+    assert cache.wait_for('HEARTBEAT', 0.01).get_type() == 'HEARTBEAT'
+    # since より前に受信したものは待つ
+    assert cache.wait_for('HEARTBEAT', 0.01, since=received_time) is None
+
+    timer = threading.Timer(0.05, cache.update, args=(heartbeat(),))
+    timer.start()
+    start = time.time()
+    assert cache.wait_for('HEARTBEAT', 2.0, since=received_time) is not None
+    assert time.time() - start < 1.0
+    timer.join()
+
+def test_clear_empties_latest_and_streams():
+    cache = TelemetryCache()
+    cache.enable_stream('VFR_HUD', maxlen=3)
+    cache.update(vfr_hud(-1.0))
+
+    cache.clear()
+
+    assert cache.get('VFR_HUD') is None
+    assert cache.get_count('VFR_HUD') == 0
+    assert cache.pop_updated() == set()
+    assert cache.drain('VFR_HUD') == []
+
+if __name__ == "__main__":
+    pytest.main([__file__])
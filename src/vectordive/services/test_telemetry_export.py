@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_export import export_columns, load_columns
+from vectordive.services.telemetry_log import make_record
+
+START_TIME = 1700000000.0
+
+
+def packed(msg):
+    msg.pack(mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1))
+    return msg
+
+def raw_imu(i):
+    return packed(mavutil.mavlink.MAVLink_raw_imu_message(i * 1000, i, -i, -1000, 2 * i, 0, 0, 7, 8, 9))
+
+def servo_output(i):
+    return packed(mavutil.mavlink.MAVLink_servo_output_raw_message(0, 0, *[1500 + i + channel for channel in range(8)]))
+
+def write_log(path, corrupt=None):
+    """RAW_IMU・SERVO_OUTPUT_RAW・VFR_HUD（深度 i/10 m）を10回ずつ書く（corrupt 番目のRAW_IMUはCRCを壊す）"""
+    with open(path, 'wb') as f:
+        for i in range(10):
+            imu = make_record(raw_imu(i), START_TIME + i)
+            if i == corrupt:
+                imu = imu[:-1] + bytes([imu[-1] ^ 0xFF])
+            f.write(imu)
+            f.write(make_record(servo_output(i), START_TIME + i + 0.1))
+            hud = packed(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -i / 10, 0))
+            f.write(make_record(hud, START_TIME + i + 0.2))
+    return str(path)
+
+def test_export_writes_columns_per_type(tmp_path):
+    path = write_log(tmp_path / "dive.tlog")
+
+    output = export_columns(path, verbose=False)
+
+    assert output == str(tmp_path / "dive_columns")
+    tables = load_columns(output)
+    assert set(tables) == {'raw_imu', 'servo_output_raw', 'depth'}
+    imu = tables['raw_imu']
+    assert isinstance(imu['xacc'], np.memmap)
+    np.testing.assert_allclose(imu['time'], START_TIME + np.arange(10))
+    np.testing.assert_array_equal(imu['time_usec'], np.arange(10) * 1000)
+    np.testing.assert_array_equal(imu['xacc'], np.arange(10))
+    np.testing.assert_array_equal(imu['yacc'], -np.arange(10))
+    np.testing.assert_array_equal(imu['xgyro'], 2 * np.arange(10))
+    assert imu['xacc'].dtype == np.int16 and imu['time_usec'].dtype == np.uint64
+
+    servo = tables['servo_output_raw']
+    assert set(servo) == {'time'} | {f"servo{i}_raw" for i in range(1, 7)}
+    np.testing.assert_array_equal(servo['servo3_raw'], 1502 + np.arange(10))
+
+    depth = tables['depth']
+    np.testing.assert_allclose(depth['depth'], np.arange(10) / 10, atol=1e-6)
+    np.testing.assert_allclose(depth['time'], START_TIME + np.arange(10) + 0.2)
+
+def test_undecodable_rows_are_truncated(tmp_path):
+    path = write_log(tmp_path / "dive.tlog", corrupt=4)
+
+    output = export_columns(path, str(tmp_path / "out"), verbose=False)
+
+    imu = load_columns(output)['raw_imu']
+    assert all(len(column) == 9 for column in imu.values())
+    np.testing.assert_array_equal(imu['xacc'], [0, 1, 2, 3, 5, 6, 7, 8, 9])
+    assert not any(name.endswith(".tmp") for name in os.listdir(os.path.join(output, 'raw_imu')))
+
+def test_types_missing_from_the_log_export_empty_columns(tmp_path):
+    path = tmp_path / "imu_only.tlog"
+    with open(path, 'wb') as f:
+        f.write(make_record(raw_imu(1), START_TIME))
+
+    tables = load_columns(export_columns(str(path), verbose=False))
+
+    assert len(tables['servo_output_raw']['time']) == 0
+    assert 'depth' not in tables
+    assert list(tables['raw_imu']['xacc']) == [1]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
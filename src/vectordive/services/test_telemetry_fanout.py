@@ -0,0 +1,135 @@
+import socket
+import threading
+import time
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.services.telemetry_fanout import TelemetryFanout
+from vectordive.workers.daemon_reader import DaemonReader
+
+
+def heartbeat(custom_mode=0):
+    mav = mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    msg = mav.heartbeat_encode(mavutil.mavlink.MAV_TYPE_SUBMARINE, mavutil.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                               0, custom_mode, 0)
+    msg.pack(mav)
+    return msg
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_second_fanout_refuses_a_running_socket(tmp_path):
+    path = str(tmp_path / "d.sock")
+    fanout = TelemetryFanout(path)
+    fanout.start()
+    try:
+        with pytest.raises(RuntimeError, match="already running"):
+            TelemetryFanout(path)
+        # 動いている方のソケットは消されず、購読者がつながる
+        reader = DaemonReader(path, TelemetryCache())
+        try:
+            assert wait_until(lambda: fanout.get_stats())
+        finally:
+            reader.close()
+    finally:
+        fanout.stop()
+
+def test_stale_socket_file_is_replaced(tmp_path):
+    path = str(tmp_path / "d.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()  # ファイルだけ残る（接続すると拒否される）
+
+    fanout = TelemetryFanout(path)
+    fanout.start()
+    reader = DaemonReader(path, TelemetryCache())
+    try:
+        assert wait_until(lambda: fanout.get_stats())
+    finally:
+        reader.close()
+        fanout.stop()
+
+def test_messages_fan_out_and_commands_go_upstream(tmp_path):
+    path = str(tmp_path / "d.sock")
+    upstream = []
+    fanout = TelemetryFanout(path, on_upstream=upstream.append)
+    fanout.start()
+    cache = TelemetryCache()
+    reader = DaemonReader(path, cache)
+    reader.start()
+    try:
+        assert wait_until(lambda: fanout.get_stats())
+        fanout.write(heartbeat(custom_mode=7))
+        assert cache.wait_for('HEARTBEAT', 2.0) is not None
+        assert cache.get('HEARTBEAT').custom_mode == 7
+
+        reader.mav.command_long_send(1, 1, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 0, 0, 0, 0, 0, 0, 0, 0)
+        assert wait_until(lambda: upstream)
+        msg = mavutil.mavlink.MAVLink(None).decode(bytearray(upstream[0]))
+        assert msg.get_type() == 'COMMAND_LONG'
+    finally:
+        reader.close()
+        fanout.stop()
+
+def test_upstream_writes_wait_instead_of_cutting_a_frame(tmp_path):
+    path = str(tmp_path / "d.sock")
+    upstream = []
+    # 配信スレッドを始めるまでは上りのフレームを読まないので、ソケットのバッファが埋まって書き込みが待たされる
+    fanout = TelemetryFanout(path, on_upstream=upstream.append)
+    reader = DaemonReader(path, TelemetryCache())
+    frame = bytes(heartbeat().get_msgbuf())
+    count = 50000
+    writer = threading.Thread(target=reader.write, args=(frame * count,))
+    writer.start()
+    try:
+        time.sleep(0.2)
+        assert writer.is_alive()
+        fanout.start()
+        writer.join(5.0)
+        assert not writer.is_alive()
+        assert wait_until(lambda: len(upstream) == count, 5.0)
+        assert set(upstream) == {frame}
+    finally:
+        reader.close()
+        fanout.stop()
+
+def test_slow_subscriber_drops_old_records_without_holding_back_others(tmp_path):
+    path = str(tmp_path / "d.sock")
+    latest = heartbeat(custom_mode=1)
+    fanout = TelemetryFanout(path, get_snapshot=lambda: [latest], queue_bytes=4096)
+    fanout.start()
+    slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect(path)  # 読まない購読者
+    cache = TelemetryCache()
+    fast = DaemonReader(path, cache)
+    fast.start()
+    try:
+        # 接続するとまず最新値が届く
+        assert cache.wait_for('HEARTBEAT', 2.0) is not None
+        assert wait_until(lambda: len(fanout.get_stats()) == 2)
+
+        start = time.perf_counter()
+        count = 50000
+        for i in range(count):
+            fanout.write(heartbeat(custom_mode=i))
+        # 受信スレッド側（write）は購読者を待たない
+        assert time.perf_counter() - start < 5.0
+
+        assert wait_until(lambda: cache.get('HEARTBEAT').custom_mode == count - 1, 5.0)
+        stats = {number: (queued, dropped) for number, queued, dropped, _ in fanout.get_stats()}
+        slow_queued, slow_dropped = stats[1]
+        assert slow_dropped > 0
+        assert slow_queued <= 4096 + 65536
+    finally:
+        fast.close()
+        slow.close()
+        fanout.stop()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.services.telemetry_index import IndexedTelemetryLog, TelemetryIndex, get_index_path
+from vectordive.services.telemetry_log import TelemetryLog, TelemetryRecorder, get_msgid
+from vectordive.workers.replay import ReplaySource
+
+START_TIME = 1700000000.0
+
+
+def packed(msg):
+    msg.pack(mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1))
+    return msg
+
+def record(path, start, stop):
+    """1秒おきに、偶数秒はRAW_IMU・奇数秒はVFR_HUDを追記する（xacc と alt に秒数を入れる）"""
+    recorder = TelemetryRecorder(str(path))
+    for second in range(start, stop):
+        if second % 2 == 0:
+            msg = mavutil.mavlink.MAVLink_raw_imu_message(second, second, 0, 0, 0, 0, 0, 0, 0, 0)
+        else:
+            msg = mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -second, 0)
+        recorder.write(packed(msg), START_TIME + second)
+    recorder.close()
+    return str(path)
+
+def second_of(msg):
+    return msg.xacc if msg.get_type() == 'RAW_IMU' else int(-msg.alt)
+
+def test_index_columns_match_the_log(tmp_path):
+    path = record(tmp_path / "dive.tlog", 0, 100)
+    log = TelemetryLog(path)
+    try:
+        index = TelemetryIndex.build(log, chunk_size=7)  # チャンクの境目をまたぐ
+        records = list(log.iter_records())
+    finally:
+        log.close()
+
+    assert len(index) == 100
+    np.testing.assert_array_equal(index.offsets, [offset for offset, _, _, _ in records])
+    np.testing.assert_allclose(index.timestamps, START_TIME + np.arange(100))
+    assert set(index.msgids) == {get_msgid('RAW_IMU'), get_msgid('VFR_HUD')}
+    assert index.log_size == os.path.getsize(path)
+    assert index.start_time == START_TIME and index.end_time == START_TIME + 99
+
+def test_sidecar_is_saved_reused_and_extended(tmp_path):
+    path = record(tmp_path / "dive.tlog", 0, 50)
+    log = IndexedTelemetryLog(path)
+    log.close()
+    sidecar = get_index_path(path)
+    assert os.path.exists(sidecar)
+    saved_time = os.path.getmtime(sidecar)
+
+    # 変わっていなければ読み込むだけ
+    log = IndexedTelemetryLog(path)
+    assert len(log.index) == 50
+    assert get_msgid('RAW_IMU') in log.index.type_offsets
+    log.close()
+    assert os.path.getmtime(sidecar) == saved_time
+
+    # 追記された分だけ加える
+    record(path, 50, 80)
+    log = IndexedTelemetryLog(path)
+    try:
+        assert len(log.index) == 80
+        assert [second_of(msg) for _, msg in log.iter_from(START_TIME + 75)] == list(range(75, 80))
+    finally:
+        log.close()
+    assert len(TelemetryIndex.load(sidecar)) == 80
+
+def test_replaced_or_broken_sidecar_is_rebuilt(tmp_path):
+    path = record(tmp_path / "dive.tlog", 0, 50)
+    IndexedTelemetryLog(path).close()
+
+    os.remove(path)
+    record(path, 0, 10)  # 短いログに差し替え
+    log = IndexedTelemetryLog(path)
+    assert len(log.index) == 10
+    log.close()
+
+    with open(get_index_path(path), 'wb') as f:
+        f.write(b'not an npz')
+    log = IndexedTelemetryLog(path)
+    assert len(log.index) == 10
+    log.close()
+
+def test_seek_by_elapsed_time_and_type_ranges(tmp_path):
+    path = record(tmp_path / "dive.tlog", 0, 100)
+    log = IndexedTelemetryLog(path)
+    try:
+        offset = log.index.find_offset_elapsed(47.0)
+        timestamp, msg = next(log.iter_messages(offset))
+        assert timestamp == START_TIME + 47 and second_of(msg) == 47
+        # 最後より後ならログの末尾
+        assert log.index.find_offset_elapsed(1000.0) == log.size
+
+        seconds = [second_of(msg) for _, msg in log.iter_type('VFR_HUD', START_TIME + 10, START_TIME + 20)]
+        assert seconds == [11, 13, 15, 17, 19]
+        seconds = [second_of(msg) for _, msg in log.iter_from(START_TIME + 90, ['RAW_IMU'])]
+        assert seconds == [90, 92, 94, 96, 98]
+    finally:
+        log.close()
+
+def test_replay_seek_and_type_filter(tmp_path):
+    path = record(tmp_path / "dive.tlog", 0, 100)
+    cache = TelemetryCache()
+    cache.enable_stream('RAW_IMU', 100)
+
+    source = ReplaySource(path, cache, speed=0, msg_types=['RAW_IMU'])
+    source.seek(60.0)
+    source.start()
+    assert source.finished.wait(2.0)
+    source.close()
+
+    assert cache.get('VFR_HUD') is None
+    assert [msg.xacc for msg in cache.drain('RAW_IMU')] == list(range(60, 100, 2))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
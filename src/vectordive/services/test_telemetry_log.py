@@ -0,0 +1,134 @@
+import time
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.services.telemetry_log import (TelemetryLog, TelemetryRecorder, get_msgid, make_record,
+                                               split_frames, split_records)
+from vectordive.workers.replay import ReplaySource
+
+START_TIME = 1700000000.0
+
+
+def packed(msg):
+    msg.pack(mavutil.mavlink.MAVLink(None, srcSystem=1, srcComponent=1))
+    return msg
+
+def raw_imu(i):
+    return packed(mavutil.mavlink.MAVLink_raw_imu_message(i * 10000, i, -i, -1000, 0, 0, i, 0, 0, 0))
+
+def vfr_hud(depth):
+    return packed(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -depth, 0))
+
+def record_log(path, count=20, interval=0.01):
+    """RAW_IMUとVFR_HUDを交互に interval 秒おきに記録する"""
+    recorder = TelemetryRecorder(str(path))
+    for i in range(count):
+        msg = raw_imu(i) if i % 2 == 0 else vfr_hud(i * 0.1)
+        recorder.write(msg, START_TIME + i * interval)
+    recorder.close()
+    return str(path)
+
+def test_recorded_log_reads_back_with_timestamps(tmp_path):
+    path = record_log(tmp_path / "dive.tlog")
+
+    log = TelemetryLog(path)
+    try:
+        messages = list(log.iter_messages())
+    finally:
+        log.close()
+
+    assert len(messages) == 20
+    for i, (timestamp, msg) in enumerate(messages):
+        assert timestamp == pytest.approx(START_TIME + i * 0.01, abs=1e-6)
+        assert msg._timestamp == timestamp
+        if i % 2 == 0:
+            assert msg.get_type() == 'RAW_IMU' and msg.xacc == i
+        else:
+            assert msg.get_type() == 'VFR_HUD' and msg.alt == pytest.approx(-i * 0.1)
+
+def test_msgid_filter_and_corrupt_bytes_are_skipped(tmp_path):
+    path = tmp_path / "dive.tlog"
+    with open(path, 'wb') as f:
+        f.write(make_record(raw_imu(0), START_TIME))
+        f.write(b'\x00\x01garbage')
+        f.write(make_record(vfr_hud(1.0), START_TIME + 1))
+        f.write(make_record(raw_imu(2), START_TIME + 2))
+        f.write(make_record(raw_imu(3), START_TIME + 3)[:-5])  # 書き込み途中の最後のレコード
+
+    log = TelemetryLog(str(path))
+    try:
+        assert [msg.get_type() for _, msg in log.iter_messages()] == ['RAW_IMU', 'VFR_HUD', 'RAW_IMU']
+        imu = list(log.iter_messages(msgids={get_msgid('RAW_IMU')}))
+        assert [msg.xacc for _, msg in imu] == [0, 2]
+    finally:
+        log.close()
+
+def test_empty_log(tmp_path):
+    path = tmp_path / "empty.tlog"
+    path.write_bytes(b'')
+
+    log = TelemetryLog(str(path))
+    assert list(log.iter_messages()) == []
+    log.close()
+
+def test_split_records_and_frames_keep_partial_tail():
+    records = make_record(raw_imu(1), START_TIME) + make_record(vfr_hud(2.0), START_TIME + 1)
+    cut = len(records) - 4
+
+    complete, rest = split_records(records[:cut])
+    assert len(complete) == 1 and complete[0][0] == pytest.approx(START_TIME)
+    complete, rest = split_records(rest + records[cut:])
+    assert len(complete) == 1 and rest == b''
+
+    frames = bytes(raw_imu(1).get_msgbuf()) + bytes(vfr_hud(2.0).get_msgbuf())
+    complete, rest = split_frames(b'\x00' + frames[:-3])
+    assert len(complete) == 1
+    complete, rest = split_frames(rest + frames[-3:])
+    assert len(complete) == 1 and rest == b''
+
+def test_recorder_as_cache_sink_and_replay_round_trip(tmp_path):
+    path = str(tmp_path / "dive.tlog")
+    source_cache = TelemetryCache()
+    recorder = TelemetryRecorder(path)
+    source_cache.add_sink(recorder)
+    for i in range(10):
+        source_cache.update(raw_imu(i))
+    source_cache.update(vfr_hud(3.0))
+    recorder.close()
+    assert recorder.frame_count == 11
+
+    cache = TelemetryCache()
+    source = ReplaySource(path, cache, speed=0)
+    source.start()
+    assert source.finished.wait(2.0)
+    source.close()
+
+    assert source.error is None
+    assert source.message_count == 11
+    assert cache.get_count('RAW_IMU') == 10
+    assert cache.get('RAW_IMU').xacc == 9
+    assert cache.get('VFR_HUD').alt == pytest.approx(-3.0)
+
+def test_replay_keeps_recorded_spacing(tmp_path):
+    path = record_log(tmp_path / "dive.tlog", count=11, interval=0.01)
+    cache = TelemetryCache()
+
+    source = ReplaySource(path, cache, speed=1.0)
+    start = time.perf_counter()
+    source.start()
+    assert source.finished.wait(2.0)
+    elapsed = time.perf_counter() - start
+    source.close()
+
+    assert source.message_count == 11
+    assert elapsed >= 0.09
+    # 倍速なら半分の時間で終わる
+    source = ReplaySource(path, TelemetryCache(), speed=2.0)
+    start = time.perf_counter()
+    source.start()
+    assert source.finished.wait(2.0)
+    assert time.perf_counter() - start < elapsed
+    source.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,106 @@
+import threading
+import uuid
+import numpy as np
+import pytest
+from pymavlink import mavutil
+from vectordive.services.telemetry_snapshot import SNAPSHOT_VERSION, TelemetrySnapshot
+
+
+@pytest.fixture
+def snapshot():
+    writer = TelemetrySnapshot.create(f"vectordive_test_{uuid.uuid4().hex[:12]}")
+    yield writer
+    writer.close()
+
+def test_reader_sees_published_fields(snapshot):
+    reader = TelemetrySnapshot.attach(snapshot.shm.name)
+    try:
+        state = reader.read()
+        assert int(state['version']) == SNAPSHOT_VERSION
+        assert int(state['seq']) == 0
+
+        snapshot.publish_position((1.0, 2.0, 3.0), (0.1, 0.2, 0.3))
+        state = reader.read()
+        assert int(state['seq']) == 2
+        np.testing.assert_array_equal(state['position'], [1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(state['velocity'], [0.1, 0.2, 0.3])
+        assert state['position_time'] > 0 and state['update_time'] > 0
+    finally:
+        reader.close()
+
+def test_messages_update_their_fields(snapshot):
+    snapshot.write(mavutil.mavlink.MAVLink_servo_output_raw_message(0, 0, 1100, 1200, 1300, 1400, 1500, 1600, 0, 0))
+    snapshot.write(mavutil.mavlink.MAVLink_raw_imu_message(42, 1000, 0, -1000, 1, 2, 3, 4, 5, 6))
+    snapshot.write(mavutil.mavlink.MAVLink_heartbeat_message(0, 0, 0, 0, 0, 3))
+
+    state = snapshot.read()
+    np.testing.assert_array_equal(state['servo_raw'], [1100, 1200, 1300, 1400, 1500, 1600])
+    np.testing.assert_allclose(state['imu_acc'], [9.81, 0.0, -9.81])
+    np.testing.assert_array_equal(state['imu_gyro'], [1, 2, 3])
+    np.testing.assert_array_equal(state['imu_mag'], [4, 5, 6])
+    assert int(state['imu_time_usec']) == 42
+    assert int(state['seq']) == 4
+
+def test_lower_priority_depth_does_not_overwrite(snapshot):
+    snapshot.write(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -2.0, 0))
+    assert float(snapshot.read()['depth']) == pytest.approx(2.0)
+
+    # GLOBAL_POSITION_INT は VFR_HUD より優先順位が低い
+    snapshot.write(mavutil.mavlink.MAVLink_global_position_int_message(0, 0, 0, -5000, -5000, 0, 0, 0, 0))
+    assert float(snapshot.read()['depth']) == pytest.approx(2.0)
+    snapshot.write(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -3.0, 0))
+    assert float(snapshot.read()['depth']) == pytest.approx(3.0)
+
+def test_second_writer_and_wrong_version_are_refused(snapshot):
+    with pytest.raises(FileExistsError):
+        TelemetrySnapshot.create(snapshot.shm.name)
+
+    snapshot.state['version'] = SNAPSHOT_VERSION + 1
+    with pytest.raises(ValueError):
+        TelemetrySnapshot.attach(snapshot.shm.name)
+
+def test_read_waits_for_a_write_in_progress(snapshot):
+    snapshot.state['seq'] += 1  # 書き込みの途中で止まった状態
+
+    with pytest.raises(TimeoutError):
+        snapshot.read(timeout=0.01)
+
+def test_concurrent_reads_never_see_a_torn_state(snapshot):
+    reader = TelemetrySnapshot.attach(snapshot.shm.name)
+    stopped = threading.Event()
+
+    def write_loop():
+        i = 0
+        while not stopped.is_set():
+            i += 1
+            snapshot.publish_position((i, i, i), (i, i, i))
+
+    writer = threading.Thread(target=write_loop)
+    writer.start()
+    try:
+        values = set()
+        for _ in range(2000):
+            state = reader.read()
+            assert int(state['seq']) % 2 == 0
+            # 位置と速度は同じ publish で書いたものが揃って見える
+            assert len(set(state['position'].tolist() + state['velocity'].tolist())) == 1
+            values.add(float(state['position'][0]))
+        assert len(values) > 1
+    finally:
+        stopped.set()
+        writer.join()
+        reader.close()
+
+def test_close_removes_the_block_and_ignores_late_writes():
+    name = f"vectordive_test_{uuid.uuid4().hex[:12]}"
+    writer = TelemetrySnapshot.create(name)
+    writer.close()
+    writer.close()
+
+    writer.publish_position((1.0, 1.0, 1.0), (0.0, 0.0, 0.0))
+    writer.write(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -1.0, 0))
+    with pytest.raises(FileNotFoundError):
+        TelemetrySnapshot.attach(name)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -41,7 +41,7 @@ def test_position_estimation():
             # 位置データを取得
             position_queue, time_queue = velocity_calculator.get_position_data()
             
-            if position_queue and len(position_queue) > 0:
+            if len(position_queue) > 0:
                 # 最新の位置と速度を取得
                 current_position = velocity_calculator.get_current_position()
                 current_velocity = velocity_calculator.get_current_velocity()
@@ -4,8 +4,10 @@ from PyQt5.QtCore import QTime, Qt, QTimer
 from vectordive.ui.widgets.line_edit import MakeEdit
 from vectordive.ui.widgets.combo_box import MakeComboBox
 from vectordive.ui.widgets.push_box import GetPushButton
-from vectordive.connections.hb_wait import HbWait
+from vectordive.workers.connection import ConnectionProbeWorker, build_probe_candidates
+from vectordive.services.mavlink_client import register_client, release_client
 from vectordive.ui.main_window import MainWindow
+from vectordive.config import base
 from vectordive.config.base import (
     IP_EDIT_INFO, PORT_EDIT_INFO, MODE_COMBO_LABEL
     )
@@ -30,6 +32,9 @@ class EntranceWindow(QWidget):
             'port': self.port_info[1],  # デフォルトポート
             'mode': 'UDP'  # デフォルトモード
         }
+        # 接続確認ワーカーと、確認済みの共有接続
+        self.probe_worker = None
+        self.mavlink_client = None
        
 
         def get_form():
@@ -77,7 +82,7 @@ class EntranceWindow(QWidget):
 
             self.debug_btn.get_widget().clicked.connect(self.debug_btn_clicked)
             self.connect_btn.get_widget().clicked.connect(self.connect_btn_clicked)
-            self.cancel_btn.get_widget().clicked.connect(self.close)
+            self.cancel_btn.get_widget().clicked.connect(self.cancel_btn_clicked)
 
 
             return btn_layout
@@ -139,13 +144,18 @@ class EntranceWindow(QWidget):
             self.update_status(f"Form field error: {str(e)}", "red")
             return
         
-        # 入力値の検証
-        if not re.match(r"^\d{1,3}(?:\.\d{1,3}){3}$", ip):
-            self.update_status("Invalid IP address format", "red")
-            return
-        if not port.isdigit() or int(port) < 1 or int(port) > 65535:
-            self.update_status("Invalid port number (1-65535)", "red")
-            return
+        # 入力値の検証（シリアルの場合はIP欄にデバイス、ポート欄にボーレートを入力する）
+        if mode == "Serial":
+            if not port.isdigit():
+                self.update_status("Invalid baud rate", "red")
+                return
+        else:
+            if not re.match(r"^\d{1,3}(?:\.\d{1,3}){3}$", ip):
+                self.update_status("Invalid IP address format", "red")
+                return
+            if not port.isdigit() or int(port) < 1 or int(port) > 65535:
+                self.update_status("Invalid port number (1-65535)", "red")
+                return
             
         # 接続開始のログを追加
         self.add_log(f"Attempting to connect to {ip}:{port} ({mode})")
@@ -154,35 +164,63 @@ class EntranceWindow(QWidget):
         self.ip_edit.edit.setEnabled(False)
         self.port_edit.edit.setEnabled(False)
         self.mode_combo.mode_combo.setEnabled(False)
-        # ボタンを非アクティブにする
+        # ボタンを非アクティブにする（Cancelで接続確認を中止できる）
         self.connect_btn.get_widget().setEnabled(False)
         self.cancel_btn.get_widget().setEnabled(True)
 
+        # Heartbeat待ちはワーカースレッドで行い、GUIを止めない
         try:
-            hb_wait = HbWait(ip, port)
-            if hb_wait.get_success() is True:
-                self.update_status("Connection successful", "green")
-                QApplication.processEvents()
-                
-                # 接続情報を保存（文字列として保存）
-                self.connection_info = {
-                    'ip': ip,
-                    'port': port,
-                    'mode': mode
-                }
-                
-                # 接続情報をログに出力
-                self.add_log(f"Connection info saved: {self.connection_info}")
-                
-                # メインウィンドウに遷移
-                QTimer.singleShot(1000, self.transition_to_main_window)
-                return True
-            else:
-                self.update_status("Connection failed - no heartbeat received", "red")
-                self.enable_form()
+            candidates = build_probe_candidates(mode, ip, port)
+            self.probe_worker = ConnectionProbeWorker(candidates)
+            self.probe_worker.progress.connect(self.add_log)
+            self.probe_worker.connected.connect(self.on_probe_connected)
+            self.probe_worker.failed.connect(self.on_probe_failed)
+            self.probe_worker.start()
         except Exception as e:
             self.update_status(f"Connection error: {str(e)}", "red")
+            self.probe_worker = None
             self.enable_form()
+
+    def on_probe_connected(self, connection_info):
+        """Heartbeatを受信した時の処理"""
+        self.update_status("Connection successful", "green")
+        
+        # Heartbeatを受信したソケットをそのまま共有接続として登録する
+        self.mavlink_client = register_client(connection_info, self.probe_worker.connection, self.probe_worker.reader)
+        
+        # 接続情報を保存（文字列として保存）
+        self.connection_info = connection_info
+        
+        # 接続情報をログに出力
+        self.add_log(f"Connection info saved: {self.connection_info}")
+        
+        # メインウィンドウに遷移
+        QTimer.singleShot(1000, self.transition_to_main_window)
+
+    def on_probe_failed(self, reason):
+        """接続確認に失敗した時の処理"""
+        self.update_status(reason, "red")
+        self.enable_form()
+
+    def cancel_btn_clicked(self):
+        """接続確認中なら中止し、そうでなければウィンドウを閉じる"""
+        if self.probe_worker is not None and self.probe_worker.isRunning():
+            self.add_log("Cancelling connection attempt...")
+            self.cancel_btn.get_widget().setEnabled(False)
+            self.probe_worker.cancel()
+        else:
+            self.close()
+
+    def closeEvent(self, event):
+        """ウィンドウが閉じられる際に接続確認を止める"""
+        if self.probe_worker is not None and self.probe_worker.isRunning():
+            self.probe_worker.cancel()
+            self.probe_worker.wait(int(base.HB_TIMEOUT * 1000))
+        # メインウィンドウに渡す前に閉じられた場合は共有接続を解放する
+        if self.mavlink_client is not None:
+            release_client(self.mavlink_client.connection_info)
+            self.mavlink_client = None
+        event.accept()
             
     def debug_btn_clicked(self):
         """デバッグボタンのクリック処理"""
@@ -218,8 +256,9 @@ class EntranceWindow(QWidget):
             
         self.add_log(f"Transitioning to main window with connection info: {self.connection_info}")
         
-        # メインウィンドウを作成して表示（接続情報を渡す）
-        self.main_window = MainWindow(self.connection_info)
+        # メインウィンドウを作成して表示（接続情報と確認済みの接続を渡す）
+        self.main_window = MainWindow(self.connection_info, self.mavlink_client)
+        self.mavlink_client = None
         self.main_window.show()
         
         # エントランスウィンドウを閉じる
@@ -0,0 +1,98 @@
+from PyQt5.QtCore import QObject, QTimer, Qt
+from vectordive.config import base
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 画面更新をまとめて行うフレームスケジューラ
+# ウィジェットは新しいデータを受け取ったら mark_dirty で再描画を予約するだけにし、
+# 予約された再描画は1フレーム（UI_MAX_FPS）に1回だけ実行する
+# データがフレームレートより速く届いても途中の値は描かれないので、UIの負荷はテレメトリのレートによらず一定になる
+
+
+class FrameScheduler(QObject):
+    """再描画の予約をまとめて、上限フレームレートで実行するスケジューラ（GUIスレッドから使う）"""
+
+    def __init__(self, fps=None, parent=None):
+        super().__init__(parent)
+        self.frame_interval = 1.0 / (fps if fps is not None else base.UI_MAX_FPS)
+        self.dirty = {}  # コールバック -> コールバック（同じフレーム内の重複予約をまとめる）
+        self.periodic = {}  # コールバック -> [間隔 [s], 次の実行時刻]
+        self.last_frame_time = 0.0
+        self.frame_count = 0
+        self.request_count = 0
+
+        # 予約がある間だけ動かす（何もない時はタイマーを止める）
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.run_frame)
+
+    def set_fps(self, fps):
+        """上限フレームレートを変更する"""
+        self.frame_interval = 1.0 / fps
+
+    def mark_dirty(self, callback):
+        """次のフレームで callback を1回呼ぶよう予約する"""
+        self.request_count += 1
+        was_idle = not self.dirty
+        self.dirty[callback] = callback
+        if was_idle:
+            # 定期実行の待ち時間より先に次のフレームを実行する
+            self.schedule()
+
+    def add_periodic(self, callback, interval):
+        """interval 秒ごとに callback をフレームに合わせて呼ぶ（接続状態の確認など）"""
+        self.periodic[callback] = [interval, time.perf_counter() + interval]
+        self.schedule()
+
+    def remove(self, callback):
+        """予約と定期実行を取り消す"""
+        self.dirty.pop(callback, None)
+        self.periodic.pop(callback, None)
+
+    def schedule(self):
+        """次のフレームの時刻にタイマーをセットする"""
+        now = time.perf_counter()
+        if self.dirty:
+            next_time = now
+        elif self.periodic:
+            next_time = min(entry[1] for entry in self.periodic.values())
+        else:
+            self.timer.stop()
+            return
+        # 定期実行も含めて、前のフレームから frame_interval 以上空ける
+        next_time = max(next_time, self.last_frame_time + self.frame_interval)
+        self.timer.start(max(0, int((next_time - now) * 1000)))
+
+    def run_frame(self):
+        """予約された再描画と、時刻になった定期実行をまとめて行う"""
+        now = time.perf_counter()
+        self.last_frame_time = now
+        self.frame_count += 1
+
+        callbacks = self.dirty
+        self.dirty = {}
+        for callback, entry in list(self.periodic.items()):
+            if entry[1] <= now:
+                callbacks[callback] = callback
+                entry[1] = now + entry[0]
+
+        for callback in callbacks.values():
+            try:
+                callback()
+            except Exception as e:
+                logger.error("画面更新エラー (%s): %s", getattr(callback, '__qualname__', callback), e)
+        self.schedule()
+
+
+_scheduler = None
+
+
+def get_frame_scheduler():
+    """アプリケーション全体で共有するフレームスケジューラを取得する"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FrameScheduler()
+    return _scheduler
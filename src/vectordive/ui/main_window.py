@@ -1,16 +1,20 @@
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QGroupBox, QSplitter, QApplication, QLabel
 from PyQt5.QtGui import QKeySequence
 from vectordive.config import base
 from vectordive.ui.widgets.telemetry_bars import ProgressBar
+import logging
+
+logger = logging.getLogger(__name__)
 
 class MainWindow(QMainWindow):
     ##テスト用でtelemetry_bars.pyのみを表示する
-    def __init__(self, connection_info=None):
+    def __init__(self, connection_info=None, mavlink_client=None):
         super().__init__()
         
-        # 接続情報を保存
+        # 接続情報を保存（接続確認済みの共有接続があれば引き継ぐ）
         self.connection_info = connection_info
+        self.mavlink_client = mavlink_client
         
         # ウィンドウタイトルに接続情報を表示
         if connection_info:
@@ -185,66 +189,13 @@ class MainWindow(QMainWindow):
         return section
 
     def create_map_widget(self):
-        """マップウィジェットを作成（グリッド表示）"""
-        from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QGraphicsTextItem
-        from PyQt5.QtGui import QPen, QBrush, QColor
-        
-        # グラフィックスシーンを作成
-        self.map_scene = QGraphicsScene()
-        
-        # グリッドサイズ（より大きな範囲）
-        self.grid_size = 15
-        self.grid_width = 60
-        self.grid_height = 45
-        
-        # グリッドを描画
-        for x in range(self.grid_width + 1):
-            for y in range(self.grid_height + 1):
-                # 縦線
-                if x <= self.grid_width:
-                    line = self.map_scene.addLine(x * self.grid_size, 0, x * self.grid_size, self.grid_height * self.grid_size, 
-                                       QPen(QColor(100, 100, 100), 1))
-                # 横線
-                if y <= self.grid_height:
-                    line = self.map_scene.addLine(0, y * self.grid_size, self.grid_width * self.grid_size, y * self.grid_size, 
-                                       QPen(QColor(100, 100, 100), 1))
-        
-        # 中心点をマーク
-        self.center_x = self.grid_width // 2 * self.grid_size
-        self.center_y = self.grid_height // 2 * self.grid_size
-        self.center_marker = self.map_scene.addEllipse(self.center_x - 5, self.center_y - 5, 10, 10, 
-                                        QPen(QColor(255, 0, 0), 2), 
-                                        QBrush(QColor(255, 0, 0)))
-        
-        # 中心点のラベル
-        self.center_text = self.map_scene.addText("CENTER")
-        self.center_text.setDefaultTextColor(QColor(255, 0, 0))
-        self.center_text.setPos(self.center_x + 15, self.center_y - 10)
-        
-        # 座標軸のラベル
-        x_label = self.map_scene.addText("X")
-        x_label.setDefaultTextColor(QColor(255, 255, 255))
-        x_label.setPos(self.grid_width * self.grid_size + 10, self.grid_height * self.grid_size // 2)
-        
-        y_label = self.map_scene.addText("Y")
-        y_label.setDefaultTextColor(QColor(255, 255, 255))
-        y_label.setPos(self.grid_width * self.grid_size // 2, -20)
-        
-        # 位置推定マーカー（初期化）
-        self.position_marker = None
-        self.position_text = None
-        
-        # グラフィックスビューを作成
-        view = QGraphicsView(self.map_scene)
-        view.setStyleSheet("""
-            QGraphicsView {
-                background-color: #2b2b2b;
-                border: 1px solid #555555;
-            }
-        """)
-        from PyQt5.QtGui import QPainter
-        view.setRenderHint(QPainter.Antialiasing)
-        
+        """マップウィジェットを作成（グリッドと航跡を表示）"""
+        from vectordive.ui.widgets.track_map import TrackMapView
+
+        view = TrackMapView()
+        self.map_scene = view.map_scene
+        self.center_x = view.center_x
+        self.center_y = view.center_y
         return view
 
     def create_telemetry_partition(self):
@@ -284,6 +235,11 @@ class MainWindow(QMainWindow):
             from vectordive.ui.widgets.depth_graph import DepthGraph
             self.depth_graph = DepthGraph()
             layout.addWidget(self.depth_graph.get_widget())
+            # 水面に浮かべた状態で押すと、その時の気圧を深度0にする
+            from PyQt5.QtWidgets import QPushButton
+            self.zero_depth_button = QPushButton("Zero Depth")
+            self.zero_depth_button.clicked.connect(self.zero_depth)
+            layout.addWidget(self.zero_depth_button)
         except ImportError as e:
             # インポートエラーの場合はプレースホルダーを表示
             from PyQt5.QtWidgets import QLabel
@@ -306,8 +262,12 @@ class MainWindow(QMainWindow):
         # ログコンソールウィジェットを追加
         try:
             from vectordive.ui.widgets.log_console import LogConsole
+            from vectordive.services.log_pipeline import get_pipeline
             self.log_console = LogConsole()
             layout.addWidget(self.log_console.get_widget())
+            # アプリケーションのログをコンソールにも表示する
+            if get_pipeline() is not None:
+                get_pipeline().add_console(self.log_console)
         except ImportError as e:
             # インポートエラーの場合はプレースホルダーを表示
             from PyQt5.QtWidgets import QLabel
@@ -349,60 +309,77 @@ class MainWindow(QMainWindow):
         self.position_reset_shortcut = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
         self.position_reset_shortcut.activated.connect(self.reset_position_estimation)
         
-        # キーボードショートカットの説明をコンソールに出力
-        print("キーボードショートカット:")
-        print("  Ctrl+Shift+D: デバッグモード切り替え")
-        print("  Ctrl+Shift+T: テレメトリテストデータ生成")
-        print("  Ctrl+Shift+R: デバッグモードリセット")
-        print("  Ctrl+Shift+P: 位置推定リセット")
+        # キーボードショートカットの説明をログに出力
+        logger.info("キーボードショートカット: Ctrl+Shift+D デバッグモード切り替え / Ctrl+Shift+T テレメトリテストデータ生成 / "
+                    "Ctrl+Shift+R デバッグモードリセット / Ctrl+Shift+P 位置推定リセット")
         
         # デバッグモードフラグ
         self.debug_mode = False
         self.test_data_counter = 0
 
     def init_telemetry_timer(self):
-        """テレメトリ更新タイマーを初期化する"""
-        self.telemetry_timer = QTimer()
-        self.telemetry_timer.timeout.connect(self.update_telemetry)
+        """テレメトリの購読と接続状態の定期確認を初期化する"""
+        from vectordive.ui.frame_scheduler import get_frame_scheduler
+        self.frame_scheduler = get_frame_scheduler()
+        self.latest_servo_msg = None
         
-        # 接続情報がある場合はテレメトリ更新を開始
+        # 接続情報がある場合は共有接続のSERVO_OUTPUT_RAWを購読する
         if self.connection_info:
-            self.telemetry_timer.start(2000)  # 2秒間隔で更新（より安定）
+            if self.mavlink_client is None:
+                from vectordive.services.mavlink_client import get_client
+                self.mavlink_client = get_client(self.connection_info)
+            self.mavlink_client.subscribe('SERVO_OUTPUT_RAW', self.on_servo_output_raw)
+            
+            # 深度はキャッシュに溜まったサンプルをまとめてグラフへ送る（描画はグラフ側で間引く）
+            from vectordive.workers.depth import GetDepthData
+            self.depth_data = GetDepthData(self.mavlink_client)
+            for msg_type in self.depth_data.message_types:
+                self.mavlink_client.subscribe(msg_type, self.on_depth_message)
+            self.frame_scheduler.add_periodic(self.update_telemetry, base.LINK_STATUS_INTERVAL_MS / 1000.0)
+            
+    def on_servo_output_raw(self, msg):
+        """SERVO_OUTPUT_RAWを受信したら最新値を保持し、次のフレームでテレメトリバーを更新する"""
+        self.latest_servo_msg = msg
+        self.frame_scheduler.mark_dirty(self.render_servo_output)
+        
+    def render_servo_output(self):
+        """最新のSERVO_OUTPUT_RAWをテレメトリバーに表示する（途中の値は描かない）"""
+        msg = self.latest_servo_msg
+        if self.debug_mode or msg is None:
+            return
+        if hasattr(self, 'progress_bar') and self.progress_bar:
+            self.progress_bar.update_from_servo_data(
+                msg.servo1_raw, msg.servo2_raw, msg.servo3_raw,
+                msg.servo4_raw, msg.servo5_raw, msg.servo6_raw
+            )
+            
+    def on_depth_message(self, msg):
+        """深度のメッセージを受信したら、溜まっているサンプルをグラフへ追加する"""
+        times, depths = self.depth_data.get_depth_samples()
+        if len(times) > 0 and getattr(self, 'depth_graph', None):
+            self.depth_graph.append_samples(times, depths)
             
     def update_telemetry(self):
-        """テレメトリデータを更新する"""
+        """接続状態を確認する（データ自体は購読で受け取る）"""
         try:
             # デバッグモードの場合はテストデータを使用
             if self.debug_mode:
                 self.update_debug_telemetry()
                 return
                 
-            if self.connection_info:
-                # テレメトリデータを取得
-                from vectordive.connections.telemetry import GetTelemetry
-                telemetry = GetTelemetry(self.connection_info)
-                
-                # 接続状態を確認
-                if telemetry.is_connected():
-                    # スラスター値を取得
-                    servo_data = telemetry.get_servo_output_raw_data()
-                    
-                    # テレメトリバーを更新
-                    if hasattr(self, 'progress_bar') and self.progress_bar:
-                        # 6つのスラスター値で更新
-                        self.progress_bar.update_from_servo_data(*servo_data)
-                else:
-                    # 接続されていない場合の処理
-                    if hasattr(self, 'progress_bar') and self.progress_bar:
-                        self.progress_bar.telemetry_label.setText("Telemetry: No connection to MAVLink")
-                        # デフォルト値を表示
-                        default_data = (0, 0, 0, 0, 0, 0)
-                        self.progress_bar.update_from_servo_data(*default_data)
+            if self.mavlink_client and not self.mavlink_client.is_connected():
+                # 接続されていない場合の処理
+                if hasattr(self, 'progress_bar') and self.progress_bar:
+                    self.progress_bar.set_status("Telemetry: No connection to MAVLink")
+                    # デフォルト値を表示
+                    default_data = (0, 0, 0, 0, 0, 0)
+                    self.progress_bar.update_from_servo_data(*default_data)
                     
         except Exception as e:
+            logger.error("テレメトリ更新エラー: %s", e)
             # エラー時はテレメトリバーにエラー状態を表示
             if hasattr(self, 'progress_bar') and self.progress_bar:
-                self.progress_bar.telemetry_label.setText(f"Telemetry Error: {str(e)}")
+                self.progress_bar.set_status(f"Telemetry Error: {str(e)}")
                 # エラー時もデフォルト値を表示
                 default_data = (0, 0, 0, 0, 0, 0)
                 self.progress_bar.update_from_servo_data(*default_data)
@@ -425,7 +402,7 @@ class MainWindow(QMainWindow):
             
         # テレメトリバーにデバッグモード状態を表示
         if hasattr(self, 'progress_bar') and self.progress_bar:
-            self.progress_bar.telemetry_label.setText(f"DEBUG MODE: {status}")
+            self.progress_bar.set_status(f"DEBUG MODE: {status}")
             
     def generate_test_telemetry(self):
         """テスト用テレメトリデータを生成"""
@@ -447,7 +424,7 @@ class MainWindow(QMainWindow):
         # テレメトリバーを更新
         if hasattr(self, 'progress_bar') and self.progress_bar:
             self.progress_bar.update_from_servo_data(*test_data)
-            self.progress_bar.telemetry_label.setText(f"DEBUG: Test Data Generated - Counter: {self.test_data_counter}")
+            self.progress_bar.set_status(f"DEBUG: Test Data Generated - Counter: {self.test_data_counter}")
             
     def update_debug_telemetry(self):
         """デバッグモード用のテレメトリ更新"""
@@ -473,53 +450,37 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'progress_bar') and self.progress_bar:
             default_data = (0, 0, 0, 0, 0, 0)
             self.progress_bar.update_from_servo_data(*default_data)
-            self.progress_bar.telemetry_label.setText("Telemetry: Debug mode reset")
+            self.progress_bar.set_status("Telemetry: Debug mode reset")
             
     def reset_position_estimation(self):
         """位置推定をリセット"""
         if hasattr(self, 'position_estimation_manager') and self.position_estimation_manager:
             self.position_estimation_manager.reset_position_estimation()
-            # マップの位置マーカーもリセット
+            # マップの航跡と位置マーカーもリセット
+            self.map_widget.clear_track()
             self.update_map_position([0, 0, 0])
-            print("位置推定をリセットしました")
+            logger.info("位置推定をリセットしました")
+        else:
+            logger.warning("位置推定マネージャーが利用できません")
+            
+    def zero_depth(self):
+        """現在の気圧を水面の気圧として、深度の基準をやり直す"""
+        if getattr(self, 'depth_data', None) is None:
+            logger.warning("深度データが利用できません")
+        elif self.depth_data.calibrate_surface():
+            logger.info(f"水面の気圧を {self.depth_data.surface_pressure:.2f} hPa に設定しました")
         else:
-            print("位置推定マネージャーが利用できません")
+            logger.warning("SCALED_PRESSUREを受信していないため、深度の基準を設定できません")
             
     def update_map_position(self, position):
         """マップに位置推定の結果を表示"""
-        if not hasattr(self, 'map_scene') or position is None:
+        if not hasattr(self, 'map_widget') or position is None:
             return
-            
+
         try:
-            from PyQt5.QtGui import QPen, QBrush, QColor
-            
-            # スケールファクター（メートルからピクセルへの変換）
-            scale_factor = 10  # 1メートル = 10ピクセル
-            
-            # 位置をピクセル座標に変換
-            x_pixel = self.center_x + position[0] * scale_factor
-            y_pixel = self.center_y - position[1] * scale_factor  # Y軸は反転
-            
-            # 既存のマーカーを削除
-            if self.position_marker:
-                self.map_scene.removeItem(self.position_marker)
-            if self.position_text:
-                self.map_scene.removeItem(self.position_text)
-            
-            # 新しいマーカーを作成
-            self.position_marker = self.map_scene.addEllipse(
-                x_pixel - 8, y_pixel - 8, 16, 16,
-                QPen(QColor(0, 255, 0), 2),
-                QBrush(QColor(0, 255, 0))
-            )
-            
-            # 位置ラベルを作成
-            self.position_text = self.map_scene.addText(f"({position[0]:.1f}, {position[1]:.1f})")
-            self.position_text.setDefaultTextColor(QColor(0, 255, 0))
-            self.position_text.setPos(x_pixel + 20, y_pixel - 10)
-            
+            self.map_widget.set_position(position)
         except Exception as e:
-            print(f"マップ位置更新エラー: {e}")
+            logger.error("マップ位置更新エラー: %s", e)
 
     def resize_partitions(self, telemetry_ratio=0.25, right_ratio=0.75):
         """パーティションのサイズを動的に調整する"""
@@ -532,13 +493,29 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """ウィンドウが閉じられる際の処理"""
-        if hasattr(self, 'telemetry_timer'):
-            self.telemetry_timer.stop()
+        if hasattr(self, 'frame_scheduler'):
+            self.frame_scheduler.remove(self.update_telemetry)
+            self.frame_scheduler.remove(self.render_servo_output)
             
         # 位置推定を停止
         if hasattr(self, 'position_estimation_manager') and self.position_estimation_manager:
             self.position_estimation_manager.stop_position_estimation()
             
+        # 共有接続の購読を解除
+        if self.mavlink_client:
+            from vectordive.services.mavlink_client import release_client
+            self.mavlink_client.unsubscribe('SERVO_OUTPUT_RAW', self.on_servo_output_raw)
+            if getattr(self, 'depth_data', None):
+                for msg_type in self.depth_data.message_types:
+                    self.mavlink_client.unsubscribe(msg_type, self.on_depth_message)
+            release_client(self.connection_info)
+            self.mavlink_client = None
+
+        # ログコンソールへの出力を止める
+        from vectordive.services.log_pipeline import get_pipeline
+        if get_pipeline() is not None and getattr(self, 'log_console', None):
+            get_pipeline().remove_console(self.log_console)
+            
         event.accept()
 
 if __name__ == "__main__":
@@ -546,6 +523,8 @@ if __name__ == "__main__":
     from PyQt5.QtWidgets import QApplication
 
     app = QApplication(sys.argv)
+    from vectordive.services.log_pipeline import setup_logging
+    setup_logging()
     
     # コマンドライン引数でデバッグモードを指定可能
     debug_mode = "--debug" in sys.argv
@@ -557,7 +536,7 @@ if __name__ == "__main__":
         main_window.debug_mode = True
         main_window.setWindowTitle(main_window.windowTitle() + " [DEBUG MODE]")
         if hasattr(main_window, 'progress_bar') and main_window.progress_bar:
-            main_window.progress_bar.telemetry_label.setText("DEBUG MODE: ON (Auto-enabled)")
+            main_window.progress_bar.set_status("DEBUG MODE: ON (Auto-enabled)")
     
     main_window.show()
     sys.exit(app.exec_())
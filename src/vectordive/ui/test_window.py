@@ -1,8 +1,9 @@
 # realtime_threaded.py
-import sys, collections, time, random
+import sys, time, random
 from PyQt5.QtCore import QThread, pyqtSignal, QTimer
 from PyQt5.QtWidgets import QApplication
 import pyqtgraph as pg
+from vectordive.utils.ring_buffer import RingBuffer
 
 class DataWorker(QThread):
     new_data = pyqtSignal(float, float)  # (t, depth)
@@ -30,8 +31,7 @@ class RealTimePlot(pg.PlotWidget):
         self.setLabel('left', 'depth', units='m')
         self.enableAutoRange('y', True)
 
-        self.t = collections.deque(maxlen=maxlen)
-        self.z = collections.deque(maxlen=maxlen)
+        self.history = RingBuffer(maxlen, 2)  # 列: 時刻, 深度
         self.curve = self.plot([], [])
 
         # worker 起動
@@ -46,16 +46,16 @@ class RealTimePlot(pg.PlotWidget):
         self._refresh.start(33)  # ~30fps
 
     def on_new_data(self, t, depth):
-        self.t.append(t)
-        self.z.append(depth)
+        self.history.append((t, depth))
         self._dirty = True
 
     def flush(self):
         if not self._dirty:
             return
-        self.curve.setData(self.t, self.z)
-        if len(self.t) >= 2:
-            self.setXRange(self.t[0], self.t[-1], padding=0)
+        history = self.history.view()
+        self.curve.setData(history[:, 0], history[:, 1])
+        if len(history) >= 2:
+            self.setXRange(history[0, 0], history[-1, 0], padding=0)
         self._dirty = False
 
     def closeEvent(self, e):
@@ -1,8 +1,11 @@
 # depth_graph.py
+import numpy as np
 import pyqtgraph as pg
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
 from PyQt5.QtCore import Qt
 from vectordive.config import base
+from vectordive.ui.frame_scheduler import get_frame_scheduler
+from vectordive.utils.ring_buffer import RingBuffer
 
 class DepthGraph(QWidget):
     def __init__(self, parent=None):
@@ -36,23 +39,78 @@ class DepthGraph(QWidget):
         self.plot.setMinimumHeight(min_h)
         self.plot.setMinimumWidth(min_w)
 
-        # 1本の曲線を保持して setData で更新する
-        self.curve = self.plot.plot([], [], symbol='o', symbolSize=5)
+        # 直近 GRAPH_WINDOW_SECONDS 秒に追従して表示し、表示範囲外を描かず、ピクセル幅に合わせて間引く
+        self.window_seconds = getattr(base, "GRAPH_WINDOW_SECONDS", 60.0)
+        self.plot.setClipToView(True)
+        self.plot.setDownsampling(auto=True, mode='peak')
+
+        # 1本の曲線を保持して setData で更新する（点数が多いためシンボルは描かない）
+        self.curve = self.plot.plot([], [])
+
+        # ---- ストリーミング用の履歴（列: 時刻, 深度） ----
+        self.history = RingBuffer(getattr(base, "DEPTH_HISTORY_CAPACITY", 360000), 2)
+        self.dirty = False
+
+        # サンプルの到着頻度に関係なく、再描画はフレームスケジューラで1フレームに1回だけ行う
+        self.scheduler = get_frame_scheduler()
 
     def get_widget(self):
         """埋め込み用の QWidget を返す（自分自身）。"""
         return self
 
     def update_graph(self, time_data, depth_data):
-        """データを更新して再描画。"""
-        self.curve.setData(time_data, depth_data)
-        if len(time_data) > 1:
-            self.plot.setXRange(min(time_data), max(time_data), padding=0.02)
-        if len(depth_data) > 1:
-            self.plot.setYRange(min(depth_data), max(depth_data), padding=0.02)
+        """データを置き換えて再描画を予約する。"""
+        self.clear_history()
+        self.append_samples(time_data, depth_data)
+
+    def append_sample(self, time_value, depth_value):
+        """1サンプル追加する（描画は次のフレームでまとめて行う）。"""
+        self.append_samples((time_value,), (depth_value,))
+
+    def append_samples(self, time_data, depth_data):
+        """複数サンプルを追加する（描画は次のフレームでまとめて行う）。"""
+        samples = np.column_stack((np.asarray(time_data, dtype=np.float64),
+                                   np.asarray(depth_data, dtype=np.float64)))
+        if len(samples) == 0:
+            return
+        self.history.extend(samples)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """次のフレームでの再描画を予約する"""
+        self.dirty = True
+        self.scheduler.mark_dirty(self.redraw)
+
+    def redraw(self):
+        """前回の描画以降にサンプルが追加されていれば再描画する。"""
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        history = self.history.view()
+        if len(history) == 0:
+            self.curve.setData([], [])
+            return
+
+        # 直近 window_seconds 秒（と左端の外の1点）だけを渡す
+        # history はリングバッファのビューで次の追加で上書きされるため、曲線にはコピーを渡す
+        end_time = history[-1, 0]
+        start = max(int(np.searchsorted(history[:, 0], end_time - self.window_seconds)) - 1, 0)
+        window = history[start:].copy()
+        self.curve.setData(window[:, 0], window[:, 1])
+        if len(window) > 1:
+            self.plot.setXRange(end_time - self.window_seconds, end_time, padding=0)
+            self.plot.setYRange(window[:, 1].min(), window[:, 1].max(), padding=0.02)
+
+    def clear_history(self):
+        """履歴をリセットする。"""
+        self.history.clear()
+        self.mark_dirty()
 
     def clear_graph(self):
         """描画をクリアして既定レンジへ。"""
+        self.clear_history()
+        self.dirty = False
         self.curve.setData([], [])
         x_range = getattr(base, "GRAPH_X_RANGE", (0, 60))
         y_range = getattr(base, "GRAPH_Y_RANGE", (0, 100))
@@ -1,19 +1,64 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit, QLabel
-from PyQt5.QtCore import Qt
+from collections import deque, namedtuple
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QComboBox, QLineEdit
+from PyQt5.QtCore import QTimer
+from vectordive.config import base
+import logging
+import time
+
+# ログ表示
+# add_log はどのスレッドからでも呼べ、行は一旦キューに溜めて LOG_FLUSH_INTERVAL_MS ごとにまとめて表示する
+# （1行ごとに追加・スクロールするとエラーが続いた時にレイアウトが毎回やり直される）
+# 表示する行数は LOG_CONSOLE_MAX_LINES で打ち切り、直近 LOG_HISTORY_SIZE 件はレベルでの絞り込みと検索用に保持する
+
+LogEntry = namedtuple('LogEntry', ['created', 'levelno', 'name', 'message'])
+
+LEVELS = [("DEBUG", logging.DEBUG), ("INFO", logging.INFO), ("WARNING", logging.WARNING), ("ERROR", logging.ERROR)]
+
+
+def format_entry(entry):
+    """表示用の1行にする"""
+    timestamp = time.strftime("%H:%M:%S", time.localtime(entry.created))
+    level = logging.getLevelName(entry.levelno)
+    if entry.name:
+        return f"[{timestamp}] {level:<7} {entry.name}: {entry.message}"
+    return f"[{timestamp}] {level:<7} {entry.message}"
+
 
 class LogConsole(QWidget):
     def __init__(self):
         super().__init__()
+        self.pending = deque()  # 表示待ちの行（deque の append/popleft はスレッドセーフ）
+        self.history = deque(maxlen=base.LOG_HISTORY_SIZE)  # 絞り込み・検索用に保持する直近の行
+        self.level = logging.INFO
+        self.search_text = ""
+        self.dropped = 0  # まとめて届いて表示しきれなかった行数
         self.init_ui()
-        
+
     def init_ui(self):
         layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
-        
-        # ログ表示用テキストエリア（高さ制限付き）
-        self.log_text = QTextEdit()
+
+        # レベルの絞り込みと検索
+        filter_layout = QHBoxLayout()
+        self.level_combo = QComboBox()
+        for name, level in LEVELS:
+            self.level_combo.addItem(name, level)
+        self.level_combo.setCurrentIndex(1)
+        self.level_combo.currentIndexChanged.connect(lambda index: self.set_level(self.level_combo.itemData(index)))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search log")
+        self.search_edit.textChanged.connect(self.set_search)
+        for widget in (self.level_combo, self.search_edit):
+            widget.setStyleSheet("background-color: #1e1e1e; color: #cccccc; border: 1px solid #555555; font-size: 10px;")
+        filter_layout.addWidget(self.level_combo)
+        filter_layout.addWidget(self.search_edit)
+        layout.addLayout(filter_layout)
+
+        # ログ表示用テキストエリア（高さ・行数制限付き）
+        self.log_text = QPlainTextEdit()
         self.log_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1e1e1e;
                 color: #cccccc;
                 border: 1px solid #555555;
@@ -22,26 +67,84 @@ class LogConsole(QWidget):
             }
         """)
         self.log_text.setReadOnly(True)
+        self.log_text.setUndoRedoEnabled(False)
+        self.log_text.setMaximumBlockCount(base.LOG_CONSOLE_MAX_LINES)
         self.log_text.setMaximumHeight(60)  # 高さをさらに制限
         layout.addWidget(self.log_text)
-        
+
+        # 溜まった行をまとめて表示するタイマー
+        self.flush_timer = QTimer(self)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(base.LOG_FLUSH_INTERVAL_MS)
+
         # 初期メッセージを追加
         self.add_log("Log console initialized")
-        
-    def add_log(self, message):
-        """ログメッセージを追加する"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
-        
-        # スクロールを最下部に移動
+
+    def add_log(self, message, level=logging.INFO, name="", created=None):
+        """ログメッセージを追加する（どのスレッドからでも呼べる、表示は次のflushで行う）"""
+        self.pending.append(LogEntry(created if created is not None else time.time(), level, name, str(message)))
+
+    def flush(self):
+        """溜まった行をまとめて表示する（GUIスレッドのタイマーから呼ばれる）"""
+        if not self.pending:
+            return
+        entries = []
+        while self.pending:
+            entries.append(self.pending.popleft())
+        self.history.extend(entries)
+
+        # 表示できる行数より多く届いた分は表示しない（履歴には残る）
+        lines = [format_entry(entry) for entry in entries if self.matches(entry)]
+        if len(lines) > base.LOG_CONSOLE_MAX_LINES:
+            self.dropped += len(lines) - base.LOG_CONSOLE_MAX_LINES
+            lines = lines[-base.LOG_CONSOLE_MAX_LINES:]
+        if lines:
+            self.append_lines(lines)
+
+    def append_lines(self, lines):
+        """複数行を1回で追加する（最下部を表示していた場合だけ追従する）"""
         scrollbar = self.log_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-        
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self.log_text.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def matches(self, entry):
+        """表示するレベル・検索文字列に合うかどうか"""
+        if entry.levelno < self.level:
+            return False
+        return not self.search_text or self.search_text in entry.message.lower() or self.search_text in entry.name.lower()
+
+    def search(self, text, level=logging.NOTSET):
+        """保持している行から text を含むもの（level以上）を古い順に返す"""
+        text = text.lower()
+        return [entry for entry in list(self.history)
+                if entry.levelno >= level and (text in entry.message.lower() or text in entry.name.lower())]
+
+    def set_level(self, level):
+        """表示する最低レベルを変えて、保持している行から表示し直す"""
+        self.level = level
+        self.refresh()
+
+    def set_search(self, text):
+        """検索文字列を含む行だけを表示する（空なら全て）"""
+        self.search_text = text.lower()
+        self.refresh()
+
+    def refresh(self):
+        """保持している行から表示を作り直す"""
+        self.flush()
+        lines = [format_entry(entry) for entry in list(self.history) if self.matches(entry)]
+        self.log_text.clear()
+        if lines:
+            self.append_lines(lines[-base.LOG_CONSOLE_MAX_LINES:])
+
     def clear_log(self):
         """ログをクリアする"""
+        self.pending.clear()
+        self.history.clear()
         self.log_text.clear()
-        
+
     def get_widget(self):
         """ウィジェットを返す"""
         return self
@@ -1,9 +1,13 @@
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QGroupBox, QProgressBar, QFrame)
 from PyQt5.QtGui import QFont, QPalette, QColor
+from vectordive.config import base
+import logging
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 class PositionEstimationWidget(QWidget):
     """位置推定データを表示するウィジェット"""
     
@@ -231,8 +235,8 @@ class PositionEstimationManager:
         self.connection_info = connection_info
         self.main_window = main_window
         self.velocity_calculator = None
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_position_estimation)
+        from vectordive.ui.frame_scheduler import get_frame_scheduler
+        self.frame_scheduler = get_frame_scheduler()
         
         # 位置推定ウィジェットを初期化
         self.position_widget = PositionEstimationWidget()
@@ -246,16 +250,27 @@ class PositionEstimationManager:
         try:
             from vectordive.workers.telemetry import GetVelocityData
             self.velocity_calculator = GetVelocityData(self.connection_info)
-            self.update_timer.start(100)  # 100ms間隔で更新
+            # RAW_IMUが届いたら次のフレームで更新する（届かない場合のモックデータ用に定期更新も行う）
+            self.velocity_calculator.telemetry.client.subscribe('RAW_IMU', self.on_imu_message)
+            self.frame_scheduler.add_periodic(self.update_position_estimation, base.POSITION_UPDATE_INTERVAL)
             self.position_widget.update_status("位置推定実行中", "#4CAF50")
         except Exception as e:
+            logger.error("位置推定を開始できません: %s", e)
             self.position_widget.update_status(f"エラー: {str(e)}", "#F44336")
             
     def stop_position_estimation(self):
         """位置推定を停止"""
-        self.update_timer.stop()
+        self.frame_scheduler.remove(self.update_position_estimation)
+        if self.velocity_calculator:
+            self.velocity_calculator.telemetry.client.unsubscribe('RAW_IMU', self.on_imu_message)
+            self.velocity_calculator.close()
+            self.velocity_calculator = None
         self.position_widget.update_status("停止中", "#888888")
         
+    def on_imu_message(self, msg):
+        """RAW_IMUを受信したら次のフレームで位置推定を更新する"""
+        self.frame_scheduler.mark_dirty(self.update_position_estimation)
+        
     def update_position_estimation(self):
         """位置推定データを更新"""
         try:
@@ -263,7 +278,7 @@ class PositionEstimationManager:
                 # 位置データを取得
                 position_queue, time_queue = self.velocity_calculator.get_position_data()
                 
-                if position_queue and len(position_queue) > 0:
+                if len(position_queue) > 0:
                     # 最新の位置と速度を取得
                     current_position = self.velocity_calculator.get_current_position()
                     current_velocity = self.velocity_calculator.get_current_velocity()
@@ -288,6 +303,7 @@ class PositionEstimationManager:
                     self.position_widget.update_status("データなし", "#FF9800")
                     
         except Exception as e:
+            logger.error("位置推定の更新エラー: %s", e)
             self.position_widget.update_status(f"更新エラー: {str(e)}", "#F44336")
             
     def reset_position_estimation(self):
@@ -1,120 +1,166 @@
-from PyQt5.QtWidgets import QProgressBar, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QGridLayout
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QSizePolicy
+from PyQt5.QtCore import Qt, QRect, QTimer
+from PyQt5.QtGui import QPainter, QColor, QFont, QPen
 from vectordive.config import base
+import time
+
+# スラスター出力の表示
+# 6本のバーは1つのウィジェットがまとめて描画し（子ウィジェット18個のスタイルシート描画をやめる）、
+# 値が変わったバーの行だけを再描画する。状態ラベルの文字列も値が変わった時だけ、最短 TELEMETRY_LABEL_INTERVAL 秒ごとに作り直す
+
+BAR_COLOR = QColor("#4CAF50")
+BAR_BACKGROUND = QColor("#2b2b2b")
+BAR_BORDER = QColor("#555555")
+LABEL_COLOR = QColor("white")
+TEXT_COLOR = QColor("#cccccc")
+
+
+class ThrusterBars(QWidget):
+    """スラスターの出力バーをまとめて描画するウィジェット"""
+
+    ROW_HEIGHT = 22
+    LABEL_WIDTH = 28
+    VALUE_WIDTH = 40
+
+    def __init__(self, count=6, minimum=None, maximum=None, default=None, parent=None):
+        super().__init__(parent)
+        self.minimum = minimum if minimum is not None else base.THRUSTER_MINIMUM
+        self.maximum = maximum if maximum is not None else base.THRUSTER_MAXIMUM
+        default = default if default is not None else base.THRUSTER_DEFAULT
+        self.values = [default] * count
+        self.value_texts = [str(default)] * count  # 値が変わった時だけ作り直す
+        self.names = [f"T{i + 1}" for i in range(count)]
+        self.row_rects = []
+        self.bar_rects = []
+
+        self.label_font = QFont()
+        self.label_font.setBold(True)
+        self.label_font.setPixelSize(10)
+        self.value_font = QFont()
+        self.value_font.setBold(True)
+        self.value_font.setPixelSize(9)
+
+        # 背景も自分で塗るので、親の再描画を省く
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setMinimumHeight(self.ROW_HEIGHT * count)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def sizeHint(self):
+        size = super().sizeHint()
+        size.setHeight(self.ROW_HEIGHT * len(self.values))
+        return size
+
+    def set_value(self, index, value):
+        """値を設定し、変わった場合だけその行を再描画する（変わったかどうかを返す）"""
+        if self.values[index] == value:
+            return False
+        self.values[index] = value
+        self.value_texts[index] = str(value)
+        if self.row_rects:
+            self.update(self.row_rects[index])
+        return True
+
+    def resizeEvent(self, event):
+        # 行とバーの位置は大きさが変わった時だけ計算する
+        width = self.width()
+        self.row_rects = []
+        self.bar_rects = []
+        for i in range(len(self.values)):
+            row = QRect(0, i * self.ROW_HEIGHT, width, self.ROW_HEIGHT)
+            bar = QRect(self.LABEL_WIDTH, row.top() + 3,
+                        max(1, width - self.LABEL_WIDTH - self.VALUE_WIDTH), self.ROW_HEIGHT - 6)
+            self.row_rects.append(row)
+            self.bar_rects.append(bar)
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        region = event.rect()
+        painter.fillRect(region, BAR_BACKGROUND)
+        span = self.maximum - self.minimum
+        for i, row in enumerate(self.row_rects):
+            if not row.intersects(region):
+                continue
+            bar = self.bar_rects[i]
+
+            painter.setFont(self.label_font)
+            painter.setPen(LABEL_COLOR)
+            painter.drawText(QRect(0, row.top(), self.LABEL_WIDTH, row.height()), Qt.AlignCenter, self.names[i])
+
+            # バー（範囲外の値は端に合わせる）
+            ratio = min(max((self.values[i] - self.minimum) / span, 0.0), 1.0)
+            fill_width = int(round((bar.width() - 2) * ratio))
+            if fill_width > 0:
+                painter.fillRect(bar.left() + 1, bar.top() + 1, fill_width, bar.height() - 2, BAR_COLOR)
+            painter.setPen(QPen(BAR_BORDER))
+            painter.drawRect(bar.adjusted(0, 0, -1, -1))
+
+            painter.setFont(self.value_font)
+            painter.setPen(TEXT_COLOR)
+            painter.drawText(bar, Qt.AlignCenter, self.value_texts[i])
+            painter.setPen(BAR_COLOR)
+            painter.drawText(QRect(bar.right() + 1, row.top(), self.VALUE_WIDTH, row.height()),
+                             Qt.AlignCenter, self.value_texts[i])
+        painter.end()
+
 
 class ProgressBar(QWidget):
     def __init__(self):
         super().__init__()
+        self.status_interval = base.TELEMETRY_LABEL_INTERVAL
+        self.last_status_time = 0.0
+        self.status_stale = True  # 状態ラベルがスラスター値以外を表示している
         self.init_ui()
-        
+
     def init_ui(self):
         # レイアウトの設定
         layout = QVBoxLayout()
         self.setLayout(layout)
-        
+
         # タイトルラベル
         title_label = QLabel("Thruster Output Telemetry")
         title_label.setStyleSheet("font-weight: bold; color: white; font-size: 14px;")
         title_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(title_label)
-        
-        # 6つのスラスター用の縦並びレイアウト
-        thruster_layout = QVBoxLayout()
-        
-        # プログレスバーの初期化
-        maximum = base.THRUSTER_MAXIMUM
-        minimum = base.THRUSTER_MINIMUM
-        default = base.THRUSTER_DEFAULT
-        
-        # 6つのスラスター用プログレスバーを作成
-        self.progress_bars = []
-        self.thruster_labels = []
-        
-        for i in range(6):
-            # スラスター番号
-            thruster_num = i + 1
-            
-            # 個別のスラスター用レイアウト
-            thruster_item_layout = QVBoxLayout()
-            
-            # スラスター名ラベル
-            thruster_label = QLabel(f"T{thruster_num}")
-            thruster_label.setStyleSheet("color: white; font-weight: bold; font-size: 10px;")
-            thruster_label.setAlignment(Qt.AlignCenter)
-            
-            # プログレスバー
-            progress_bar = QProgressBar()
-            progress_bar.setMinimum(minimum)
-            progress_bar.setMaximum(maximum)
-            progress_bar.setValue(default)
-            progress_bar.setTextVisible(True)
-            progress_bar.setFormat("%v")
-            
-            # マウス操作を無効にする
-            progress_bar.setEnabled(False)
-            
-            # プログレスバーのスタイル設定（細く）
-            progress_bar.setStyleSheet("""
-                QProgressBar {
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                    text-align: center;
-                    background-color: #2b2b2b;
-                    color: white;
-                    min-height: 15px;
-                    max-height: 15px;
-                    font-size: 9px;
-                }
-                QProgressBar::chunk {
-                    background-color: #4CAF50;
-                    border-radius: 2px;
-                }
-                QProgressBar:disabled {
-                    color: #cccccc;
-                }
-            """)
-            
-            # 値を表示するラベル
-            value_label = QLabel(f"{default}")
-            value_label.setStyleSheet("color: #4CAF50; font-weight: bold; font-size: 9px;")
-            value_label.setAlignment(Qt.AlignCenter)
-            
-            # レイアウトに追加
-            thruster_item_layout.addWidget(thruster_label)
-            thruster_item_layout.addWidget(progress_bar)
-            thruster_item_layout.addWidget(value_label)
-            
-            # メインレイアウトに追加
-            thruster_layout.addLayout(thruster_item_layout)
-            
-            # リストに保存
-            self.progress_bars.append(progress_bar)
-            self.thruster_labels.append(value_label)
-        
-        layout.addLayout(thruster_layout)
-        
+
+        # 6つのスラスターのバー
+        self.bars = ThrusterBars(6)
+        layout.addWidget(self.bars)
+
         # テレメトリ状態表示用ラベル
         self.telemetry_label = QLabel("Telemetry: Waiting for data...")
         self.telemetry_label.setStyleSheet("color: #888888; font-size: 10px;")
         self.telemetry_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.telemetry_label)
 
+        # 間引いた状態ラベルの更新を、最後の値で後から反映するためのタイマー
+        self.status_timer = QTimer(self)
+        self.status_timer.setSingleShot(True)
+        self.status_timer.timeout.connect(self.flush_status)
+
     def get_widget(self):
         # 自分自身（QWidget）を返す
         return self
 
     def set_value(self, thruster_index, value):
-        """特定のスラスターの値を設定する"""
-        if 0 <= thruster_index < len(self.progress_bars):
-            self.progress_bars[thruster_index].setValue(value)
-            self.thruster_labels[thruster_index].setText(f"{value}")
+        """特定のスラスターの値を設定する（変わったかどうかを返す）"""
+        if 0 <= thruster_index < len(self.bars.values):
+            return self.bars.set_value(thruster_index, value)
+        return False
 
     def get_value(self, thruster_index=0):
         """特定のスラスターの値を取得する"""
-        if 0 <= thruster_index < len(self.progress_bars):
-            return self.progress_bars[thruster_index].value()
+        if 0 <= thruster_index < len(self.bars.values):
+            return self.bars.values[thruster_index]
         return 0
-        
+
+    def set_status(self, text):
+        """状態ラベルを書き換える（保留中のスラスター値の表示は取り消す）"""
+        self.status_timer.stop()
+        self.status_stale = True
+        if self.telemetry_label.text() != text:
+            self.telemetry_label.setText(text)
+
     def update_from_telemetry(self, telemetry_data):
         """テレメトリデータから値を更新する"""
         if telemetry_data:
@@ -124,26 +170,40 @@ class ProgressBar(QWidget):
                 if hasattr(telemetry_data, servo_attr):
                     value = getattr(telemetry_data, servo_attr)
                     self.set_value(i, value)
-            self.telemetry_label.setText("Telemetry: Data received")
+            self.set_status("Telemetry: Data received")
         else:
-            self.telemetry_label.setText("Telemetry: No connection")
-            
+            self.set_status("Telemetry: No connection")
+
     def update_from_servo_data(self, servo1_raw, servo2_raw, servo3_raw, servo4_raw, servo5_raw, servo6_raw):
-        """6つのスラスター値から更新する"""
+        """6つのスラスター値から更新する（変わった値だけ再描画する）"""
         try:
-            servo_values = [servo1_raw, servo2_raw, servo3_raw, servo4_raw, servo5_raw, servo6_raw]
-            
+            servo_values = (servo1_raw, servo2_raw, servo3_raw, servo4_raw, servo5_raw, servo6_raw)
+            changed = False
             for i, value in enumerate(servo_values):
-                if value is not None:
-                    self.set_value(i, value)
-                else:
-                    # Noneの場合は0に設定
-                    self.set_value(i, 0)
-            
-            # テレメトリ状態を更新
-            if any(v is not None and v != 0 for v in servo_values):
-                self.telemetry_label.setText(f"Telemetry: T1={servo1_raw}, T2={servo2_raw}, T3={servo3_raw}, T4={servo4_raw}, T5={servo5_raw}, T6={servo6_raw}")
-            else:
-                self.telemetry_label.setText("Telemetry: All thrusters at 0")
+                # Noneの場合は0に設定
+                if self.bars.set_value(i, value if value is not None else 0):
+                    changed = True
+            if not changed and not self.status_stale:
+                return
+
+            # 状態ラベルは最短 status_interval 秒ごとに書き換え、間の値は最後の値だけ後から反映する
+            remaining = self.last_status_time + self.status_interval - time.monotonic()
+            if remaining <= 0:
+                self.flush_status()
+            elif not self.status_timer.isActive():
+                self.status_timer.start(int(remaining * 1000) + 1)
         except Exception as e:
-            self.telemetry_label.setText(f"Telemetry Error: {str(e)}")
\ No newline at end of file
+            self.set_status(f"Telemetry Error: {str(e)}")
+
+    def flush_status(self):
+        """現在のスラスター値から状態ラベルを作る"""
+        self.status_timer.stop()
+        self.status_stale = False
+        self.last_status_time = time.monotonic()
+        values = self.bars.values
+        if any(values):
+            text = "Telemetry: " + ", ".join(f"T{i + 1}={value}" for i, value in enumerate(values))
+        else:
+            text = "Telemetry: All thrusters at 0"
+        if self.telemetry_label.text() != text:
+            self.telemetry_label.setText(text)
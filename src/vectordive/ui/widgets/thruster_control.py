@@ -1,10 +1,62 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton
 from PyQt5.QtCore import Qt, pyqtSignal
+from vectordive.workers.thruster_command import ThrusterCommandSender
+from vectordive.workers.gamepad import GamepadReader
+from vectordive.config import base
+import time
 
 class ThrusterControl(QWidget):
-    def __init__(self):
+    def __init__(self, client=None):
         super().__init__()
+        # スライダーの値は送信スレッドの最新値を更新するだけにし、送信は一定周期で行う
+        self.command_sender = None
+        self.gamepad_reader = None
+        # 閉じずに破棄された場合も送信スレッドを止める（止めないとオーバーライドを送り続ける）
+        # destroyed の時点ではPythonのオブジェクトが使えないことがあるので、selfを参照しない関数にする
+        threads = self.worker_threads = []
+        self.destroyed.connect(lambda *args: [thread.stop() for thread in list(threads)])
         self.init_ui()
+        if client is not None:
+            self.set_client(client)
+
+    def set_client(self, client):
+        """指令を送る接続を設定して送信スレッドを開始する"""
+        self.stop_commands()
+        self.command_sender = ThrusterCommandSender(client)
+        self.command_sender.start()
+        self.worker_threads.append(self.command_sender)
+        if base.GAMEPAD_ENABLED:
+            self.start_gamepad()
+
+    def start_gamepad(self, device=None):
+        """ゲームパッドの読み込みを始める（デバイスを開くのも読み込みスレッドで行い、GUIを止めない）"""
+        self.stop_gamepad()
+        if self.command_sender is None:
+            return
+        self.gamepad_reader = GamepadReader(self.command_sender, device)
+        self.gamepad_reader.start()
+        # 送信スレッドより先に止める
+        self.worker_threads.insert(0, self.gamepad_reader)
+
+    def stop_gamepad(self):
+        """ゲームパッドの読み込みを止める"""
+        if self.gamepad_reader is not None:
+            self.worker_threads.remove(self.gamepad_reader)
+            self.gamepad_reader.stop()
+            self.gamepad_reader = None
+
+    def stop_commands(self):
+        """送信スレッドを止める（機体側のオーバーライドは解除する）"""
+        self.stop_gamepad()
+        if self.command_sender is not None:
+            self.worker_threads.remove(self.command_sender)
+            self.command_sender.stop()
+            self.command_sender = None
+
+    def closeEvent(self, event):
+        """閉じる時に送信スレッドを止めてオーバーライドを解除する"""
+        self.stop_commands()
+        super().closeEvent(event)
         
     def init_ui(self):
         layout = QVBoxLayout()
@@ -53,7 +105,8 @@ class ThrusterControl(QWidget):
                 background-color: #aa0000;
             }
         """)
-        emergency_btn.clicked.connect(self.emergency_stop)
+        # 離した時（clicked）ではなく押した時に止める
+        emergency_btn.pressed.connect(self.emergency_stop)
         layout.addWidget(emergency_btn)
         
     def create_thruster_control(self, parent_layout, name, thruster_id):
@@ -127,15 +180,27 @@ class ThrusterControl(QWidget):
         
     def thruster_value_changed(self, thruster_id, value):
         """スラスター値が変更された時の処理"""
-        # ここで実際のスラスター制御処理を実装
+        # 最新値を更新するだけ（送信は送信スレッドが一定周期で行う）
+        if self.command_sender is not None:
+            # 緊急停止の後はスライダーを操作した時に指令を再開する
+            if self.command_sender.emergency_latched:
+                self.command_sender.clear_emergency_stop()
+            self.command_sender.set_percent(thruster_id - 1, value)
         
     def emergency_stop(self):
         """緊急停止処理"""
-        # 全てのスラスターを0に設定
+        pressed_time = time.perf_counter()
+        # スライダーより先に、送信スレッドを経由せず中立値を送る
+        if self.command_sender is not None:
+            self.command_sender.emergency_stop(pressed_time)
+        # 全てのスラスターを0に設定（valueChangedで指令を出し直さないよう、シグナルを止めて表示だけ戻す）
         for i in range(1, 7):  # 6つのスラスター
             slider = getattr(self, f"slider_{i}", None)
             if slider:
+                slider.blockSignals(True)
                 slider.setValue(0)
+                slider.blockSignals(False)
+                getattr(self, f"value_label_{i}").setText("0%")
         
     def get_widget(self):
         """ウィジェットを返す"""
@@ -0,0 +1,382 @@
+from collections import deque
+from PyQt5.QtWidgets import (QGraphicsView, QGraphicsScene, QGraphicsEllipseItem, QGraphicsItem,
+                             QStyleOptionGraphicsItem)
+from PyQt5.QtGui import QPen, QBrush, QColor, QPainter, QPainterPath
+from PyQt5.QtCore import QPointF, QRectF, QLineF
+from vectordive.config import base
+import math
+
+# 推定位置の航跡を表示するマップ
+# 現在位置のマーカーとラベルは作り直さずに setPos で動かし、航跡は TrackLayer が1つのアイテムとして描く
+# 動くアイテムしかないのでシーンのインデックスは使わず、グリッドはアイテムにせず drawBackground で見えている範囲だけ描く
+#
+# 長時間の航跡は詳細度（LOD）ごとに間引いた経路を点の到着に合わせて作っておき、ズームに応じて1つを選んで描く
+# 各レベルは一定点数のビンごとに x, y の最小・最大となる点（最大4点）だけを残す。ビンの大きさが1ピクセル未満なら
+# 見た目は元の経路と変わらないので、10時間分の航跡でも描く点数は画面の大きさ程度に収まる
+
+GRID_COLOR = QColor(100, 100, 100)
+CENTER_COLOR = QColor(255, 0, 0)
+POSITION_COLOR = QColor(0, 255, 0)
+TRACK_COLOR = QColor(0, 200, 255)
+
+
+def point_rect(point):
+    """点を囲む1x1の範囲（大きさ0の QRectF は united で無視されるため）"""
+    return QRectF(point.x() - 0.5, point.y() - 0.5, 1.0, 1.0)
+
+
+class TrackChunk:
+    """経路の一部（表示範囲外のものを描かずに済むよう範囲も持つ）"""
+
+    __slots__ = ('path', 'count', 'last_index', 'bounds')
+
+    def __init__(self, start, index):
+        self.path = QPainterPath(start)
+        self.count = 1
+        self.last_index = index  # 最後の点の元の通し番号（古い航跡を捨てる時に使う）
+        self.bounds = point_rect(start)
+
+    def add(self, point, index):
+        self.path.lineTo(point)
+        self.count += 1
+        self.last_index = index
+        self.bounds = self.bounds.united(point_rect(point))
+
+
+class TrackLevel:
+    """1つの詳細度の経路（bin_size 点ごとに最小・最大の点だけを残す、bin_size=1は全点）"""
+
+    def __init__(self, bin_size, chunk_points):
+        self.bin_size = bin_size
+        self.chunk_points = chunk_points
+        self.chunks = deque()
+        self.count = 0  # 経路の点数
+        self.last_point = None
+        self.extent_sum = 0.0  # 完成したビンの大きさ（シーン座標）の合計
+        self.bin_count = 0
+        self.reset_bin()
+
+    def reset_bin(self):
+        self.bin_points = 0
+        self.extremes = [None, None, None, None]  # x最小, x最大, y最小, y最大 の (通し番号, 点)
+
+    def mean_extent(self):
+        """ビンの平均の大きさ（完成したビンがなければ無限大）"""
+        return self.extent_sum / self.bin_count if self.bin_count else math.inf
+
+    def append_point(self, point, index):
+        """経路に1点追加する"""
+        if not self.chunks or self.chunks[-1].count >= self.chunk_points:
+            # 新しいチャンクは前のチャンクの最後の点から始めて線をつなげる
+            self.chunks.append(TrackChunk(self.last_point if self.last_point is not None else point, index))
+            self.count += 1
+        self.chunks[-1].add(point, index)
+        self.count += 1
+        self.last_point = point
+
+    def add(self, point, index):
+        """元の点を1つ受け取る"""
+        if self.bin_size == 1:
+            self.append_point(point, index)
+            return
+        extremes = self.extremes
+        x, y = point.x(), point.y()
+        if extremes[0] is None:
+            extremes[:] = [(index, point)] * 4
+        else:
+            if x < extremes[0][1].x():
+                extremes[0] = (index, point)
+            if x > extremes[1][1].x():
+                extremes[1] = (index, point)
+            if y < extremes[2][1].y():
+                extremes[2] = (index, point)
+            if y > extremes[3][1].y():
+                extremes[3] = (index, point)
+        self.bin_points += 1
+        if self.bin_points < self.bin_size:
+            return
+        # ビンが埋まったら、残す点を元の順番で経路に追加する
+        for extreme_index, extreme in self.get_bin_points():
+            self.append_point(extreme, extreme_index)
+        self.extent_sum += math.hypot(extremes[1][1].x() - extremes[0][1].x(),
+                                      extremes[3][1].y() - extremes[2][1].y())
+        self.bin_count += 1
+        self.reset_bin()
+
+    def get_bin_points(self):
+        """作りかけのビンで残す点（元の順番、重複なし）"""
+        if self.extremes[0] is None:
+            return []
+        return sorted(dict(self.extremes).items())
+
+    def get_bin_rect(self):
+        """作りかけのビンの範囲（前の点を含む）"""
+        rect = None
+        for _, point in self.get_bin_points() + ([(0, self.last_point)] if self.last_point is not None else []):
+            rect = point_rect(point) if rect is None else rect.united(point_rect(point))
+        return rect
+
+    def drop_before(self, index):
+        """index より前の点だけのチャンクを捨てる（捨てたかどうかを返す）"""
+        dropped = False
+        while len(self.chunks) > 1 and self.chunks[0].last_index < index:
+            self.count -= self.chunks.popleft().count
+            dropped = True
+        return dropped
+
+    def clear(self):
+        self.chunks.clear()
+        self.count = 0
+        self.last_point = None
+        self.extent_sum = 0.0
+        self.bin_count = 0
+        self.reset_bin()
+
+
+class TrackLayer(QGraphicsItem):
+    """航跡を表示倍率に合った詳細度で描くアイテム"""
+
+    def __init__(self, pen, parent=None):
+        super().__init__(parent)
+        self.pen = pen
+        self.capacity = base.MAP_TRACK_CAPACITY
+        self.tolerance = base.MAP_LOD_TOLERANCE
+        self.max_points = base.MAP_LOD_MAX_POINTS
+        self.levels = [TrackLevel(bin_size, base.MAP_TRACK_CHUNK_POINTS)
+                       for bin_size in [1] + list(base.MAP_LOD_BIN_SIZES)]
+        self.index = 0  # 次の点の通し番号
+        self.bounds = QRectF()
+        self.drawn_level = 0  # 最後に描いた詳細度
+        # 表示範囲外のチャンクを描かないよう、再描画範囲を受け取る
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        # 太さを表示倍率によらず一定にしているので、縮小時に線がはみ出す分の余白
+        self.margin = 3.0 / base.MAP_MIN_ZOOM
+
+    def boundingRect(self):
+        return self.bounds.adjusted(-self.margin, -self.margin, self.margin, self.margin)
+
+    def add_point(self, point):
+        """航跡に点を追加し、変わった部分だけ再描画する"""
+        rect = point_rect(point)
+        if self.bounds.isNull():
+            self.prepareGeometryChange()
+            self.bounds = rect
+        elif not self.bounds.contains(point):
+            self.prepareGeometryChange()
+            self.bounds = self.bounds.united(rect)
+
+        # 再描画範囲は、いま描いている詳細度で変わりうる部分（新しい線分と作りかけのビン）
+        level = self.levels[self.drawn_level]
+        dirty = rect
+        if level.last_point is not None:
+            dirty = dirty.united(point_rect(level.last_point))
+        for each in self.levels:
+            each.add(point, self.index)
+        bin_rect = level.get_bin_rect()
+        if bin_rect is not None:
+            dirty = dirty.united(bin_rect)
+        self.index += 1
+
+        # 上限を超えたら古いチャンクから捨てる（捨てた時は残った航跡に範囲を縮める）
+        if self.index > self.capacity:
+            dropped = [each.drop_before(self.index - self.capacity) for each in self.levels]
+            if dropped[0]:
+                self.update_bounds()
+        self.update(dirty.adjusted(-self.margin, -self.margin, self.margin, self.margin))
+
+    def update_bounds(self):
+        """残っている全点のチャンクから範囲を計算し直す（チャンクを捨てた時だけ、MAP_TRACK_CHUNK_POINTS 点ごと）"""
+        bounds = QRectF()
+        for chunk in self.levels[0].chunks:
+            bounds = chunk.bounds if bounds.isNull() else bounds.united(chunk.bounds)
+        if bounds != self.bounds:
+            # 縮んだ部分に描いてあった航跡も消えるよう、変わる前の範囲も再描画する
+            self.update()
+            self.prepareGeometryChange()
+            self.bounds = bounds
+
+    def choose_level(self, zoom, exposed):
+        """1ピクセルあたりの誤差が許容範囲に収まる、最も粗い詳細度を選ぶ"""
+        chosen = 0
+        for number in range(len(self.levels) - 1, 0, -1):
+            if self.levels[number].mean_extent() * zoom <= self.tolerance:
+                chosen = number
+                break
+        # 表示範囲内の点数が多すぎる場合はさらに粗くする
+        while (chosen < len(self.levels) - 1
+               and sum(chunk.count for chunk in self.get_visible_chunks(chosen, exposed)) > self.max_points):
+            chosen += 1
+        return chosen
+
+    def get_visible_chunks(self, number, exposed):
+        """再描画範囲にかかるチャンク"""
+        return [chunk for chunk in self.levels[number].chunks if chunk.bounds.intersects(exposed)]
+
+    def paint(self, painter, option, widget=None):
+        zoom = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        exposed = option.exposedRect.adjusted(-self.margin, -self.margin, self.margin, self.margin)
+        self.drawn_level = self.choose_level(zoom, exposed)
+        level = self.levels[self.drawn_level]
+        # 粗い詳細度のチャンクは最後の点で捨てるかを決めるので、捨てた範囲の点を含むことがある
+        painter.setClipRect(self.boundingRect())
+        painter.setPen(self.pen)
+        for chunk in self.get_visible_chunks(self.drawn_level, exposed):
+            painter.drawPath(chunk.path)
+        # 作りかけのビンは最小・最大の点と最新の点でつなぐ
+        if level.bin_size > 1 and level.extremes[0] is not None:
+            tail = QPainterPath(level.last_point if level.last_point is not None else level.extremes[0][1])
+            for _, point in level.get_bin_points():
+                tail.lineTo(point)
+            painter.drawPath(tail)
+
+    def clear(self):
+        self.prepareGeometryChange()
+        for level in self.levels:
+            level.clear()
+        self.index = 0
+        self.bounds = QRectF()
+        self.update()
+
+
+class TrackScene(QGraphicsScene):
+    """グリッドを背景として描くシーン"""
+
+    def __init__(self, grid_size, grid_width, grid_height, parent=None):
+        super().__init__(parent)
+        self.grid_size = grid_size
+        self.grid_rect = QRectF(0, 0, grid_width * grid_size, grid_height * grid_size)
+        self.grid_pen = QPen(GRID_COLOR, 1)
+        self.grid_pen.setCosmetic(True)
+        self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.setSceneRect(self.grid_rect.adjusted(-30, -30, 30, 30))
+
+    def drawBackground(self, painter, rect):
+        painter.fillRect(rect, QColor("#2b2b2b"))
+        area = rect.intersected(self.grid_rect)
+        if area.isEmpty():
+            return
+        size = self.grid_size
+        # 縮小してグリッドが細かくなりすぎる場合は間隔を広げる
+        zoom = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        while size * zoom < 5:
+            size *= 5
+        left = self.grid_rect.left() + math.ceil((area.left() - self.grid_rect.left()) / size) * size
+        top = self.grid_rect.top() + math.ceil((area.top() - self.grid_rect.top()) / size) * size
+        lines = []
+        x = left
+        while x <= area.right():
+            lines.append(QLineF(x, area.top(), x, area.bottom()))
+            x += size
+        y = top
+        while y <= area.bottom():
+            lines.append(QLineF(area.left(), y, area.right(), y))
+            y += size
+        painter.setPen(self.grid_pen)
+        painter.drawLines(lines)
+
+
+class TrackMapView(QGraphicsView):
+    """現在位置と航跡を表示するマップ（1メートル = scale ピクセル、Y軸は上向き、ホイールで拡大縮小・ドラッグで移動）"""
+
+    def __init__(self, parent=None):
+        self.grid_size = 15
+        self.grid_width = 60
+        self.grid_height = 45
+        self.scale_factor = base.MAP_SCALE
+        self.min_step = base.MAP_TRACK_MIN_STEP
+        self.zoom = 1.0
+
+        self.map_scene = TrackScene(self.grid_size, self.grid_width, self.grid_height)
+        super().__init__(self.map_scene, parent)
+        self.setStyleSheet("""
+            QGraphicsView {
+                background-color: #2b2b2b;
+                border: 1px solid #555555;
+            }
+        """)
+        self.setRenderHint(QPainter.Antialiasing)
+        self.setCacheMode(QGraphicsView.CacheBackground)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+
+        # 中心点をマーク
+        self.center_x = self.grid_width // 2 * self.grid_size
+        self.center_y = self.grid_height // 2 * self.grid_size
+        self.center_marker = self.map_scene.addEllipse(self.center_x - 5, self.center_y - 5, 10, 10,
+                                                       QPen(CENTER_COLOR, 2), QBrush(CENTER_COLOR))
+        self.center_text = self.map_scene.addText("CENTER")
+        self.center_text.setDefaultTextColor(CENTER_COLOR)
+        self.center_text.setPos(self.center_x + 15, self.center_y - 10)
+
+        # 座標軸のラベル
+        x_label = self.map_scene.addText("X")
+        x_label.setDefaultTextColor(QColor(255, 255, 255))
+        x_label.setPos(self.grid_width * self.grid_size + 10, self.grid_height * self.grid_size // 2)
+        y_label = self.map_scene.addText("Y")
+        y_label.setDefaultTextColor(QColor(255, 255, 255))
+        y_label.setPos(self.grid_width * self.grid_size // 2, -20)
+
+        # 航跡
+        track_pen = QPen(TRACK_COLOR, 1.5)
+        track_pen.setCosmetic(True)
+        self.track_layer = TrackLayer(track_pen)
+        self.track_layer.setZValue(1)
+        self.map_scene.addItem(self.track_layer)
+        self.last_point = None
+
+        # 現在位置のマーカーとラベル（最初の位置が届くまで隠す、拡大縮小しても大きさは変えない）
+        self.position_marker = QGraphicsEllipseItem(-8, -8, 16, 16)
+        self.position_marker.setPen(QPen(POSITION_COLOR, 2))
+        self.position_marker.setBrush(QBrush(POSITION_COLOR))
+        self.position_marker.setFlag(QGraphicsItem.ItemIgnoresTransformations)
+        self.position_marker.setZValue(2)
+        self.position_marker.setVisible(False)
+        self.map_scene.addItem(self.position_marker)
+        self.position_text = self.map_scene.addText("")
+        self.position_text.setDefaultTextColor(POSITION_COLOR)
+        self.position_text.setParentItem(self.position_marker)
+        self.position_text.setPos(20, -10)
+
+    def to_scene(self, position):
+        """位置 [m] をシーン座標に変換する"""
+        return QPointF(self.center_x + position[0] * self.scale_factor,
+                       self.center_y - position[1] * self.scale_factor)  # Y軸は反転
+
+    def set_position(self, position):
+        """現在位置を動かし、航跡に点を追加する"""
+        point = self.to_scene(position)
+        self.position_marker.setPos(point)
+        text = f"({position[0]:.1f}, {position[1]:.1f})"
+        if self.position_text.toPlainText() != text:
+            self.position_text.setPlainText(text)
+        if not self.position_marker.isVisible():
+            self.position_marker.setVisible(True)
+        self.append_track_point(point)
+
+    def append_track_point(self, point):
+        """航跡に点を追加する（前の点からほとんど動いていなければ追加しない）"""
+        if self.last_point is not None:
+            step = point - self.last_point
+            if abs(step.x()) < self.min_step and abs(step.y()) < self.min_step:
+                return
+        self.track_layer.add_point(point)
+        self.last_point = point
+        # グリッドの外へ出たらスクロールできる範囲を広げる
+        scene_rect = self.map_scene.sceneRect()
+        if not scene_rect.contains(point):
+            self.map_scene.setSceneRect(scene_rect.united(point_rect(point).adjusted(-30, -30, 30, 30)))
+
+    def clear_track(self):
+        """航跡を消す"""
+        self.track_layer.clear()
+        self.last_point = None
+
+    def set_zoom(self, zoom):
+        """表示倍率を設定する"""
+        zoom = min(max(zoom, base.MAP_MIN_ZOOM), base.MAP_MAX_ZOOM)
+        self.scale(zoom / self.zoom, zoom / self.zoom)
+        self.zoom = zoom
+
+    def wheelEvent(self, event):
+        self.set_zoom(self.zoom * 1.25 ** (event.angleDelta().y() / 120))
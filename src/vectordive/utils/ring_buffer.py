@@ -0,0 +1,61 @@
+import numpy as np
+
+# 固定容量のリングバッファ（履歴データ・グラフ描画用）
+# 各行を2か所に書き込むことで、古い順に並んだ窓を常に連続したビューとして返せる
+
+
+class RingBuffer:
+    """capacity x channels の float64 リングバッファ"""
+
+    def __init__(self, capacity, channels, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        # 同じ内容を前半と後半に書き込むため2倍確保する
+        self.data = np.zeros((2 * self.capacity, self.channels), dtype=dtype)
+        self.head = 0  # 次に書き込む位置
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        """1行追加する（O(1)）"""
+        self.data[self.head] = row
+        self.data[self.head + self.capacity] = row
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def extend(self, rows):
+        """複数行 (M, channels) をまとめて追加する"""
+        rows = np.asarray(rows, dtype=self.data.dtype).reshape(-1, self.channels)
+        if len(rows) > self.capacity:
+            rows = rows[-self.capacity:]
+        count = len(rows)
+        if count == 0:
+            return
+        # 末尾で折り返す場合は2回に分けて書き込む
+        first = min(count, self.capacity - self.head)
+        for offset, chunk in ((self.head, rows[:first]), (0, rows[first:])):
+            if len(chunk) == 0:
+                continue
+            self.data[offset:offset + len(chunk)] = chunk
+            self.data[offset + self.capacity:offset + self.capacity + len(chunk)] = chunk
+        self.head = (self.head + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def view(self):
+        """古い順に並んだ窓をコピーせずに返す（次の追加までの間だけ有効）"""
+        start = self.head - self.size + self.capacity
+        return self.data[start:start + self.size]
+
+    def latest(self):
+        """最新の行を返す（空の場合はNone）"""
+        if self.size == 0:
+            return None
+        return self.data[self.head - 1 + self.capacity]
+
+    def clear(self):
+        """空にする"""
+        self.head = 0
+        self.size = 0
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from vectordive.utils.ring_buffer import RingBuffer
+
+
+def rows(start, stop):
+    return np.array([[i, -i] for i in range(start, stop)], dtype=np.float64)
+
+def test_empty_buffer():
+    buffer = RingBuffer(4, 2)
+
+    assert len(buffer) == 0
+    assert buffer.view().shape == (0, 2)
+    assert buffer.latest() is None
+
+def test_append_wraps_around_in_order():
+    buffer = RingBuffer(4, 2)
+    for row in rows(0, 7):
+        buffer.append(row)
+
+    assert len(buffer) == 4
+    np.testing.assert_array_equal(buffer.view(), rows(3, 7))
+    np.testing.assert_array_equal(buffer.latest(), [6, -6])
+
+def test_extend_across_the_end_matches_appends():
+    extended = RingBuffer(5, 2)
+    appended = RingBuffer(5, 2)
+    for start, stop in ((0, 3), (3, 7), (7, 8), (8, 14)):
+        extended.extend(rows(start, stop))
+        for row in rows(start, stop):
+            appended.append(row)
+        np.testing.assert_array_equal(extended.view(), appended.view())
+        np.testing.assert_array_equal(extended.latest(), appended.latest())
+
+    np.testing.assert_array_equal(extended.view(), rows(9, 14))
+
+@pytest.mark.parametrize("count", [5, 6, 13])
+def test_extend_larger_than_capacity_keeps_newest(count):
+    buffer = RingBuffer(5, 2)
+    buffer.extend(rows(100, 102))
+    buffer.extend(rows(0, count))
+
+    assert len(buffer) == 5
+    np.testing.assert_array_equal(buffer.view(), rows(count - 5, count))
+    np.testing.assert_array_equal(buffer.latest(), [count - 1, -(count - 1)])
+
+def test_extend_empty_and_flat_input():
+    buffer = RingBuffer(3, 2)
+    buffer.extend(np.empty((0, 2)))
+    assert len(buffer) == 0
+
+    buffer.extend([1, -1, 2, -2])
+    np.testing.assert_array_equal(buffer.view(), rows(1, 3))
+
+def test_view_is_contiguous_and_not_copied():
+    buffer = RingBuffer(4, 2)
+    buffer.extend(rows(0, 6))
+
+    view = buffer.view()
+    assert view.flags['C_CONTIGUOUS']
+    assert np.shares_memory(view, buffer.data)
+
+def test_clear():
+    buffer = RingBuffer(3, 2)
+    buffer.extend(rows(0, 5))
+    buffer.clear()
+
+    assert len(buffer) == 0
+    assert buffer.latest() is None
+    buffer.append([9, -9])
+    np.testing.assert_array_equal(buffer.view(), [[9, -9]])
+
+if __name__ == "__main__":
+    pytest.main([__file__])
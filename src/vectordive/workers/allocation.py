@@ -0,0 +1,117 @@
+import numpy as np
+from vectordive.config import base
+from vectordive.workers.thruster_command import percent_to_pwm
+
+# 推力配分（機体に掛けたい力・モーメントから各スラスターの出力を求める）
+# 配置行列 B（6×N）は、スラスターの出力 f（N、最大推力を1とした [-1, 1]）から機体座標系の
+# 力とモーメント w = [Fx, Fy, Fz, Mx, My, Mz]（N, N·m、x前・y右・z下）への写像 w = B f
+# 擬似逆行列は前もって求めておき、配分は行列1回の掛け算で済ませる（複数の w もまとめて計算できる）
+#
+# 範囲を最も超えたスラスターから順に上限に固定し、残りの力・モーメントを残りのスラスターで配分し直す
+# 固定するスラスターの組み合わせごとの擬似逆行列は、初めて使う時に求めて覚えておく（2^N 通りを全て求めると N が大きい時に起動が遅い）
+
+
+def build_geometry(positions, directions, max_thrust=None):
+    """スラスターの位置 [m] と推力の向き（N×3）から配置行列（6×N）を作る
+
+    列はスラスターが最大推力を出した時の力とモーメントになる。
+    """
+    max_thrust = base.THRUSTER_MAX_THRUST if max_thrust is None else max_thrust
+    positions = np.asarray(positions, dtype=np.float64)
+    directions = np.asarray(directions, dtype=np.float64)
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    forces = directions * np.broadcast_to(max_thrust, len(directions))[:, np.newaxis]
+    moments = np.cross(positions, forces)
+    return np.vstack([forces.T, moments.T])
+
+
+class ThrustAllocator:
+    """力・モーメントからスラスター出力への配分（範囲を超えた分は他のスラスターに振り直す）"""
+
+    def __init__(self, geometry=None, rcond=1e-6):
+        if geometry is None:
+            geometry = base.THRUSTER_GEOMETRY
+        if geometry is None:
+            geometry = build_geometry(base.THRUSTER_POSITIONS, base.THRUSTER_DIRECTIONS)
+        self.geometry = np.asarray(geometry, dtype=np.float64)
+        if self.geometry.ndim != 2 or self.geometry.shape[0] != 6:
+            raise ValueError(f"geometry must be 6xN, got {self.geometry.shape}")
+        self.count = self.geometry.shape[1]
+        self.rcond = rcond
+        self.pinv = np.linalg.pinv(self.geometry, rcond=rcond)
+        self.full_mask = (1 << self.count) - 1
+        # 出力を決めるスラスターの組み合わせ（ビットマスク）ごとの (列番号, 擬似逆行列)
+        self.subsets = {self.full_mask: (np.arange(self.count, dtype=np.intp), self.pinv)}
+
+    def subset(self, mask):
+        """スラスターの組み合わせ（ビットマスク）の列番号と擬似逆行列（初めての組み合わせなら求めて覚えておく）"""
+        subset = self.subsets.get(mask)
+        if subset is None:
+            columns = np.array([i for i in range(self.count) if mask >> i & 1], dtype=np.intp)
+            subset = self.subsets[mask] = (columns, np.linalg.pinv(self.geometry[:, columns], rcond=self.rcond))
+        return subset
+
+    def allocate(self, wrench):
+        """力・モーメント（6、または M×6）からスラスター出力（N、または M×N、[-1, 1]）を求める"""
+        wrench = np.asarray(wrench, dtype=np.float64)
+        output = wrench @ self.pinv.T
+        # 範囲内に収まったものはそのまま、超えたものだけ1つずつ配分し直す
+        saturated = np.abs(output) > 1.0
+        if output.ndim == 1:
+            return self.redistribute(wrench) if saturated.any() else output
+        for row in np.flatnonzero(saturated.any(axis=1)):
+            output[row] = self.redistribute(wrench[row])
+        return output
+
+    def redistribute(self, wrench):
+        """範囲を最も超えたスラスターから順に上限に固定し、残りの力・モーメントを残りのスラスターで配分し直す"""
+        output = np.zeros(self.count)
+        mask = self.full_mask
+        residual = wrench
+        while mask:
+            columns, pinv = self.subset(mask)
+            free = pinv @ residual
+            over = np.abs(free) > 1.0
+            if not over.any():
+                output[columns] = free
+                break
+            # 最も超えたものを上限に固定して、その分を差し引く（まとめて固定すると他の成分まで失う）
+            worst = int(np.argmax(np.abs(free)))
+            fixed = int(columns[worst])
+            output[fixed] = np.sign(free[worst])
+            residual = residual - self.geometry[:, fixed] * output[fixed]
+            mask &= ~(1 << fixed)
+        return np.clip(output, -1.0, 1.0)
+
+    def controllable_axes(self, tolerance=1e-6):
+        """力・モーメントの各成分（6）を単独で出せるか
+
+        配置行列の階数が6未満だと出せない成分がある（例えば既定の配置は T5・T6 が x=0 にあってピッチのモーメントを出せない）。
+        擬似逆行列はその成分を黙って捨てるので、制御する側で確かめるのに使う。
+        """
+        error = self.geometry @ self.pinv - np.eye(6)
+        return np.linalg.norm(error, axis=0) < tolerance
+
+    def achieved(self, output):
+        """スラスター出力から実際に出る力・モーメント"""
+        return np.asarray(output) @ self.geometry.T
+
+    def allocate_pwm(self, wrench):
+        """力・モーメントからスラスターのPWM値（THRUSTER_MINIMUM〜THRUSTER_MAXIMUM）を求める"""
+        return percent_to_pwm(self.allocate(wrench) * 100.0)
+
+
+if __name__ == "__main__":
+    # 配分1回あたりの時間: python -m vectordive.workers.allocation
+    import timeit
+
+    allocator = ThrustAllocator()
+    rng = np.random.default_rng(0)
+    scale = np.abs(allocator.geometry).sum(axis=1)
+    for name, magnitude in (("in range", 0.2), ("saturated", 1.5)):
+        wrenches = rng.uniform(-1.0, 1.0, size=(1000, 6)) * scale * magnitude
+        saturated = (np.abs(wrenches @ allocator.pinv.T) > 1.0).any(axis=1).mean()
+        single = timeit.timeit(lambda: [allocator.allocate_pwm(w) for w in wrenches], number=5) / 5000
+        batch = timeit.timeit(lambda: allocator.allocate_pwm(wrenches), number=5) / 5000
+        print(f"{name:9s} ({saturated:4.0%} saturated)  single: {single * 1e6:6.1f} us ({1 / single:8,.0f} Hz)  "
+              f"batch: {batch * 1e6:6.2f} us/wrench")
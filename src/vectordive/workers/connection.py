@@ -1,23 +1,102 @@
+from PyQt5.QtCore import QThread, pyqtSignal
 from pymavlink import mavutil
-##後で修正
 from vectordive.config import base
+from vectordive.services.mavlink_client import open_connection
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.workers.mavlink_reader import MavlinkReader
+import time
 
-class WaitHeartbeat:
-    def __init__(self):
-        self.master = mavutil.mavlink_connection('udpin:0.0.0.0:14550')
-        self.hb_timeout = base.HB_TIMEOUT
-
-    def wait_heartbeat(self, hbtimeout=None):
-        timeout = hbtimeout if hbtimeout is not None else self.hb_timeout
-        try:
-            hb = self.master.wait_heartbeat(timeout=timeout)
-            if hb is not None:
-                return True
+
+def build_probe_candidates(mode, ip, port):
+    """接続確認を行う候補の接続情報リストを作成する"""
+    candidates = []
+    if mode == 'Serial':
+        # 入力されたデバイスと自動検出したシリアルデバイスを試す
+        devices = [ip] if ip else []
+        devices += [p.device for p in mavutil.auto_detect_serial()]
+        for device in devices:
+            info = {'ip': device, 'port': port, 'mode': 'Serial'}
+            if info not in candidates:
+                candidates.append(info)
+    else:
+        # 入力されたポートと既定のUDPポートを試す
+        ports = [str(port)] + [str(p) for p in base.PROBE_UDP_PORTS]
+        for probe_port in ports:
+            info = {'ip': ip, 'port': probe_port, 'mode': 'UDP'}
+            if info not in candidates:
+                candidates.append(info)
+    return candidates
+
+
+class ConnectionProbeWorker(QThread):
+    """複数の接続候補で並行してHeartbeatを待ち、最初に応答した接続を返すワーカー"""
+
+    progress = pyqtSignal(str)  # 進捗メッセージ
+    connected = pyqtSignal(dict)  # 応答した接続の接続情報
+    failed = pyqtSignal(str)  # 失敗理由
+
+    def __init__(self, candidates, timeout=None, parent=None):
+        super().__init__(parent)
+        self.candidates = candidates
+        self.timeout = timeout if timeout is not None else base.HB_TIMEOUT
+        self._cancelled = False
+        # Heartbeatを受信した接続（GUIスレッドで引き取る）
+        self.connection = None
+        self.reader = None
+
+    def cancel(self):
+        """接続確認を中止する"""
+        self._cancelled = True
+
+    def run(self):
+        probes = []  # (接続情報, 接続, 受信スレッド)
+        for info in self.candidates:
+            if self._cancelled:
+                break
+            try:
+                connection = open_connection(info)
+                reader = MavlinkReader(connection, TelemetryCache())
+                reader.start()
+                probes.append((info, connection, reader))
+                self.progress.emit(f"Waiting for heartbeat on {self.describe(info)}")
+            except Exception as e:
+                self.progress.emit(f"Cannot open {self.describe(info)}: {e}")
+
+        winner = None
+        deadline = time.time() + self.timeout
+        next_report = time.time() + 1.0
+        while probes and winner is None and not self._cancelled and time.time() < deadline:
+            for probe in probes:
+                if probe[2].cache.get('HEARTBEAT') is not None:
+                    winner = probe
+                    break
             else:
-                return False
-        except Exception as e:
-            return False
+                if time.time() >= next_report:
+                    self.progress.emit(f"No heartbeat yet ({deadline - time.time():.1f}s left)")
+                    next_report += 1.0
+                time.sleep(base.PROBE_POLL_INTERVAL)
+
+        # 応答しなかった接続を閉じる
+        for probe in probes:
+            if probe is winner:
+                continue
+            probe[2].stop()
+            try:
+                probe[1].close()
+            except Exception:
+                pass
+
+        if winner is not None:
+            info, self.connection, self.reader = winner
+            self.connected.emit(info)
+        elif self._cancelled:
+            self.failed.emit("Connection cancelled")
+        elif not probes:
+            self.failed.emit("No connection candidates could be opened")
+        else:
+            self.failed.emit("Connection failed - no heartbeat received")
 
-if __name__ == "__main__":
-    heartbeat = WaitHeartbeat()
-    heartbeat.wait_heartbeat()
+    @staticmethod
+    def describe(info):
+        """接続情報を表示用の文字列にする"""
+        return f"{info['ip']}:{info['port']} ({info['mode']})"
@@ -0,0 +1,76 @@
+import logging
+import selectors
+import socket
+import threading
+from pymavlink import mavutil
+from vectordive.config import base
+from vectordive.services.telemetry_log import split_records
+
+logger = logging.getLogger(__name__)
+
+# 配信デーモンのUnixソケットを購読し、届いたフレームをTelemetryCacheへ書き込む受信スレッド
+# MavlinkClientからは受信スレッド兼接続として扱う（.mav で送ったフレームはデーモン経由で機体へ届く）
+# ソケットにはタイムアウトを付けない（送信がタイムアウトするとフレームの途中までしか書けず、以降の上りのフレームが全て壊れる）
+# 受信は selectors で待って、止める時に抜けられるようにする
+
+
+class DaemonReader(threading.Thread):
+    """配信デーモンから受け取った全メッセージをTelemetryCacheへ書き込むスレッド"""
+
+    def __init__(self, socket_path, cache):
+        super().__init__(daemon=True)
+        self.socket_path = socket_path
+        self.cache = cache
+        self.stopped = threading.Event()
+        self.error = None
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.write_lock = threading.Lock()
+        self.parser = mavutil.mavlink.MAVLink(None)
+        self.parser.robust_parsing = True
+        # mavutilの接続と同じく .mav で送信できるようにする
+        self.mav = mavutil.mavlink.MAVLink(self, srcSystem=255)
+
+    def run(self):
+        buffer = b''
+        while not self.stopped.is_set():
+            try:
+                if not self.selector.select(base.READER_SELECT_TIMEOUT):
+                    continue
+                data = self.sock.recv(65536)
+            except OSError as e:
+                if not self.stopped.is_set():
+                    self.error = e
+                    logger.error("配信デーモンからの受信エラー: %s", e)
+                break
+            if not data:
+                self.error = ConnectionError("配信デーモンが切断しました")
+                logger.error("%s", self.error)
+                break
+            records, buffer = split_records(buffer + data)
+            for timestamp, frame in records:
+                try:
+                    msg = self.parser.decode(bytearray(frame))
+                except mavutil.mavlink.MAVError:
+                    continue
+                msg._timestamp = timestamp
+                self.cache.update(msg)
+
+    def write(self, buf):
+        """フレームをデーモン経由で機体へ送る（デーモンが読むまで待ち、フレームを途中で切らない）"""
+        with self.write_lock:
+            self.sock.sendall(buf)
+
+    def stop(self, timeout=1.0):
+        """スレッドを停止する"""
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def close(self):
+        """受信を止めてソケットを閉じる"""
+        self.stop()
+        self.selector.close()
+        self.sock.close()
@@ -0,0 +1,102 @@
+from vectordive.config import base
+import numpy as np
+import time
+
+# 圧力・高度のMAVLinkメッセージから深度を計算する
+# 受信スレッドがキャッシュへ溜めたサンプルを取り出し、(時刻, 深度) の配列にまとめて返す
+
+
+def pressure_to_depth(press_abs, surface_pressure=None, fluid_density=None):
+    """絶対圧 [hPa] を深度 [m] に変換する（配列もそのまま変換できる）"""
+    surface_pressure = surface_pressure if surface_pressure is not None else base.SURFACE_PRESSURE
+    fluid_density = fluid_density if fluid_density is not None else base.FLUID_DENSITY
+    # hPa -> Pa、p = ρgh
+    return (np.asarray(press_abs, dtype=np.float64) - surface_pressure) * 100.0 / (fluid_density * base.GRAVITY)
+
+
+def get_sample_time(msg):
+    """メッセージの時刻 [s] を取得する（機体の起動時刻があればそれを使う）"""
+    time_boot_ms = getattr(msg, 'time_boot_ms', None)
+    if time_boot_ms is not None:
+        return time_boot_ms * 1e-3
+    return getattr(msg, '_timestamp', None) or time.time()
+
+
+def get_depth_value(msg, surface_pressure=None, fluid_density=None):
+    """メッセージ1つから深度 [m]（下向き正）を取得する"""
+    msg_type = msg.get_type()
+    if msg_type in ('SCALED_PRESSURE', 'SCALED_PRESSURE2', 'SCALED_PRESSURE3'):
+        return float(pressure_to_depth(msg.press_abs, surface_pressure, fluid_density))
+    if msg_type == 'VFR_HUD':
+        # ArduSubは深度を負の高度として送る
+        return -msg.alt
+    if msg_type == 'GLOBAL_POSITION_INT':
+        return -msg.relative_alt * 1e-3  # mm -> m
+    raise ValueError(f"深度を計算できないメッセージタイプ: {msg_type}")
+
+
+class GetDepthData:
+    """共有接続のキャッシュから深度サンプルを取り出す"""
+
+    def __init__(self, client, message_types=None, surface_pressure=None, fluid_density=None):
+        self.client = client
+        self.message_types = message_types if message_types is not None else base.DEPTH_MESSAGE_TYPES
+        self.surface_pressure = surface_pressure if surface_pressure is not None else base.SURFACE_PRESSURE
+        self.fluid_density = fluid_density if fluid_density is not None else base.FLUID_DENSITY
+
+        # 使用中のメッセージタイプと、その時刻をグラフの経過時間へ変換するオフセット
+        self.source = None
+        self.time_offset = None
+        self.last_time = 0.0
+
+        for msg_type in self.message_types:
+            self.client.cache.enable_stream(msg_type, base.DEPTH_STREAM_MAXLEN)
+
+    def select_source(self):
+        """受信しているメッセージのうち、優先順位の最も高いタイプを選ぶ"""
+        for msg_type in self.message_types:
+            if self.client.latest(msg_type) is not None:
+                return msg_type
+        return None
+
+    def get_depth_samples(self):
+        """前回呼び出し以降に受信した深度を (時刻 (N,), 深度 (N,)) で取得する
+
+        時刻は最初のサンプルからの経過秒数（使うメッセージが変わっても連続させる）
+        """
+        source = self.select_source()
+        samples = {msg_type: self.client.cache.drain(msg_type) for msg_type in self.message_types}
+        msgs = samples.get(source) or []
+        if not msgs:
+            return np.empty(0), np.empty(0)
+
+        times = np.fromiter((get_sample_time(msg) for msg in msgs), dtype=np.float64, count=len(msgs))
+        if source.startswith('SCALED_PRESSURE'):
+            press_abs = np.fromiter((msg.press_abs for msg in msgs), dtype=np.float64, count=len(msgs))
+            depths = pressure_to_depth(press_abs, self.surface_pressure, self.fluid_density)
+        else:
+            depths = np.fromiter((get_depth_value(msg) for msg in msgs), dtype=np.float64, count=len(msgs))
+
+        # 使うメッセージが変わった場合や時刻が巻き戻った場合（機体の再起動）は時刻をつなぎ直す
+        if source != self.source or self.time_offset is None or times[0] + self.time_offset < self.last_time:
+            self.source = source
+            self.time_offset = self.last_time - times[0]
+        times += self.time_offset
+        self.last_time = times[-1]
+        return times, depths
+
+    def calibrate_surface(self):
+        """現在の気圧を水面の気圧として設定する（水面に浮かべた状態で呼ぶ）"""
+        for msg_type in self.message_types:
+            msg = self.client.latest(msg_type)
+            if msg is not None and msg_type.startswith('SCALED_PRESSURE'):
+                self.surface_pressure = msg.press_abs
+                return True
+        return False
+
+    def get_current_depth(self):
+        """最新の深度 [m] を取得する（なければNone）"""
+        source = self.select_source()
+        if source is None:
+            return None
+        return get_depth_value(self.client.latest(source), self.surface_pressure, self.fluid_density)
@@ -0,0 +1,305 @@
+import logging
+import os
+import stat
+import struct
+import threading
+import time
+import numpy as np
+from vectordive.config import base
+from vectordive.workers.thruster_command import percent_to_pwm
+
+try:
+    import evdev
+except ImportError:  # evdevはLinuxでゲームパッドを使う時だけ必要
+    evdev = None
+
+logger = logging.getLogger(__name__)
+
+# ゲームパッド（ジョイスティック）での操縦
+# 専用のスレッドが GAMEPAD_POLL_RATE でデバイスのイベントを読み、スティックの値にデッドゾーンとエクスポを掛けてから
+# GAMEPAD_MIX_MATRIX（6×軸数）で6つのスラスターの出力に混ぜ、ThrusterCommandSender の最新値を更新する
+# GUIスレッドは関わらない（デバイスを開くのもこのスレッド）。緊急停止中は ThrusterCommandSender が指令を受け付けない
+#
+# デバイスは Linux の evdev（/dev/input/event*）か、同じ形式の input_event を並べた通常ファイル（記録の再生・テスト用）
+
+# linux/input-event-codes.h の値（evdevが無くても記録ファイルを読めるようにここに持つ）
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+EVENT_CODES = {
+    'ABS_X': 0x00, 'ABS_Y': 0x01, 'ABS_Z': 0x02, 'ABS_RX': 0x03, 'ABS_RY': 0x04, 'ABS_RZ': 0x05,
+    'ABS_HAT0X': 0x10, 'ABS_HAT0Y': 0x11,
+    'BTN_SOUTH': 0x130, 'BTN_EAST': 0x131, 'BTN_NORTH': 0x133, 'BTN_WEST': 0x134,
+    'BTN_TL': 0x136, 'BTN_TR': 0x137, 'BTN_SELECT': 0x13a, 'BTN_START': 0x13b, 'BTN_MODE': 0x13c,
+}
+
+# struct input_event（64bit Linux: timeval, type, code, value）
+INPUT_EVENT = struct.Struct('llHHi')
+DEFAULT_AXIS_RANGE = (-32768, 32767)
+
+
+def event_code(name):
+    """イベント名（'ABS_X' など）をコードにする（数値はそのまま）"""
+    if isinstance(name, int):
+        return name
+    if name in EVENT_CODES:
+        return EVENT_CODES[name]
+    if evdev is not None and name in evdev.ecodes.ecodes:
+        return evdev.ecodes.ecodes[name]
+    raise ValueError(f"unknown event code: {name}")
+
+
+def apply_deadzone_expo(values, deadzone=None, expo=None):
+    """[-1, 1] の軸の値にデッドゾーンとエクスポを掛ける（配列でまとめて計算する）
+
+    デッドゾーンの外側は [0, 1] に引き伸ばして、端で最大値になるようにする。
+    エクスポは (1 - expo) * x + expo * x³ で、中央付近を細かく動かせるようにする。
+    """
+    deadzone = base.GAMEPAD_DEADZONE if deadzone is None else deadzone
+    expo = base.GAMEPAD_EXPO if expo is None else expo
+    values = np.clip(np.asarray(values, dtype=np.float64), -1.0, 1.0)
+    magnitude = np.maximum(np.abs(values) - deadzone, 0.0) / (1.0 - deadzone)
+    magnitude = (1.0 - expo) * magnitude + expo * magnitude ** 3
+    return np.copysign(magnitude, values)
+
+
+def mix_axes(axes, matrix):
+    """軸の値（N）を混合行列（6×N）でスラスター出力 [-1, 1] にする
+
+    どれかが1を超える時は全体を同じ比で縮めて、推力の向きを保つ。
+    """
+    output = matrix @ axes
+    peak = np.max(np.abs(output)) if output.size else 0.0
+    if peak > 1.0:
+        output = output / peak
+    return output
+
+
+def write_event_file(path, events):
+    """(時刻[s], type, code, value) の列を input_event の形式でファイルに書く（FileInputDevice で再生できる）"""
+    with open(path, 'wb') as f:
+        for timestamp, event_type, code, value in events:
+            seconds = int(timestamp)
+            f.write(INPUT_EVENT.pack(seconds, int(round((timestamp - seconds) * 1e6)), event_type, code, value))
+
+
+class EvdevInputDevice:
+    """evdevのデバイス（ノンブロッキングで読む）"""
+
+    def __init__(self, path):
+        if evdev is None:
+            raise RuntimeError("evdev is not installed (pip install evdev)")
+        self.device = evdev.InputDevice(path)
+        self.name = self.device.name
+
+    def axis_info(self, code):
+        """軸の (現在値, 最小, 最大)"""
+        try:
+            info = self.device.absinfo(code)
+        except (OSError, KeyError):
+            return 0, *DEFAULT_AXIS_RANGE
+        return info.value, info.min, info.max
+
+    def read_events(self):
+        """届いているイベントを (type, code, value) のリストで返す（無ければ空、待たない）"""
+        try:
+            return [(event.type, event.code, event.value) for event in self.device.read()]
+        except BlockingIOError:
+            return []
+
+    def close(self):
+        self.device.close()
+
+
+class FileInputDevice:
+    """input_event を並べたファイルを、記録された時刻の間隔で再生する偽のデバイス（テスト・記録の再生用）"""
+
+    def __init__(self, path, axis_range=DEFAULT_AXIS_RANGE, loop=False, realtime=True):
+        self.name = os.path.basename(path)
+        self.axis_range = axis_range
+        self.loop = loop
+        self.realtime = realtime  # Falseなら読むたびに全てのイベントを返す
+        with open(path, 'rb') as f:
+            data = f.read()
+        count = len(data) // INPUT_EVENT.size
+        records = [INPUT_EVENT.unpack_from(data, i * INPUT_EVENT.size) for i in range(count)]
+        start = records[0][0] + records[0][1] / 1e6 if records else 0.0
+        self.events = [(seconds + microseconds / 1e6 - start, event_type, code, value)
+                       for seconds, microseconds, event_type, code, value in records]
+        self.position = 0
+        self.start_time = time.perf_counter()
+
+    def axis_info(self, code):
+        """軸の (現在値, 最小, 最大)（現在値は範囲の中央）"""
+        minimum, maximum = self.axis_range
+        return (minimum + maximum) // 2, minimum, maximum
+
+    def read_events(self):
+        """再生時刻までのイベントを返す"""
+        elapsed = time.perf_counter() - self.start_time
+        events = []
+        while self.position < len(self.events):
+            timestamp, event_type, code, value = self.events[self.position]
+            if self.realtime and timestamp > elapsed:
+                break
+            events.append((event_type, code, value))
+            self.position += 1
+        if self.loop and self.position >= len(self.events) and self.events:
+            self.position = 0
+            self.start_time = time.perf_counter()
+        return events
+
+    def finished(self):
+        return not self.loop and self.position >= len(self.events)
+
+    def close(self):
+        pass
+
+
+def find_gamepad():
+    """スティックの軸を持つ最初のevdevデバイスのパス（見つからなければNone）"""
+    if evdev is None:
+        return None
+    for path in evdev.list_devices():
+        try:
+            device = evdev.InputDevice(path)
+        except OSError:
+            continue
+        try:
+            axes = device.capabilities().get(EV_ABS, [])
+            codes = {code for code, _ in axes} if axes and isinstance(axes[0], tuple) else set(axes)
+            if EVENT_CODES['ABS_X'] in codes and EVENT_CODES['ABS_Y'] in codes:
+                return path
+        finally:
+            device.close()
+    return None
+
+
+def open_input_device(path=None):
+    """デバイスを開く（通常ファイルなら記録の再生、空ならevdevで探す）"""
+    path = path or base.GAMEPAD_DEVICE or find_gamepad()
+    if not path:
+        raise RuntimeError("no gamepad found")
+    if stat.S_ISREG(os.stat(path).st_mode):
+        return FileInputDevice(path)
+    return EvdevInputDevice(path)
+
+
+class GamepadReader(threading.Thread):
+    """ゲームパッドを一定周期で読み、混合したスラスター指令を ThrusterCommandSender へ渡すスレッド"""
+
+    def __init__(self, sender, device=None, rate=None, axes=None, invert=None, matrix=None,
+                 deadzone=None, expo=None, emergency_button=None):
+        super().__init__(daemon=True)
+        self.sender = sender
+        self.device = device  # Noneならスレッドの中で GAMEPAD_DEVICE を開く
+        self.interval = 1.0 / (rate if rate is not None else base.GAMEPAD_POLL_RATE)
+        axes = axes if axes is not None else base.GAMEPAD_AXES
+        self.axis_codes = [event_code(name) for name in axes]
+        self.axis_index = {code: i for i, code in enumerate(self.axis_codes)}
+        invert = invert if invert is not None else base.GAMEPAD_AXIS_INVERT
+        self.axis_sign = np.where(np.asarray(invert, dtype=bool), -1.0, 1.0)
+        self.matrix = np.asarray(matrix if matrix is not None else base.GAMEPAD_MIX_MATRIX, dtype=np.float64)
+        if self.matrix.shape[1] != len(self.axis_codes):
+            raise ValueError(f"mix matrix has {self.matrix.shape[1]} columns for {len(self.axis_codes)} axes")
+        self.deadzone = deadzone if deadzone is not None else base.GAMEPAD_DEADZONE
+        self.expo = expo if expo is not None else base.GAMEPAD_EXPO
+        emergency_button = emergency_button if emergency_button is not None else base.GAMEPAD_EMERGENCY_BUTTON
+        self.emergency_code = event_code(emergency_button) if emergency_button else None
+
+        count = len(self.axis_codes)
+        self.raw = np.zeros(count)  # デバイスの生の値
+        self.offset = np.zeros(count)  # 範囲の中央
+        self.scale = np.ones(count)  # 範囲の半分
+        # 最初に送った値と比べる（スティックが中央のままなら操縦者のRC入力を奪わない）
+        self.last_pwm = np.full(self.matrix.shape[0], base.THRUSTER_DEFAULT, dtype=np.int64)
+        self.stopped = threading.Event()
+        self.connected = threading.Event()
+        self.poll_count = 0
+        self.overrun_count = 0
+        self.update_count = 0
+
+    def setup_axes(self):
+        """軸ごとの範囲と現在値を読み、[-1, 1] への変換を用意する"""
+        for i, code in enumerate(self.axis_codes):
+            value, minimum, maximum = self.device.axis_info(code)
+            self.offset[i] = (minimum + maximum) / 2.0
+            self.scale[i] = max((maximum - minimum) / 2.0, 1.0)
+            self.raw[i] = value
+
+    def run(self):
+        while not self.stopped.is_set():
+            if self.device is None:
+                try:
+                    self.device = open_input_device()
+                except Exception as e:
+                    logger.error("ゲームパッドを開けません: %s", e)
+                    self.stopped.wait(base.GAMEPAD_RETRY_INTERVAL)
+                    continue
+            logger.info("ゲームパッドに接続しました: %s", self.device.name)
+            try:
+                self.setup_axes()
+                self.connected.set()
+                self.poll_loop()
+            except OSError as e:
+                # 抜けた時は中立に戻して、つなぎ直すまで待つ
+                logger.error("ゲームパッドの読み込みエラー: %s", e)
+                self.send_neutral()
+            finally:
+                self.connected.clear()
+                self.device.close()
+                self.device = None
+            if not self.stopped.is_set():
+                self.stopped.wait(base.GAMEPAD_RETRY_INTERVAL)
+
+    def poll_loop(self):
+        """interval ごとにイベントを読んで指令を更新する（遅れた時は次の周期から数え直す）"""
+        next_time = time.perf_counter()
+        while not self.stopped.is_set():
+            self.poll()
+            if getattr(self.device, 'finished', None) is not None and self.device.finished():
+                # 記録の再生が終わったら中立に戻して止める
+                logger.info("ゲームパッドの記録の再生が終わりました: %s", self.device.name)
+                self.send_neutral()
+                self.stopped.set()
+                break
+            next_time += self.interval
+            remaining = next_time - time.perf_counter()
+            if remaining > 0:
+                self.stopped.wait(remaining)
+            else:
+                self.overrun_count += 1
+                next_time = time.perf_counter()
+
+    def poll(self):
+        """届いたイベントを反映し、スラスター指令が変わっていれば送信スレッドに渡す"""
+        self.poll_count += 1
+        for event_type, code, value in self.device.read_events():
+            if event_type == EV_ABS:
+                index = self.axis_index.get(code)
+                if index is not None:
+                    self.raw[index] = value
+            elif event_type == EV_KEY and code == self.emergency_code and value == 1:
+                self.sender.emergency_stop()
+        pwm = self.compute_pwm()
+        if not np.array_equal(pwm, self.last_pwm):
+            self.last_pwm = pwm
+            self.update_count += 1
+            self.sender.set_all_pwm(pwm)
+
+    def compute_pwm(self):
+        """現在の軸の値からスラスターのPWM値を計算する"""
+        axes = (self.raw - self.offset) / self.scale * self.axis_sign
+        axes = apply_deadzone_expo(axes, self.deadzone, self.expo)
+        return percent_to_pwm(mix_axes(axes, self.matrix) * 100.0)
+
+    def send_neutral(self):
+        neutral = np.full_like(self.last_pwm, base.THRUSTER_DEFAULT)
+        if not np.array_equal(neutral, self.last_pwm):
+            self.last_pwm = neutral
+            self.sender.set_all_pwm(neutral)
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,96 @@
+import numpy as np
+
+# 加速度 -> 速度 -> 位置 の台形二重積分（NumPyでまとめて計算する）
+
+
+def integrate_acc_batch(acc, timestamps, last_acc, last_time, velocity, position, max_gap=np.inf):
+    """N個の加速度サンプルを一度に台形積分する
+
+    acc: (N, 3) 加速度 [m/s²]、timestamps: (N,) 時刻 [s]
+    last_acc, last_time: 直前のサンプル（積分の起点）
+    velocity, position: 直前の速度・位置 (3,)
+    戻り値: 積分したサンプルの (時刻 (M,), 速度 (M, 3), 位置 (M, 3))
+            と、次回の起点になる (last_acc, last_time)
+
+    同じ時刻のサンプルは捨て、時刻が巻き戻った区間と max_gap より長い区間は積分しない
+    （スカラー版 integrate_acc_scalar と同じ規則）
+    """
+    acc = np.asarray(acc, dtype=np.float64).reshape(-1, 3)
+    timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+
+    # 直前と同じ時刻のサンプルを捨てる
+    previous_times = np.empty_like(timestamps)
+    previous_times[0:1] = last_time
+    previous_times[1:] = timestamps[:-1]
+    keep = timestamps != previous_times
+    if not keep.all():
+        acc = acc[keep]
+        timestamps = timestamps[keep]
+    if len(timestamps) == 0:
+        empty = np.empty((0, 3))
+        return timestamps, empty, empty, np.asarray(last_acc, dtype=np.float64), last_time
+
+    # 起点を先頭に付けて区間ごとの時間差を計算する
+    all_times = np.concatenate(([last_time], timestamps))
+    all_acc = np.concatenate((np.reshape(last_acc, (1, 3)), acc))
+    delta_time = np.diff(all_times)
+    valid = (delta_time > 0) & (delta_time <= max_gap)
+    delta_time = np.where(valid, delta_time, 0.0)
+
+    # 速度: v_i = v0 + Σ (a_{i-1} + a_i) / 2 * dt_i
+    avg_acc = (all_acc[1:] + all_acc[:-1]) / 2.0
+    velocities = velocity + np.cumsum(avg_acc * delta_time[:, None], axis=0)
+
+    # 位置: p_i = p0 + Σ (v_{i-1} + v_i) / 2 * dt_i
+    previous_velocities = np.empty_like(velocities)
+    previous_velocities[0] = velocity
+    previous_velocities[1:] = velocities[:-1]
+    avg_velocity = (velocities + previous_velocities) / 2.0
+    positions = position + np.cumsum(avg_velocity * delta_time[:, None], axis=0)
+
+    return timestamps[valid], velocities[valid], positions[valid], acc[-1], timestamps[-1]
+
+
+def integrate_acc_scalar(acc, timestamps, last_acc, last_time, velocity, position, max_gap=np.inf):
+    """integrate_acc_batch と同じ計算を1サンプルずつ行う（比較・検証用）"""
+    last_acc = np.asarray(last_acc, dtype=np.float64)
+    velocity = np.array(velocity, dtype=np.float64)
+    position = np.array(position, dtype=np.float64)
+    out_times, out_velocities, out_positions = [], [], []
+    for current_acc, current_time in zip(np.asarray(acc, dtype=np.float64), timestamps):
+        delta_time = current_time - last_time
+        if delta_time == 0:
+            continue
+        if 0 < delta_time <= max_gap:
+            avg_acc = (current_acc + last_acc) / 2.0
+            new_velocity = velocity + avg_acc * delta_time
+            position = position + (new_velocity + velocity) / 2.0 * delta_time
+            velocity = new_velocity
+            out_times.append(current_time)
+            out_velocities.append(velocity)
+            out_positions.append(position)
+        last_acc = current_acc
+        last_time = current_time
+    return (np.array(out_times), np.array(out_velocities).reshape(-1, 3),
+            np.array(out_positions).reshape(-1, 3), last_acc, last_time)
+
+
+if __name__ == "__main__":
+    # マイクロベンチマーク: 400HzのIMUサンプルをまとめて積分した時の1回あたりの時間
+    import timeit
+
+    rng = np.random.default_rng(0)
+    for n in (1, 10, 40, 400, 4000):
+        acc = rng.normal(size=(n, 3))
+        timestamps = np.arange(1, n + 1) * 0.0025
+        args = (acc, timestamps, np.zeros(3), 0.0, np.zeros(3), np.zeros(3), 1.0)
+
+        batch = integrate_acc_batch(*args)
+        scalar = integrate_acc_scalar(*args)
+        assert all(np.allclose(b, s) for b, s in zip(batch, scalar))
+
+        repeat = max(1, 20000 // n)
+        batch_time = timeit.timeit(lambda: integrate_acc_batch(*args), number=repeat) / repeat
+        scalar_time = timeit.timeit(lambda: integrate_acc_scalar(*args), number=repeat) / repeat
+        print(f"N={n:5d}  batch: {batch_time * 1e6:9.1f} us  scalar: {scalar_time * 1e6:9.1f} us  "
+              f"({scalar_time / batch_time:5.1f}x)")
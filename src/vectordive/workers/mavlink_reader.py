@@ -0,0 +1,42 @@
+import logging
+import threading
+from vectordive.config import base
+
+logger = logging.getLogger(__name__)
+
+# MAVLinkソケットを専有して全パケットを一度だけデコードする受信スレッド
+
+
+class MavlinkReader(threading.Thread):
+    """受信した全メッセージをTelemetryCacheへ書き込むスレッド"""
+
+    def __init__(self, connection, cache):
+        super().__init__(daemon=True)
+        self.connection = connection
+        self.cache = cache
+        self.stopped = threading.Event()
+        self.error = None
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                msg = self.connection.recv_msg()
+                if msg is None:
+                    # 次のパケットが届くまでソケットで待つ
+                    self.connection.select(base.READER_SELECT_TIMEOUT)
+                    continue
+                if msg.get_type() == 'BAD_DATA':
+                    continue
+                self.cache.update(msg)
+            except Exception as e:
+                if self.stopped.is_set():
+                    break
+                self.error = e
+                logger.error("MAVLink受信エラー: %s", e)
+                self.stopped.wait(base.READER_SELECT_TIMEOUT)
+
+    def stop(self, timeout=1.0):
+        """スレッドを停止する"""
+        self.stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from pymavlink import mavutil
+from vectordive.services.telemetry_index import TelemetryIndex
+from vectordive.services.telemetry_log import TelemetryLog, get_msgid
+
+logger = logging.getLogger(__name__)
+
+# 記録したtlogを実機の受信スレッドと同じようにTelemetryCacheへ流し込む再生スレッド
+# MavlinkClientからは受信スレッド兼接続として扱う（送信は捨てる）
+
+
+class ReplaySource(threading.Thread):
+    """tlogのメッセージを記録時の間隔（の speed 倍）でTelemetryCacheへ書き込むスレッド
+
+    speed=0 の場合は待たずに最大速度で流す
+    """
+
+    def __init__(self, path, cache, speed=1.0, start_offset=0, msg_types=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.cache = cache
+        self.speed = speed
+        self.start_offset = start_offset
+        self.log = TelemetryLog(path)
+        self.index = None  # 時刻への移動が必要になった時に読み込む
+        # 指定した場合はそのタイプだけデコードして流す（SERVO_OUTPUT_RAWとRAW_IMUだけ、など）
+        self.msgids = None if msg_types is None else {get_msgid(msg_type) for msg_type in msg_types}
+        self.seek_offset = None
+        self.stopped = threading.Event()
+        self.interrupted = threading.Event()  # 停止・移動の要求で待機を中断する
+        self.finished = threading.Event()
+        self.message_count = 0
+        self.error = None
+        # mavutilの接続と同じく .mav で送信できるようにする（再生中は捨てる）
+        self.mav = mavutil.mavlink.MAVLink(self, srcSystem=255)
+
+    def seek(self, seconds):
+        """ログ開始からの経過秒数の位置へ移動する（再生中でも呼べる）"""
+        if self.index is None:
+            self.index = TelemetryIndex.open(self.log)
+        self.seek_offset = self.index.find_offset_elapsed(seconds)
+        if not self.is_alive():
+            self.start_offset = self.seek_offset
+            self.seek_offset = None
+        self.interrupted.set()
+
+    def run(self):
+        try:
+            offset = self.start_offset
+            while not self.stopped.is_set():
+                offset = self.replay_from(offset)
+                if offset is None:
+                    break
+        except Exception as e:
+            self.error = e
+            logger.error("テレメトリ再生エラー: %s", e)
+        self.finished.set()
+
+    def replay_from(self, offset):
+        """offset から再生する（移動を要求された場合は移動先の位置を返す）"""
+        log_start = None
+        wall_start = None
+        self.interrupted.clear()
+        for timestamp, msg in self.iter_messages(offset):
+            if self.speed > 0:
+                if log_start is None:
+                    log_start = timestamp
+                    wall_start = time.perf_counter()
+                # 記録時の時刻に追いつくまで待つ（1ms未満の遅れは待たずにまとめて流す）
+                delay = (timestamp - log_start) / self.speed - (time.perf_counter() - wall_start)
+                if delay > 0.001:
+                    self.interrupted.wait(delay)
+            if self.stopped.is_set():
+                return None
+            if self.seek_offset is not None:
+                offset, self.seek_offset = self.seek_offset, None
+                return offset
+            if msg.get_type() == 'BAD_DATA':
+                continue
+            self.cache.update(msg)
+            self.message_count += 1
+        return None
+
+    def iter_messages(self, offset):
+        """offset 以降のメッセージ（タイプを絞る場合は索引で該当レコードだけ）を順に返す"""
+        if self.msgids is None:
+            return self.log.iter_messages(offset)
+        if self.index is None:
+            self.index = TelemetryIndex.open(self.log)
+        return self.log.iter_offsets(self.index.get_types_from(self.msgids, offset))
+
+    def write(self, buf):
+        """送信データは捨てる"""
+
+    def stop(self, timeout=1.0):
+        """スレッドを停止する"""
+        self.stopped.set()
+        self.interrupted.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def close(self):
+        """再生を止めてファイルを閉じる"""
+        self.stop()
+        if not self.is_alive() and self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+if __name__ == "__main__":
+    # 再生のスループット計測: python -m vectordive.workers.replay dive.tlog [speed] [開始秒] [タイプ,...]
+    import sys
+    from vectordive.services.telemetry_cache import TelemetryCache
+
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    msg_types = sys.argv[4].split(",") if len(sys.argv) > 4 else None
+    source = ReplaySource(sys.argv[1], TelemetryCache(), speed, msg_types=msg_types)
+    if len(sys.argv) > 3:
+        source.seek(float(sys.argv[3]))
+    start = time.perf_counter()
+    source.start()
+    source.finished.wait()
+    elapsed = time.perf_counter() - start
+    print(f"{source.message_count} messages in {elapsed:.3f} s "
+          f"({source.message_count / elapsed:,.0f} msg/s, speed={speed or 'max'})")
+    source.close()
@@ -1,25 +1,30 @@
 from vectordive.connections.telemetry import GetTelemetry
+from vectordive.config import base
+from vectordive.workers.integration import integrate_acc_batch
+from vectordive.utils.ring_buffer import RingBuffer
+import logging
 import numpy as np
 import time
 
+logger = logging.getLogger(__name__)
+
 # 速度を加速度積分で計算する
 # 位置を速度積分で計算する
 
 class GetVelocityData:
-    def __init__(self, connection_info, velocity_data=None, position_data=None):
-        self.telemetry = GetTelemetry(connection_info)
+    def __init__(self, connection_info, velocity_data=None, position_data=None, client=None):
+        self.telemetry = GetTelemetry(connection_info, client)
         self.velocity_data = velocity_data if velocity_data is not None else np.zeros(3)  # [x, y, z]
         self.position_data = position_data if position_data is not None else np.zeros(3)  # [x, y, z]
         
-        # データ蓄積用のキュー
-        self.velocity_data_queue = []
-        self.position_data_queue = []
-        self.velocity_data_queue_time = []
-        self.position_data_queue_time = []
+        # データ蓄積用のリングバッファ（列: 時刻, x, y, z）
+        self.velocity_history = RingBuffer(base.POSITION_HISTORY_CAPACITY, 4)
+        self.position_history = RingBuffer(base.POSITION_HISTORY_CAPACITY, 4)
         
         # 前回のデータ
         self.last_acc_data = None
         self.last_time = None
+        self.time_source = None  # 'imu'（RAW_IMUのtime_usec）または 'mock'（壁時計）
         
         # 積分用の累積値
         self.velocity_integral = np.zeros(3)  # 速度の積分値
@@ -28,66 +33,56 @@ class GetVelocityData:
     def update_position_from_acc(self):
         """IMUの加速度データを使って二重積分で位置を推定"""
         try:
-            # 現在の加速度データと時間を取得
-            acc_data_tuple = self.telemetry.get_imu_output_acc_data()
-            current_time = time.time()
-            
-            # タプルをnumpy配列に変換
-            if acc_data_tuple is not None:
-                current_acc_data = np.array(acc_data_tuple)
-            else:
-                current_acc_data = self.generate_mock_acc_data(current_time)
-            
-            # 初回実行時は初期化
-            if self.last_acc_data is None:
-                self.last_acc_data = current_acc_data
-                self.last_time = current_time
-                return self.position_data_queue, self.position_data_queue_time
-            
-            # 時間差分を計算
-            delta_time = current_time - self.last_time
-            
-            if delta_time <= 0:
-                return self.position_data_queue, self.position_data_queue_time
-            
-            # 加速度の平均値を計算（台形積分）
-            avg_acc = (current_acc_data + self.last_acc_data) / 2.0
-            
-            # 速度を積分で更新（v = v0 + a*dt）
-            self.velocity_integral += avg_acc * delta_time
-            
-            # 位置を積分で更新（p = p0 + v*dt）
-            # 速度の平均値を使用（台形積分）
-            avg_velocity = (self.velocity_integral + self.velocity_data) / 2.0
-            self.position_integral += avg_velocity * delta_time
-            
-            # 現在の値を更新
-            self.velocity_data = self.velocity_integral.copy()
-            self.position_data = self.position_integral.copy()
-            
-            # データをキューに追加
-            self.velocity_data_queue.append(self.velocity_data.copy())
-            self.position_data_queue.append(self.position_data.copy())
-            self.velocity_data_queue_time.append(current_time)
-            self.position_data_queue_time.append(current_time)
+            # 前回以降に受信したRAW_IMUをすべて、機体側のtime_usecでまとめて積分する
+            samples = self.telemetry.get_imu_samples()
+            if samples:
+                samples = np.asarray(samples, dtype=np.float64)
+                self.integrate_batch(samples[:, 1:4], samples[:, 0] * 1e-6, 'imu')
+            elif self.telemetry.imu_output_raw_msg is None:
+                # MAVLinkのIMUデータがない場合のみモックデータを壁時計で積分する
+                current_time = time.time()
+                self.integrate_batch(self.generate_mock_acc_data(current_time)[None, :],
+                                     np.array([current_time]), 'mock')
             
-            # キューサイズを制限（最新100個のデータを保持）
-            max_queue_size = 100
-            if len(self.velocity_data_queue) > max_queue_size:
-                self.velocity_data_queue.pop(0)
-                self.position_data_queue.pop(0)
-                self.velocity_data_queue_time.pop(0)
-                self.position_data_queue_time.pop(0)
-            
-            # 前回のデータを更新
-            self.last_acc_data = current_acc_data.copy()
-            self.last_time = current_time
-            
-            return self.position_data_queue, self.position_data_queue_time
+            return self.get_position_history()
             
         except Exception as e:
-            print(f"Error in update_position_from_acc: {e}")
-            return self.position_data_queue, self.position_data_queue_time
+            logger.error("Error in update_position_from_acc: %s", e)
+            return self.get_position_history()
+
+    def integrate_batch(self, acc_data, timestamps, time_source):
+        """加速度サンプル (N, 3) と時刻 (N,) をまとめて台形積分で速度・位置に反映する"""
+        # 初回実行時や時間の基準が変わった（モック⇔IMU）場合は先頭サンプルを起点にする
+        if self.last_acc_data is None or self.time_source != time_source:
+            self.last_acc_data = acc_data[0].copy()
+            self.last_time = timestamps[0]
+            self.time_source = time_source
+            acc_data = acc_data[1:]
+            timestamps = timestamps[1:]
+            if len(timestamps) == 0:
+                return
+        
+        # time_usecが巻き戻った区間（機体の再起動など）や長く途切れた区間は積分をつなげない
+        times, velocities, positions, self.last_acc_data, self.last_time = integrate_acc_batch(
+            acc_data, timestamps, self.last_acc_data, self.last_time,
+            self.velocity_integral, self.position_integral, base.IMU_MAX_GAP)
+        if len(times) == 0:
+            return
+        
+        # 現在の値を更新
+        self.velocity_integral = velocities[-1].copy()
+        self.position_integral = positions[-1].copy()
+        self.velocity_data = self.velocity_integral.copy()
+        self.position_data = self.position_integral.copy()
+        
+        # 共有メモリで公開している場合は他のプロセスにも知らせる
+        snapshot = self.telemetry.client.snapshot
+        if snapshot is not None:
+            snapshot.publish_position(self.position_data, self.velocity_data)
+        
+        # 履歴に追加（容量を超えた分は古いものから上書きされる）
+        self.velocity_history.extend(np.column_stack((times, velocities)))
+        self.position_history.extend(np.column_stack((times, positions)))
             
     def generate_mock_acc_data(self, current_time):
         """テスト用のモック加速度データを生成（MAVLinkデータが取得できない場合のみ使用）"""
@@ -105,9 +100,15 @@ class GetVelocityData:
         """位置データを取得（リアルタイム更新付き）"""
         return self.update_position_from_acc()
 
+    def get_position_history(self):
+        """位置の履歴 (N, 3) と時刻 (N,) を古い順に取得（コピーなしのビュー）"""
+        history = self.position_history.view()
+        return history[:, 1:4], history[:, 0]
+
     def get_velocity_data(self):
         """速度データを取得"""
-        return self.velocity_data_queue, self.velocity_data_queue_time
+        history = self.velocity_history.view()
+        return history[:, 1:4], history[:, 0]
 
     def reset_integration(self):
         """積分値をリセット"""
@@ -115,12 +116,11 @@ class GetVelocityData:
         self.position_integral = np.zeros(3)
         self.velocity_data = np.zeros(3)
         self.position_data = np.zeros(3)
-        self.velocity_data_queue.clear()
-        self.position_data_queue.clear()
-        self.velocity_data_queue_time.clear()
-        self.position_data_queue_time.clear()
+        self.velocity_history.clear()
+        self.position_history.clear()
         self.last_acc_data = None
         self.last_time = None
+        self.time_source = None
 
     def get_current_position(self):
         """現在の位置を取得"""
@@ -130,6 +130,10 @@ class GetVelocityData:
         """現在の速度を取得"""
         return self.velocity_data
 
+    def close(self):
+        """共有接続の購読を解除"""
+        self.telemetry.close()
+
         
         
         
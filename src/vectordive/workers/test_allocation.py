@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from vectordive.config import base
+from vectordive.workers.allocation import ThrustAllocator, build_geometry
+
+
+def random_wrenches(allocator, count, magnitude, seed=0):
+    """配置で出せる範囲の力・モーメント（各スラスター出力 ±magnitude の組み合わせ）"""
+    outputs = np.random.default_rng(seed).uniform(-magnitude, magnitude, size=(count, allocator.count))
+    return allocator.achieved(outputs)
+
+def test_geometry_columns_are_force_and_moment_at_full_thrust():
+    geometry = build_geometry([[1.0, 0.0, 0.0]], [[0.0, 2.0, 0.0]], max_thrust=10.0)
+
+    np.testing.assert_allclose(geometry[:, 0], [0.0, 10.0, 0.0, 0.0, 0.0, 10.0])
+
+def test_in_range_wrench_is_reproduced():
+    allocator = ThrustAllocator()
+    wrenches = random_wrenches(allocator, 200, 0.4)
+
+    outputs = allocator.allocate(wrenches)
+
+    assert np.abs(outputs).max() <= 1.0
+    np.testing.assert_allclose(allocator.achieved(outputs), wrenches, atol=1e-9)
+    # 範囲内なら組み合わせごとの擬似逆行列は求めない
+    assert list(allocator.subsets) == [allocator.full_mask]
+
+def test_saturated_thruster_is_pinned_and_the_rest_redistributed():
+    allocator = ThrustAllocator()
+    # 上向き60Nとロール3N·m: そのままでは T6 が範囲を超える
+    wrench = np.array([0.0, 0.0, -60.0, 3.0, 0.0, 0.0])
+    assert np.abs(allocator.pinv @ wrench).max() > 1.0
+
+    output = allocator.allocate(wrench)
+
+    assert output[5] == 1.0
+    assert 0.0 < output[4] < 1.0
+    np.testing.assert_allclose(output[:4], 0.0, atol=1e-12)
+    # 範囲で切り捨てただけの場合より、求める力・モーメントに近い
+    clipped = np.clip(allocator.pinv @ wrench, -1.0, 1.0)
+    assert (np.linalg.norm(allocator.achieved(output) - wrench)
+            < np.linalg.norm(allocator.achieved(clipped) - wrench))
+
+def test_saturated_outputs_stay_in_range():
+    allocator = ThrustAllocator()
+    wrenches = random_wrenches(allocator, 200, 2.0, seed=1)
+
+    saturated = (np.abs(wrenches @ allocator.pinv.T) > 1.0).any(axis=1)
+    outputs = allocator.allocate(wrenches)
+
+    assert saturated.sum() > 100
+    assert np.abs(outputs).max() <= 1.0
+    # 超えた行は少なくとも1基が上限に固定される
+    assert (np.abs(outputs[saturated]) == 1.0).any(axis=1).all()
+
+def test_batch_matches_single():
+    allocator = ThrustAllocator()
+    wrenches = random_wrenches(allocator, 100, 1.2, seed=2)
+
+    batch = allocator.allocate(wrenches)
+    single = np.array([allocator.allocate(wrench) for wrench in wrenches])
+
+    np.testing.assert_allclose(batch, single, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(allocator.allocate_pwm(wrenches),
+                                  [allocator.allocate_pwm(wrench) for wrench in wrenches])
+
+def test_allocate_pwm_neutral_and_limits():
+    allocator = ThrustAllocator()
+
+    np.testing.assert_array_equal(allocator.allocate_pwm(np.zeros(6)), [base.THRUSTER_DEFAULT] * 6)
+    pwm = allocator.allocate_pwm([0.0, 0.0, -1000.0, 0.0, 0.0, 0.0])
+    np.testing.assert_array_equal(pwm[4:], [base.THRUSTER_MAXIMUM] * 2)
+
+def test_default_geometry_has_no_pitch_authority():
+    allocator = ThrustAllocator()
+
+    assert np.linalg.matrix_rank(allocator.geometry) == 5
+    np.testing.assert_array_equal(allocator.controllable_axes(), [True, True, True, True, False, True])
+    assert ThrustAllocator(np.eye(6)).controllable_axes().all()
+
+def test_geometry_must_be_6xn():
+    with pytest.raises(ValueError):
+        ThrustAllocator(np.zeros((5, 6)))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
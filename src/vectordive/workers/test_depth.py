@@ -0,0 +1,43 @@
+import pytest
+from pymavlink import mavutil
+from vectordive.config import base
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.workers.depth import GetDepthData
+
+
+class StubClient:
+    def __init__(self):
+        self.cache = TelemetryCache()
+
+    def latest(self, msg_type):
+        return self.cache.get(msg_type)
+
+
+def scaled_pressure2(press_abs, time_boot_ms=0):
+    return mavutil.mavlink.MAVLink_scaled_pressure2_message(time_boot_ms, press_abs, 0, 0)
+
+def test_calibrate_surface_zeroes_the_current_pressure():
+    client = StubClient()
+    depth_data = GetDepthData(client)
+    assert not depth_data.calibrate_surface()
+    assert depth_data.surface_pressure == base.SURFACE_PRESSURE
+
+    client.cache.update(scaled_pressure2(1020.0))
+    assert depth_data.calibrate_surface()
+    assert depth_data.surface_pressure == 1020.0
+    assert depth_data.get_current_depth() == pytest.approx(0.0)
+
+    # 1 m 沈むと ρg [Pa] だけ気圧が上がる
+    client.cache.update(scaled_pressure2(1020.0 + base.FLUID_DENSITY * base.GRAVITY / 100.0, 100))
+    assert depth_data.get_current_depth() == pytest.approx(1.0)
+
+def test_calibrate_surface_ignores_depth_without_pressure():
+    client = StubClient()
+    depth_data = GetDepthData(client)
+    client.cache.update(mavutil.mavlink.MAVLink_vfr_hud_message(0, 0, 0, 0, -2.0, 0))
+
+    assert not depth_data.calibrate_surface()
+    assert depth_data.get_current_depth() == pytest.approx(2.0)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
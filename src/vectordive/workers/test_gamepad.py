@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from vectordive.config import base
+from vectordive.workers.gamepad import (EV_ABS, EV_KEY, EV_SYN, EVENT_CODES, FileInputDevice, GamepadReader,
+                                        apply_deadzone_expo, mix_axes, write_event_file)
+
+
+class StubSender:
+    def __init__(self):
+        self.commands = []
+        self.emergency_count = 0
+
+    def set_all_pwm(self, values):
+        self.commands.append([int(value) for value in values])
+
+    def emergency_stop(self):
+        self.emergency_count += 1
+
+
+def test_deadzone_and_expo():
+    values = apply_deadzone_expo([-1.0, -0.05, 0.0, 0.05, 0.5, 1.0, 2.0], deadzone=0.1, expo=0.0)
+
+    np.testing.assert_allclose(values, [-1.0, 0.0, 0.0, 0.0, 4 / 9, 1.0, 1.0])
+
+def test_expo_keeps_ends_and_softens_center():
+    linear = apply_deadzone_expo([0.3, 1.0], deadzone=0.0, expo=0.0)
+    curved = apply_deadzone_expo([-0.3, 0.3, 1.0], deadzone=0.0, expo=0.5)
+
+    assert curved[1] < linear[0]
+    assert curved[0] == -curved[1]
+    assert curved[2] == pytest.approx(1.0)
+
+def test_mix_axes_scales_down_uniformly():
+    matrix = np.array([[1.0, 1.0], [1.0, -1.0], [0.0, 0.5]])
+
+    np.testing.assert_allclose(mix_axes(np.array([0.25, 0.25]), matrix), [0.5, 0.0, 0.125])
+    # 1を超える出力があれば、比を保ったまま最大が1になるよう縮める
+    np.testing.assert_allclose(mix_axes(np.array([1.0, 0.5]), matrix), [1.0, 1 / 3, 1 / 6])
+
+def test_reader_replays_event_file_into_sender(tmp_path):
+    path = str(tmp_path / "pad.events")
+    axis_y, axis_ry = EVENT_CODES['ABS_Y'], EVENT_CODES['ABS_RY']
+    write_event_file(path, [
+        (0.00, EV_ABS, axis_y, -32768),  # スティックを前に倒しきる（反転して前進）
+        (0.00, EV_SYN, 0, 0),
+        (0.02, EV_ABS, axis_y, 0),
+        (0.02, EV_ABS, axis_ry, -32768),  # 上昇
+        (0.02, EV_SYN, 0, 0),
+        (0.04, EV_KEY, EVENT_CODES['BTN_SELECT'], 1),
+    ])
+    sender = StubSender()
+    reader = GamepadReader(sender, FileInputDevice(path), rate=200)
+    reader.start()
+    reader.join(2.0)
+
+    assert not reader.is_alive()
+    matrix = np.asarray(base.GAMEPAD_MIX_MATRIX)
+    forward = [int(pwm) for pwm in base.THRUSTER_DEFAULT + 400 * matrix[:, 0] / np.abs(matrix[:, 0]).max()]
+    up = [int(pwm) for pwm in base.THRUSTER_DEFAULT + 400 * matrix[:, 2] / np.abs(matrix[:, 2]).max()]
+    assert sender.commands[0] == forward
+    assert up in sender.commands
+    assert sender.emergency_count == 1
+    # 再生が終わったら中立に戻して止まる
+    assert sender.commands[-1] == [base.THRUSTER_DEFAULT] * len(matrix)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
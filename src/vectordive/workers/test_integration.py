@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from vectordive.workers.integration import integrate_acc_batch, integrate_acc_scalar
+
+
+def test_single_sample_matches_scalar_path():
+    args = (np.array([[0.3, -0.2, 0.1]]), np.array([0.11]),
+            np.array([0.1, 0.0, -0.1]), 0.01, np.array([1.0, 2.0, 3.0]), np.array([4.0, 5.0, 6.0]))
+
+    batch = integrate_acc_batch(*args)
+    scalar = integrate_acc_scalar(*args)
+
+    for b, s in zip(batch, scalar):
+        np.testing.assert_array_equal(b, s)
+
+def test_batch_matches_scalar_with_duplicates_rollback_and_gap():
+    rng = np.random.default_rng(1)
+    timestamps = np.array([0.01, 0.01, 0.02, 0.015, 0.025, 2.0, 2.01, 2.02])
+    acc = rng.normal(size=(len(timestamps), 3))
+    args = (acc, timestamps, np.zeros(3), 0.0, np.zeros(3), np.zeros(3), 1.0)
+
+    batch = integrate_acc_batch(*args)
+    scalar = integrate_acc_scalar(*args)
+
+    for b, s in zip(batch, scalar):
+        np.testing.assert_allclose(b, s)
+
+def test_constant_acceleration():
+    timestamps = np.arange(1, 101) * 0.01
+    acc = np.tile([1.0, 0.0, 0.0], (100, 1))
+
+    times, velocities, positions, _, _ = integrate_acc_batch(
+        acc, timestamps, np.array([1.0, 0.0, 0.0]), 0.0, np.zeros(3), np.zeros(3))
+
+    assert velocities[-1][0] == pytest.approx(1.0)
+    assert positions[-1][0] == pytest.approx(0.5)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,207 @@
+import threading
+import time
+import numpy as np
+import pytest
+from pymavlink import mavutil
+from vectordive.config import base
+from vectordive.services.telemetry_cache import TelemetryCache
+from vectordive.workers.thruster_command import (RC_CHANNEL_IGNORE, RC_CHANNEL_RELEASE, ThrusterCommandSender,
+                                                 percent_to_pwm)
+
+NEUTRAL = [base.THRUSTER_DEFAULT] * 6 + [RC_CHANNEL_IGNORE] * 2
+
+
+class StubMav:
+    def __init__(self):
+        self.overrides = []
+        self.commands = []
+
+    def rc_channels_override_send(self, target_system, target_component, *values):
+        self.overrides.append(list(values))
+
+    def command_long_send(self, target_system, target_component, command, *params):
+        self.commands.append(command)
+
+
+class StubConnection:
+    def __init__(self):
+        self.mav = StubMav()
+
+
+class StubClient:
+    def __init__(self):
+        self.connection = StubConnection()
+        self.cache = TelemetryCache()
+        self.paused = None  # 次に送信先を調べたスレッドをここで1回止める（送信の途中の再現用）
+        self.entered = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+    def latest(self, msg_type):
+        if msg_type == 'HEARTBEAT' and self.paused is None:
+            self.paused = threading.current_thread()
+            self.entered.set()
+            self.proceed.wait(1.0)
+        return self.cache.get(msg_type)
+
+
+def servo_output(pwm):
+    return mavutil.mavlink.MAVLink_servo_output_raw_message(0, 0, *([pwm] * 8))
+
+
+def test_percent_to_pwm():
+    assert percent_to_pwm(0) == base.THRUSTER_DEFAULT
+    assert percent_to_pwm(100) == base.THRUSTER_MAXIMUM
+    assert percent_to_pwm(-100) == base.THRUSTER_MINIMUM
+    assert percent_to_pwm(50) == 1700
+    assert percent_to_pwm(-25) == 1400
+    assert percent_to_pwm(250) == base.THRUSTER_MAXIMUM
+    assert percent_to_pwm(-250) == base.THRUSTER_MINIMUM
+    assert isinstance(percent_to_pwm(10), int)
+
+def test_percent_to_pwm_array():
+    np.testing.assert_array_equal(percent_to_pwm([-100, -50, 0, 50, 100]), [1100, 1300, 1500, 1700, 1900])
+
+def test_nothing_is_sent_before_the_first_command():
+    client = StubClient()
+    sender = ThrusterCommandSender(client, rate=50)
+    sender.start()
+    try:
+        time.sleep(0.1)
+        assert client.connection.mav.overrides == []
+    finally:
+        sender.stop()
+    # 一度も指令していなければ解除も送らない
+    assert client.connection.mav.overrides == []
+
+def test_burst_keeps_only_the_latest_value_per_channel():
+    client = StubClient()
+    interval = 0.05
+    sender = ThrusterCommandSender(client, rate=1 / interval)
+    sender.start()
+    try:
+        start = time.perf_counter()
+        for percent in range(101):
+            sender.set_percent(0, percent)
+            sender.set_percent(2, -percent)
+        time.sleep(interval * 2.5)
+        elapsed = time.perf_counter() - start
+        overrides = list(client.connection.mav.overrides)
+        # 202回の更新は送信周期ごとの数回にまとまり、最後に送ったものは最新値になる
+        assert 1 <= len(overrides) <= elapsed / interval + 2
+        latest = overrides[-1]
+        assert latest[0] == base.THRUSTER_MAXIMUM
+        assert latest[2] == base.THRUSTER_MINIMUM
+        assert latest[1] == base.THRUSTER_DEFAULT
+        assert latest[6:] == [RC_CHANNEL_IGNORE, RC_CHANNEL_IGNORE]
+    finally:
+        sender.stop()
+    # 止めるとT1-T6のオーバーライドを解除する
+    assert client.connection.mav.overrides[-1] == [RC_CHANNEL_RELEASE] * 6 + [RC_CHANNEL_IGNORE] * 2
+
+def test_send_rate_is_capped():
+    client = StubClient()
+    sender = ThrusterCommandSender(client, rate=50)
+    sender.start()
+    try:
+        start = time.perf_counter()
+        while time.perf_counter() - start < 0.3:
+            sender.set_percent(1, (time.perf_counter() - start) * 100)
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        assert sender.update_count > len(client.connection.mav.overrides)
+        assert len(client.connection.mav.overrides) <= elapsed * 50 + 2
+    finally:
+        sender.stop()
+
+def test_emergency_stop_writes_neutral_immediately_and_latches():
+    client = StubClient()
+    sender = ThrusterCommandSender(client, rate=1)
+    sender.start()
+    try:
+        sender.set_percent(0, 50)
+        time.sleep(0.05)
+        count = len(client.connection.mav.overrides)
+        # 送信周期（1秒）を待たずに、押したスレッドから中立を書き込む
+        latency = sender.emergency_stop(disarm=False)
+        assert len(client.connection.mav.overrides) == count + 1
+        assert client.connection.mav.overrides[-1] == NEUTRAL
+        assert 0 <= latency < 0.05
+        assert list(sender.emergency_latencies) == [latency]
+        # 解除するまで指令は受け付けない
+        sender.set_percent(0, 80)
+        assert sender.get_pwm() == [base.THRUSTER_DEFAULT] * 6
+        sender.clear_emergency_stop()
+        sender.set_percent(0, 80)
+        assert sender.get_pwm()[0] == percent_to_pwm(80)
+    finally:
+        sender.stop()
+
+def test_emergency_stop_during_a_send_in_flight_ends_neutral():
+    client = StubClient()
+    mav = client.connection.mav
+    sender = ThrusterCommandSender(client, rate=50)
+    sender.start()
+    try:
+        # 送信スレッドが古い指令を取り出して送るまでの間に緊急停止する
+        client.proceed.clear()
+        sender.set_percent(0, 100)
+        assert client.entered.wait(1.0)
+        assert client.paused is sender
+        stopper = threading.Thread(target=sender.emergency_stop, kwargs={'disarm': False})
+        stopper.start()
+        time.sleep(0.05)
+        client.proceed.set()
+        stopper.join(1.0)
+        time.sleep(0.1)
+        overrides = list(mav.overrides)
+        first_neutral = overrides.index(NEUTRAL)
+        assert overrides[first_neutral - 1][0] == base.THRUSTER_MAXIMUM
+        assert all(values == NEUTRAL for values in overrides[first_neutral:])
+    finally:
+        sender.stop()
+
+def test_emergency_stop_retries_until_the_vehicle_confirms(monkeypatch):
+    monkeypatch.setattr(base, 'EMERGENCY_STOP_RETRY_INTERVAL', 0.02)
+    client = StubClient()
+    mav = client.connection.mav
+    sender = ThrusterCommandSender(client, rate=1)
+    sender.start()
+    try:
+        sender.set_percent(0, 50)
+        sender.emergency_stop(disarm=True)
+        worker = sender.emergency_worker
+        time.sleep(0.1)
+        # 応答が無い間は中立とディスアームを再送し続ける
+        assert worker.is_alive()
+        assert mav.overrides.count(NEUTRAL) >= 3
+        assert len(mav.commands) >= 3
+        assert set(mav.commands) == {mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM}
+        # 中立のサーボ出力とディスアームのACKが届いたら止める
+        client.cache.update(servo_output(base.THRUSTER_DEFAULT))
+        client.cache.update(mavutil.mavlink.MAVLink_command_ack_message(
+            mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, mavutil.mavlink.MAV_RESULT_ACCEPTED))
+        worker.join(1.0)
+        assert not worker.is_alive()
+        assert worker.neutral_confirmed and worker.disarm_acked
+    finally:
+        sender.stop()
+
+def test_emergency_stop_gives_up_after_the_retry_count(monkeypatch):
+    monkeypatch.setattr(base, 'EMERGENCY_STOP_RETRY_INTERVAL', 0.01)
+    monkeypatch.setattr(base, 'EMERGENCY_STOP_RETRY_COUNT', 5)
+    client = StubClient()
+    sender = ThrusterCommandSender(client, rate=1)
+    try:
+        sender.set_percent(0, 50)
+        # 中立でないサーボ出力は確認にならない
+        client.cache.update(servo_output(1700))
+        sender.emergency_stop(disarm=False)
+        sender.emergency_worker.join(1.0)
+        assert not sender.emergency_worker.neutral_confirmed
+        assert client.connection.mav.overrides == [NEUTRAL] * 5
+    finally:
+        sender.stop()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
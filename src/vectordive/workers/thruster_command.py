@@ -0,0 +1,280 @@
+from collections import deque
+import logging
+import threading
+import time
+import numpy as np
+from pymavlink import mavutil
+from vectordive.config import base
+
+logger = logging.getLogger(__name__)
+
+# スラスターへの出力指令をRC_CHANNELS_OVERRIDEで機体へ送る送信スレッド
+# 指令はチャンネルごとの最新値だけを持ち、THRUSTER_COMMAND_RATE を上限に送る
+# （スライダーを速く動かしても valueChanged ごとにパケットを積まず、途中の値は最新値で上書きされる）
+# 値が変わった時は次の送信時刻を待たずに送るので、指令の遅れは 1 / THRUSTER_COMMAND_RATE 秒以内に収まる
+# 機体側のRCオーバーライドはしばらく届かないと解除されるため、値が変わらなくても同じ周期で送り続ける
+# ArduSubのRCチャンネルは本来操縦軸なので、機体側でスラスター出力をRCパススルー（SERVOn_FUNCTION = RCINn）に
+# しておくことが前提になる（base.THRUSTER_RC_CHANNELS の説明を参照）
+#
+# 緊急停止は送信周期を待たず、押したスレッドから直ちに中立値を書き込む（送信スレッドの最新値も中立に置き換える）
+# その後は EmergencyStopWorker が、サーボ出力が中立になる（設定時はディスアームのCOMMAND_ACKも届く）まで再送する
+# 送信スレッドは最新値の取り出しから送信までを send_lock の中で行い、緊急停止中は送らない
+# （取り出した古い指令が緊急停止の中立値の後から届いて、中立を上書きしないようにする）
+
+RC_CHANNEL_COUNT = 8  # MAVLink1でも送れるチャンネル数
+RC_CHANNEL_IGNORE = 65535  # このチャンネルはオーバーライドしない
+RC_CHANNEL_RELEASE = 0  # オーバーライドを解除してRC入力に戻す
+
+
+def percent_to_pwm(percent):
+    """出力 [-100, 100]% をPWM値にする（0%が THRUSTER_DEFAULT、配列も受け付ける）"""
+    percent = np.clip(np.asarray(percent, dtype=np.float64), -100.0, 100.0)
+    span = np.where(percent >= 0, base.THRUSTER_MAXIMUM - base.THRUSTER_DEFAULT,
+                    base.THRUSTER_DEFAULT - base.THRUSTER_MINIMUM)
+    pwm = np.rint(base.THRUSTER_DEFAULT + percent / 100.0 * span).astype(np.int64)
+    return int(pwm) if pwm.ndim == 0 else pwm
+
+
+def get_target(client):
+    """送信先の (system, component) をHeartbeatから取得する（未受信なら1, 1）"""
+    heartbeat = client.latest('HEARTBEAT') if client is not None else None
+    if heartbeat is None:
+        return 1, 1
+    return heartbeat.get_srcSystem(), heartbeat.get_srcComponent()
+
+
+class ThrusterCommandSender(threading.Thread):
+    """スラスターの最新の指令値を一定周期でRC_CHANNELS_OVERRIDEとして送るスレッド"""
+
+    def __init__(self, client, rate=None, channels=None):
+        super().__init__(daemon=True)
+        self.client = client
+        self.interval = 1.0 / (rate if rate is not None else base.THRUSTER_COMMAND_RATE)
+        self.channels = list(channels if channels is not None else base.THRUSTER_RC_CHANNELS)
+        self.lock = threading.Lock()
+        self.pwm = [base.THRUSTER_DEFAULT] * len(self.channels)
+        self.active = False  # 最初の指令が来るまでは送らない（操縦者のRC入力を奪わない）
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.last_send_time = 0.0
+        self.update_count = 0
+        self.send_count = 0
+        self.send_lock = threading.RLock()  # 送信スレッドと緊急停止の書き込みが混ざらないようにする
+        self.emergency_latched = False  # 緊急停止後は clear_emergency_stop まで指令を受け付けない
+        self.emergency_worker = None
+        self.emergency_latencies = deque(maxlen=100)  # 押してからソケットへ書き込むまでの時間 [s]
+
+    def set_pwm(self, index, pwm):
+        """1チャンネルの指令値を更新する（どのスレッドからでも呼べる）"""
+        pwm = int(min(max(pwm, base.THRUSTER_MINIMUM), base.THRUSTER_MAXIMUM))
+        with self.lock:
+            if self.emergency_latched:
+                return
+            self.pwm[index] = pwm
+            self.active = True
+            self.update_count += 1
+        self.changed.set()
+
+    def set_all_pwm(self, values):
+        """全チャンネルの指令値をまとめて更新する"""
+        values = np.clip(np.asarray(values), base.THRUSTER_MINIMUM, base.THRUSTER_MAXIMUM).astype(int).tolist()
+        with self.lock:
+            if self.emergency_latched:
+                return
+            self.pwm[:len(values)] = values
+            self.active = True
+            self.update_count += 1
+        self.changed.set()
+
+    def set_percent(self, index, percent):
+        """1チャンネルの指令値を出力 [-100, 100]% で更新する"""
+        self.set_pwm(index, percent_to_pwm(percent))
+
+    def get_pwm(self):
+        """現在の指令値"""
+        with self.lock:
+            return list(self.pwm)
+
+    def run(self):
+        while not self.stopped.is_set():
+            # 値が変わるか次の送信時刻になるまで待つ（指令が来るまでは変わるまで待つ）
+            timeout = max(0.0, self.last_send_time + self.interval - time.perf_counter()) if self.active else None
+            self.changed.wait(timeout)
+            if self.stopped.is_set():
+                break
+            # 前回の送信から interval 経つまでは送らない（その間の変更は最新値にまとまる）
+            remaining = self.last_send_time + self.interval - time.perf_counter()
+            if remaining > 0:
+                self.stopped.wait(remaining)
+                continue
+            self.changed.clear()
+            with self.send_lock:
+                with self.lock:
+                    # 緊急停止中の中立値は emergency_stop と EmergencyStopWorker が送る
+                    if not self.active or self.emergency_latched:
+                        continue
+                    pwm = list(self.pwm)
+                self.send(pwm)
+
+    def send(self, pwm):
+        """RC_CHANNELS_OVERRIDEを1回送る"""
+        values = [RC_CHANNEL_IGNORE] * RC_CHANNEL_COUNT
+        for channel, value in zip(self.channels, pwm):
+            values[channel - 1] = value
+        with self.send_lock:
+            self.last_send_time = time.perf_counter()
+            self.send_override(values)
+
+    def send_override(self, values):
+        connection = self.client.connection if self.client is not None else None
+        if connection is None or getattr(connection, 'mav', None) is None:
+            return False
+        target_system, target_component = get_target(self.client)
+        try:
+            with self.send_lock:
+                connection.mav.rc_channels_override_send(target_system, target_component, *values)
+                self.send_count += 1
+            return True
+        except Exception as e:
+            logger.error("スラスター指令の送信エラー: %s", e)
+            return False
+
+    def emergency_stop(self, pressed_time=None, disarm=None):
+        """全チャンネルを直ちに中立にする（送信待ちの指令より先に送り、応答があるまで再送する）"""
+        pressed_time = pressed_time if pressed_time is not None else time.perf_counter()
+        neutral = [base.THRUSTER_DEFAULT] * len(self.channels)
+        with self.lock:
+            self.pwm = list(neutral)
+            self.active = True
+            self.emergency_latched = True
+        # 送信周期を待たずにこのスレッドから書き込む
+        self.send(neutral)
+        latency = time.perf_counter() - pressed_time
+        self.emergency_latencies.append(latency)
+        logger.warning("緊急停止: 押してから送信まで %.2f ms", latency * 1000, extra={'no_dedup': True})
+        self.changed.set()
+
+        if self.emergency_worker is not None:
+            self.emergency_worker.stop()
+        self.emergency_worker = EmergencyStopWorker(
+            self, disarm if disarm is not None else base.EMERGENCY_STOP_DISARM)
+        self.emergency_worker.start()
+        return latency
+
+    def clear_emergency_stop(self):
+        """緊急停止を解除して指令を受け付ける"""
+        if self.emergency_worker is not None:
+            self.emergency_worker.stop()
+            self.emergency_worker = None
+        with self.lock:
+            self.emergency_latched = False
+
+    def release(self):
+        """オーバーライドを解除して送信を止める（再び指令が来るまで送らない）"""
+        with self.lock:
+            was_active = self.active
+            self.active = False
+            self.pwm = [base.THRUSTER_DEFAULT] * len(self.channels)
+        if not was_active:
+            return
+        values = [RC_CHANNEL_IGNORE] * RC_CHANNEL_COUNT
+        for channel in self.channels:
+            values[channel - 1] = RC_CHANNEL_RELEASE
+        self.send_override(values)
+
+    def stop(self, timeout=1.0):
+        """送信を止めてオーバーライドを解除する"""
+        if self.emergency_worker is not None:
+            self.emergency_worker.stop()
+        self.stopped.set()
+        self.changed.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        self.release()
+
+
+class EmergencyStopWorker(threading.Thread):
+    """緊急停止の中立値（とディスアーム）を、機体の応答を確認できるまで再送するスレッド"""
+
+    def __init__(self, sender, disarm):
+        super().__init__(daemon=True)
+        self.sender = sender
+        self.disarm = disarm
+        self.stopped = threading.Event()
+        self.start_time = time.time()
+        self.ack_since = self.start_time  # これより後に受信したCOMMAND_ACKだけを見る
+        self.disarm_acked = not disarm
+        self.neutral_confirmed = False
+
+    def run(self):
+        client = self.sender.client
+        for attempt in range(base.EMERGENCY_STOP_RETRY_COUNT):
+            if self.stopped.is_set():
+                return
+            if attempt > 0:
+                self.sender.send(self.sender.get_pwm())
+            if not self.disarm_acked:
+                self.send_disarm(attempt)
+            self.wait_response(client, base.EMERGENCY_STOP_RETRY_INTERVAL)
+            if self.disarm_acked and self.neutral_confirmed:
+                logger.warning("緊急停止: 機体の停止を確認しました（再送 %d 回）", attempt, extra={'no_dedup': True})
+                return
+        logger.error("緊急停止: 機体の応答を確認できません（サーボ出力%s、ディスアーム%s）",
+                     "中立" if self.neutral_confirmed else "未確認",
+                     "確認済み" if self.disarm_acked else "未確認", extra={'no_dedup': True})
+
+    def send_disarm(self, attempt):
+        """強制ディスアームを送る（confirmationは再送回数）"""
+        connection = self.sender.client.connection if self.sender.client is not None else None
+        if connection is None or getattr(connection, 'mav', None) is None:
+            return
+        target_system, target_component = get_target(self.sender.client)
+        try:
+            with self.sender.send_lock:
+                connection.mav.command_long_send(
+                    target_system, target_component, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
+                    min(attempt, 255), 0, 21196, 0, 0, 0, 0, 0)
+        except Exception as e:
+            logger.error("ディスアームの送信エラー: %s", e)
+
+    def wait_response(self, client, timeout):
+        """COMMAND_ACK と SERVO_OUTPUT_RAW を確認する（timeout 秒まで、応答が揃えば早く戻る）"""
+        if client is None:
+            self.stopped.wait(timeout)
+            return
+        deadline = time.time() + timeout
+        while not self.stopped.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            if not self.disarm_acked:
+                ack = client.cache.wait_for('COMMAND_ACK', remaining, self.ack_since)
+                if ack is not None:
+                    self.ack_since = client.cache.get_received_time('COMMAND_ACK') or self.ack_since
+                if (ack is not None and ack.command == mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM
+                        and ack.result == mavutil.mavlink.MAV_RESULT_ACCEPTED):
+                    self.disarm_acked = True
+                elif ack is None:
+                    return
+            if not self.neutral_confirmed:
+                self.neutral_confirmed = self.check_neutral(client)
+            if self.disarm_acked and self.neutral_confirmed:
+                return
+            self.stopped.wait(min(0.01, max(0.0, deadline - time.time())))
+
+    def check_neutral(self, client):
+        """緊急停止後に受信したサーボ出力が全スラスターで中立かどうか
+
+        servoN_raw をスラスターTNの出力とみなすので、サーボ出力NがRCパススルー（SERVOn_FUNCTION = RCINn）
+        になっている必要がある（操縦軸のミキサー経由の出力では、中立の確認にならない）
+        """
+        received_time = client.cache.get_received_time('SERVO_OUTPUT_RAW')
+        msg = client.latest('SERVO_OUTPUT_RAW')
+        if msg is None or received_time is None or received_time <= self.start_time:
+            return False
+        tolerance = base.EMERGENCY_STOP_NEUTRAL_TOLERANCE
+        return all(abs(getattr(msg, f'servo{i + 1}_raw', 0) - base.THRUSTER_DEFAULT) <= tolerance
+                   for i in range(base.THRUSTER_COUNT))
+
+    def stop(self):
+        self.stopped.set()